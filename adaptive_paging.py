@@ -0,0 +1,106 @@
+"""文章列表的自适应分页
+
+原先每页固定取 20 篇、最多 50 页，不管查询只要 3 篇还是要在两年范围内以 5% 命中率找文章。
+AdaptivePager 根据还差多少篇、已观察到的命中率以及时间窗口估算还需要多少条列表记录，
+在 API 允许的范围内为每次请求选择页大小；页数上限改为 API 调用次数和记录条数两项预算。
+
+配置（.env）：
+    ARTICLE_PAGE_MIN_SIZE=5
+    ARTICLE_PAGE_MAX_SIZE=20     # wxdown/公众号后台单页最多 20 条
+    FETCH_MAX_API_CALLS=50
+    FETCH_MAX_ROWS=1000
+"""
+import math
+from typing import List, Optional
+
+from config import get_env_var
+
+
+class AdaptivePager:
+    """估算每次列表请求的页大小，并跟踪获取预算"""
+
+    # 命中率的先验：相当于预先观察到 PRIOR_ROWS 条记录、命中率 PRIOR_MATCH_RATE，
+    # 偏保守的估计宁可多取几条，也不要因为页太小多一次往返
+    PRIOR_ROWS = 4.0
+    PRIOR_MATCH_RATE = 0.25
+    # 估算偏差的安全余量
+    SAFETY_FACTOR = 1.5
+
+    def __init__(self, target_count: int, filtering: bool,
+                 start_ts: Optional[float] = None, end_ts: Optional[float] = None):
+        self.target_count = max(1, target_count)
+        self.filtering = filtering
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+
+        self.min_size = int(get_env_var("ARTICLE_PAGE_MIN_SIZE", "5"))
+        self.max_size = int(get_env_var("ARTICLE_PAGE_MAX_SIZE", "20"))
+        self.max_api_calls = int(get_env_var("FETCH_MAX_API_CALLS", "50"))
+        self.max_rows = int(get_env_var("FETCH_MAX_ROWS", "1000"))
+
+        self.api_calls = 0
+        self.rows_seen = 0
+        self.matches_seen = 0
+        self.newest_ts: Optional[int] = None
+        self.oldest_ts: Optional[int] = None
+        self.page_sizes: List[int] = []
+
+    @property
+    def match_rate(self) -> float:
+        """平滑后的命中率估计；没有筛选条件时每条记录都算命中"""
+        if not self.filtering:
+            return 1.0
+        return ((self.matches_seen + self.PRIOR_MATCH_RATE * self.PRIOR_ROWS)
+                / (self.rows_seen + self.PRIOR_ROWS))
+
+    def exhausted(self) -> bool:
+        """API调用次数或记录条数预算是否已用完"""
+        return self.api_calls >= self.max_api_calls or self.rows_seen >= self.max_rows
+
+    @property
+    def remaining_calls(self) -> int:
+        return max(0, self.max_api_calls - self.api_calls)
+
+    def estimate_rows_needed(self, matched: int) -> int:
+        """估算还需要多少条列表记录才能凑够目标数量"""
+        remaining = self.target_count - matched
+        if remaining <= 0:
+            return 0
+        needed = remaining / max(self.match_rate, 1e-3)
+
+        # 有开始日期时，按已观察到的发文频率估算距离时间窗口起点还有多少条，不必多取
+        if (self.start_ts is not None and self.oldest_ts is not None
+                and self.newest_ts is not None and self.rows_seen >= 2
+                and self.newest_ts > self.oldest_ts):
+            rows_per_second = self.rows_seen / (self.newest_ts - self.oldest_ts)
+            rows_until_start = (self.oldest_ts - self.start_ts) * rows_per_second
+            needed = min(needed, max(rows_until_start, 1.0))
+
+        return math.ceil(needed * self.SAFETY_FACTOR)
+
+    def next_size(self, matched: int) -> int:
+        """为下一次请求选择页大小"""
+        needed = self.estimate_rows_needed(matched)
+        size = min(max(needed, self.min_size), self.max_size)
+        size = min(size, max(1, self.max_rows - self.rows_seen))
+        self.page_sizes.append(size)
+        self.api_calls += 1
+        return size
+
+    def observe(self, rows: int, matches: int, timestamps: List[int]) -> None:
+        """记录一页的结果，用于更新命中率和发文频率估计"""
+        self.rows_seen += rows
+        self.matches_seen += matches
+        valid = [ts for ts in timestamps if ts > 0]
+        if valid:
+            newest, oldest = max(valid), min(valid)
+            self.newest_ts = newest if self.newest_ts is None else max(self.newest_ts, newest)
+            self.oldest_ts = oldest if self.oldest_ts is None else min(self.oldest_ts, oldest)
+
+    def stats(self) -> dict:
+        return {
+            "api_calls": self.api_calls,
+            "rows": self.rows_seen,
+            "matches": self.matches_seen,
+            "page_sizes": list(self.page_sizes),
+        }
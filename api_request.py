@@ -1,20 +1,83 @@
-import requests
 import dotenv
+import functools
 import os
+import sys
+from typing import Callable
 
 dotenv.load_dotenv()
 API_TOKEN = os.getenv("API_TOKEN")
 
+# 可通过 WXDOWN_API_BASE 指向兼容的服务（如 benchmark.py scale 使用的本地替身服务）
+API_BASE = os.getenv("WXDOWN_API_BASE", "https://exporter.wxdown.online/api/v1").rstrip("/")
+ACCOUNT_URL = f"{API_BASE}/account"
+ARTICLE_URL = f"{API_BASE}/article"
+
+
+def cassette_in_use() -> bool:
+    """是否可能有生效的cassette：设置了 WX_CASSETTE_MODE，或代码中已使用 use_cassette（cassette 模块已加载）"""
+    return bool(os.getenv("WX_CASSETTE_MODE")) or "cassette" in sys.modules
+
+
+def _hooked_call(kind: str, key_fn: Callable, fn: Callable, variants: dict, is_async: bool) -> Callable:
+    """取得（首次使用时构建）经过 single_flight 合并、录制回放时再经过 cassette 的调用"""
+    recording = cassette_in_use()
+    call = variants.get(recording)
+    if call is None:
+        import single_flight
+
+        inner = fn
+        if recording:
+            import cassette
+            inner = (cassette.arecorded if is_async else cassette.recorded)(kind)(fn)
+        coalesced = single_flight.acoalesced if is_async else single_flight.coalesced
+        call = variants[recording] = coalesced(kind, key_fn)(inner)
+    return call
+
+
+def external_call(kind: str, key_fn: Callable[..., str] = None) -> Callable:
+    """装饰同步外部调用：相同请求合并（见 single_flight.py），录制回放（见 cassette.py）
+
+    两个模块在首次调用时才导入，不计入命令行启动的导入耗时；未使用cassette时不加载 cassette 模块。
+    """
+    def decorator(fn: Callable) -> Callable:
+        variants = {}
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return _hooked_call(kind, key_fn, fn, variants, False)(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def aexternal_call(kind: str, key_fn: Callable[..., str] = None) -> Callable:
+    """external_call 的异步版本"""
+    def decorator(fn: Callable) -> Callable:
+        variants = {}
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await _hooked_call(kind, key_fn, fn, variants, True)(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def api_headers():
+    headers = {"Content-Type": "application/json"}
+    if API_TOKEN:
+        headers["Authorization"] = API_TOKEN  # 常见格式；未配置时不发送（httpx 不接受空值请求头）
+    return headers
+
+
+@external_call("get_account_info")
 def get_account_info(keyword):
-    url = "https://exporter.wxdown.online/api/v1/account"
+    url = ACCOUNT_URL
 
-    headers = {
-        "Authorization": API_TOKEN,  # 常见格式
-        "Content-Type": "application/json"
-    }
+    headers = api_headers()
 
     params = {"keyword": keyword}
 
+    import requests  # 延迟导入，缩短命令行启动时间
+
     try:
         response = requests.get(url, params=params, headers=headers)
         response.raise_for_status()
@@ -24,16 +87,16 @@ def get_account_info(keyword):
         return None
 
 
+@external_call("get_articles")
 def get_articles(account_fake_id, begin, size):
-    url = "https://exporter.wxdown.online/api/v1/article"
+    url = ARTICLE_URL
 
-    headers = {
-        "Authorization": API_TOKEN,  # 常见格式
-        "Content-Type": "application/json"
-    }
+    headers = api_headers()
 
     params = {"fakeid": account_fake_id, "begin": begin, "size": size}
 
+    import requests
+
     try:
         response = requests.get(url, params=params, headers=headers)
         response.raise_for_status()
@@ -43,6 +106,32 @@ def get_articles(account_fake_id, begin, size):
         return None
 
 
+async def _aget_json(url, params):
+    """异步 GET 并解析 JSON，失败时返回 None（与同步版本一致）"""
+    import httpx
+    from async_http import get_async_client
+
+    try:
+        response = await get_async_client().get(url, params=params, headers=api_headers())
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        print(f"请求失败: {e}")
+        return None
+
+
+@aexternal_call("get_account_info")
+async def aget_account_info(keyword):
+    """get_account_info 的异步版本"""
+    return await _aget_json(ACCOUNT_URL, {"keyword": keyword})
+
+
+@aexternal_call("get_articles")
+async def aget_articles(account_fake_id, begin, size):
+    """get_articles 的异步版本"""
+    return await _aget_json(ARTICLE_URL, {"fakeid": account_fake_id, "begin": begin, "size": size})
+
+
 if __name__ == "__main__":
     # result = get_account_info()
     result = get_articles("MzIxMTExMTcxNQ==")
@@ -0,0 +1,241 @@
+"""紧凑的列式文章批次
+
+WorkflowState 中的 all_articles / filtered_articles 原本是 ArticleInfo 字典列表，
+每行都重复保存 link/content_url 和 fake_id，publish_time 还以字符串形式保存、下游反复解析。
+ArticleBatch 按列存储：
+- 标题、链接、文章标识（article_identity.article_id）各一列；content_url 与 link 相同，只作为 link 的别名读取
+- 发布时间为 array('q') 中的 epoch 秒，缺失时为 NO_TIME
+- fake_id 经 sys.intern 后放入小字典表，每行只存一个整数编码
+
+通过下标访问得到 ArticleView，它是字段与 ArticleInfo 一致的只读字典视图，
+现有按 article["title"] 方式访问的代码无需修改。
+"""
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from article_identity import article_id as derive_article_id
+
+
+NO_TIME = -1  # 发布时间缺失或无法解析
+
+ARTICLE_FIELDS = ("title", "publish_time", "link", "article_id", "fake_id")
+
+
+def to_epoch(value: Any) -> int:
+    """将API返回的时间戳、数字字符串、日期字符串或datetime转换为epoch秒"""
+    if value is None or value == "":
+        return NO_TIME
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    text = str(value).strip()
+    if not text:
+        return NO_TIME
+    if text.isdigit():
+        return int(text)
+    try:
+        from dateutil import parser as date_parser
+        return int(date_parser.parse(text).timestamp())
+    except (ValueError, OverflowError):
+        return NO_TIME
+
+
+class ArticleView(Mapping):
+    """ArticleBatch 中单篇文章的只读字典视图，字段与 ArticleInfo 一致"""
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch: "ArticleBatch", index: int):
+        self._batch = batch
+        self._index = index
+
+    def __getitem__(self, key: str) -> str:
+        batch = self._batch
+        index = self._index
+        if key == "title":
+            return batch._titles[index]
+        if key == "link" or key == "content_url":  # content_url 为旧字段名
+            return batch._links[index]
+        if key == "article_id":
+            return batch._article_ids[index]
+        if key == "publish_time":
+            ts = batch._publish_ts[index]
+            return str(ts) if ts != NO_TIME else ""
+        if key == "fake_id":
+            return batch._fake_ids[batch._fake_id_codes[index]]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(ARTICLE_FIELDS)
+
+    def __len__(self) -> int:
+        return len(ARTICLE_FIELDS)
+
+    @property
+    def publish_ts(self) -> int:
+        """发布时间（epoch秒），缺失时为 NO_TIME"""
+        return self._batch._publish_ts[self._index]
+
+    def to_dict(self) -> Dict[str, str]:
+        """转换为普通的 ArticleInfo 字典"""
+        return {key: self[key] for key in ARTICLE_FIELDS}
+
+    def __repr__(self) -> str:
+        return f"ArticleView({self.to_dict()!r})"
+
+
+class ArticleBatch(Sequence):
+    """列式存储的文章列表，可作为 List[ArticleInfo] 的替代"""
+
+    __slots__ = ("_titles", "_links", "_article_ids", "_publish_ts", "_fake_id_codes", "_fake_ids", "_fake_id_index")
+
+    def __init__(self, articles: Iterable[Mapping] = ()):
+        self._titles: List[str] = []
+        self._links: List[str] = []
+        self._article_ids: List[str] = []
+        self._publish_ts = array("q")
+        self._fake_id_codes = array("I")
+        self._fake_ids: List[str] = []
+        self._fake_id_index: Dict[str, int] = {}
+        for article in articles:
+            self.append_article(article)
+
+    @classmethod
+    def from_dicts(cls, articles: Iterable[Mapping]) -> "ArticleBatch":
+        """从 ArticleInfo 字典列表构建；已是 ArticleBatch 时直接返回"""
+        if isinstance(articles, ArticleBatch):
+            return articles
+        return cls(articles)
+
+    @classmethod
+    def from_columns(cls, titles: List[str], links: List[str], publish_ts: Iterable[int],
+                     article_ids: List[str], fake_id: str) -> "ArticleBatch":
+        """由同一公众号的各列直接构建（列表会被直接持有，调用方不要再修改）"""
+        batch = cls()
+        batch._titles = titles
+        batch._links = links
+        batch._article_ids = article_ids
+        batch._publish_ts = array("q", publish_ts)
+        code = batch._fake_id_code(fake_id or "")
+        batch._fake_id_codes = array("I", [code]) * len(titles)
+        return batch
+
+    def _fake_id_code(self, fake_id: str) -> int:
+        code = self._fake_id_index.get(fake_id)
+        if code is None:
+            code = len(self._fake_ids)
+            self._fake_ids.append(sys.intern(fake_id))
+            self._fake_id_index[fake_id] = code
+        return code
+
+    def append(self, title: str, link: str, publish_ts: int, fake_id: str, article_id: str = None) -> None:
+        """追加一篇文章；未给出 article_id 时由链接推导"""
+        self._titles.append(title)
+        self._links.append(link)
+        self._article_ids.append(article_id or derive_article_id(link, fake_id or ""))
+        self._publish_ts.append(publish_ts)
+        self._fake_id_codes.append(self._fake_id_code(fake_id or ""))
+
+    def append_article(self, article: Mapping) -> None:
+        """从 ArticleInfo 字典（或 ArticleView）追加一篇文章"""
+        if isinstance(article, ArticleView):
+            publish_ts = article.publish_ts
+        else:
+            publish_ts = to_epoch(article.get("publish_time"))
+        self.append(
+            title=article.get("title", ""),
+            link=article.get("link") or article.get("content_url", ""),
+            publish_ts=publish_ts,
+            fake_id=article.get("fake_id", ""),
+            article_id=article.get("article_id"),
+        )
+
+    def extend(self, articles: Iterable[Mapping]) -> None:
+        """追加多篇文章，支持另一个 ArticleBatch 或字典列表"""
+        if isinstance(articles, ArticleBatch):
+            self._titles.extend(articles._titles)
+            self._links.extend(articles._links)
+            self._article_ids.extend(articles._article_ids)
+            self._publish_ts.extend(articles._publish_ts)
+            remap = [self._fake_id_code(fake_id) for fake_id in articles._fake_ids]
+            self._fake_id_codes.extend(remap[code] for code in articles._fake_id_codes)
+            return
+        for article in articles:
+            self.append_article(article)
+
+    def take(self, indices: Iterable[int]) -> "ArticleBatch":
+        """按下标选取子集，返回新的 ArticleBatch（共享字符串对象，不复制内容）"""
+        subset = ArticleBatch()
+        subset._fake_ids = list(self._fake_ids)
+        subset._fake_id_index = dict(self._fake_id_index)
+        titles, links, ids = self._titles, self._links, self._article_ids
+        publish_ts, codes = self._publish_ts, self._fake_id_codes
+        for index in indices:
+            subset._titles.append(titles[index])
+            subset._links.append(links[index])
+            subset._article_ids.append(ids[index])
+            subset._publish_ts.append(publish_ts[index])
+            subset._fake_id_codes.append(codes[index])
+        return subset
+
+    @property
+    def titles(self) -> List[str]:
+        """标题列（只读使用）"""
+        return self._titles
+
+    @property
+    def links(self) -> List[str]:
+        """链接列（只读使用）"""
+        return self._links
+
+    @property
+    def article_ids(self) -> List[str]:
+        """文章标识列（只读使用）"""
+        return self._article_ids
+
+    @property
+    def publish_ts(self) -> array:
+        """发布时间列（epoch秒，只读使用）"""
+        return self._publish_ts
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ArticleBatch index out of range")
+        return ArticleView(self, index)
+
+    def __iter__(self) -> Iterator[ArticleView]:
+        for index in range(len(self)):
+            yield ArticleView(self, index)
+
+    def copy(self) -> "ArticleBatch":
+        return self.take(range(len(self)))
+
+    def to_dicts(self) -> List[Dict[str, str]]:
+        """转换为 ArticleInfo 字典列表，用于序列化或兼容旧接口"""
+        return [view.to_dict() for view in self]
+
+    def __repr__(self) -> str:
+        return f"ArticleBatch({len(self)} articles)"
+
+
+def publish_datetime(article: Mapping) -> Optional[datetime]:
+    """返回文章的发布时间，无法确定时返回 None"""
+    if isinstance(article, ArticleView):
+        ts = article.publish_ts
+    else:
+        ts = to_epoch(article.get("publish_time"))
+    if ts == NO_TIME:
+        return None
+    return datetime.fromtimestamp(ts)
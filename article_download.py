@@ -0,0 +1,166 @@
+"""文章页面的有界流式下载
+
+原先 requests.get 后读取完整的 response.content 再解析，内嵌大量数据和脚本的页面可能有好几MB，
+而后续只用到正文的前几千字。这里改为流式读取，边下载边用 HTMLParser 增量扫描，满足以下任一条件即停止：
+- 正文容器（#js_content / .rich_media_content 等）已闭合
+- 正文容器内已收集到足够的文字
+- 已读取的字节数达到上限
+文章标识（msg_link / biz、mid、idx 变量）写在正文容器之后的脚本里：读完正文时如果 <head> 的 og:url
+中没有标识，再继续读一段有界的页尾，找到标识即停止，归档的页面和短链接别名表因此仍能得到文章标识。
+每篇文章的内存和带宽占用因此有上界，与页面大小无关。
+
+配置（.env）：
+    ARTICLE_MAX_BYTES=2097152     # 单篇文章最多读取的字节数
+    ARTICLE_TEXT_LIMIT=6000       # 正文收集到这么多字即停止（提示词只使用前4000字）
+    ARTICLE_ID_TAIL_BYTES=262144  # 读完正文后为查找文章标识最多再读取的字节数，0 表示不读
+"""
+import codecs
+from html.parser import HTMLParser
+from typing import Dict, Optional, Tuple
+
+from article_identity import id_from_page
+from config import get_env_var
+
+
+CHUNK_SIZE = 16 * 1024
+
+# 与 extract_article_text 的选择器对应；过于宽泛的 .content 不用于判断截断位置
+CONTENT_IDS = {"js_content"}
+CONTENT_CLASSES = {"rich_media_content", "weui-article__bd"}
+CONTENT_TAGS = {"article"}
+
+# 没有结束标签的元素，不计入嵌套深度
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+             "meta", "param", "source", "track", "wbr"}
+
+# 停止原因
+CONTAINER_CLOSED = "container_closed"
+TEXT_LIMIT = "text_limit"
+BYTE_LIMIT = "byte_limit"
+COMPLETE = "complete"
+
+
+class ContentCutoffParser(HTMLParser):
+    """增量扫描 HTML，判断正文容器是否已闭合、容器内文字是否已足够"""
+
+    def __init__(self, text_limit: int):
+        super().__init__(convert_charrefs=True)
+        self.text_limit = text_limit
+        self.depth = 0            # 正文容器内的嵌套深度，0 表示不在容器内
+        self.text_chars = 0
+        self.found = False
+        self.closed = False
+
+    def _is_container(self, tag: str, attrs) -> bool:
+        attrs = dict(attrs)
+        if attrs.get("id") in CONTENT_IDS or tag in CONTENT_TAGS:
+            return True
+        classes = set((attrs.get("class") or "").split())
+        return bool(classes & CONTENT_CLASSES)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS or self.closed:
+            return
+        if self.depth:
+            self.depth += 1
+        elif not self.found and self._is_container(tag, attrs):
+            self.found = True
+            self.depth = 1
+
+    def handle_endtag(self, tag):
+        if self.depth and tag not in VOID_TAGS:
+            self.depth -= 1
+            if self.depth == 0:
+                self.closed = True
+
+    def handle_data(self, data):
+        if self.depth:
+            self.text_chars += len(data.strip())
+
+    @property
+    def stop_reason(self) -> Optional[str]:
+        if self.closed:
+            return CONTAINER_CLOSED
+        if self.text_chars >= self.text_limit:
+            return TEXT_LIMIT
+        return None
+
+
+class BoundedBody:
+    """累积下载的分块，判断何时可以停止读取（同步/异步下载共用）"""
+
+    def __init__(self, max_bytes: Optional[int] = None, text_limit: Optional[int] = None,
+                 full_page: bool = False):
+        self.full_page = full_page  # 为页面归档读取完整页面：只受字节上限限制
+        self.max_bytes = max_bytes or int(get_env_var("ARTICLE_MAX_BYTES", str(2 * 1024 * 1024)))
+        self.parser = ContentCutoffParser(text_limit or int(get_env_var("ARTICLE_TEXT_LIMIT", "6000")))
+        self.tail_limit = int(get_env_var("ARTICLE_ID_TAIL_BYTES", str(256 * 1024)))
+        # 解码只用于扫描标签和统计字数，返回的仍是原始字节；公众号页面均为 UTF-8
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.chunks = []
+        self.received = 0
+        self.reason = COMPLETE
+        self.tail: Optional[list] = None   # 正文读完后为查找文章标识读取的页尾分块
+        self.tail_bytes = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """加入一个分块，返回 True 表示应停止读取"""
+        if not chunk:
+            return False
+        chunk = chunk[:self.max_bytes - self.received]
+        self.chunks.append(chunk)
+        self.received += len(chunk)
+        # 读取完整页面时不扫描正文，只按字节上限停止
+        if self.tail is None and not self.full_page:
+            self.parser.feed(self.decoder.decode(chunk))
+            if self.parser.stop_reason:
+                self.reason = self.parser.stop_reason
+                if self.tail_limit <= 0 or id_from_page(b"".join(self.chunks)):
+                    return True
+                self.tail = [chunk]
+        elif self.tail is not None:
+            self.tail.append(chunk)
+            self.tail_bytes += len(chunk)
+            if self.tail_bytes >= self.tail_limit or id_from_page(b"".join(self.tail)):
+                return True
+        if self.received >= self.max_bytes:
+            if self.reason == COMPLETE:
+                self.reason = BYTE_LIMIT
+            return True
+        return False
+
+    def result(self) -> Tuple[bytes, Dict]:
+        return b"".join(self.chunks), {"bytes": self.received, "stop_reason": self.reason}
+
+
+def download_html(url: str, headers: Dict[str, str], timeout: float = 10,
+                  max_bytes: Optional[int] = None, text_limit: Optional[int] = None,
+                  full_page: bool = False) -> Tuple[bytes, Dict]:
+    """流式下载页面，返回 (已读取的 HTML 字节, 统计)；网络错误照常抛出
+
+    full_page=True 时不在正文读完后提前停止，统计中的 stop_reason 为 complete 表示读取了完整页面。
+    """
+    import requests
+
+    body = BoundedBody(max_bytes, text_limit, full_page)
+    with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if body.feed(chunk):
+                break
+    return body.result()
+
+
+async def adownload_html(url: str, headers: Dict[str, str], timeout: float = 10,
+                         max_bytes: Optional[int] = None, text_limit: Optional[int] = None,
+                         full_page: bool = False) -> Tuple[bytes, Dict]:
+    """download_html 的异步版本，使用事件循环共享的 httpx 客户端"""
+    from async_http import get_async_client
+
+    body = BoundedBody(max_bytes, text_limit, full_page)
+    async with get_async_client().stream("GET", url, headers=headers, timeout=timeout) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size=CHUNK_SIZE):
+            if body.feed(chunk):
+                break
+    return body.result()
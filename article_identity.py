@@ -0,0 +1,254 @@
+"""文章的规范标识
+
+同一篇公众号文章会以多种链接形式出现：
+- 长链接 https://mp.weixin.qq.com/s?__biz=...&mid=...&idx=...&sn=...，常带 chksm、scene 等追踪参数和 #rd
+- 短链接 https://mp.weixin.qq.com/s/xxxx，链接本身不含文章参数
+原先各处缓存和索引各自用（规范化后的）链接做键，同一篇文章换一种链接就会被重复下载、解析和导出。
+这里统一推导文章标识 "biz:mid:idx"：
+- 长链接直接取 __biz/mid/idx；缺 mid/idx 时用 "biz:sn:签名"
+- 短链接先查别名表；列表接口同时返回 aid（mid_idx）时由 fake_id（即 __biz）和 aid 推导并记入别名表；
+  下载到页面后从 <head> 的 og:url 或页面脚本中的 msg_link / biz、mid、idx 变量解析并记入别名表；
+  都没有时暂用 "s:短链标识"
+- 其他链接退化为规范化后的链接
+转载到其他公众号的文章标识不同，另用 content_fingerprint（去掉空白后的正文哈希）识别。
+别名表逐行追加保存在 ARTICLE_ALIAS_FILE（默认 cache/article_aliases.json），下次运行时短链接可直接得到标识。
+
+用到文章键的地方（列表去重、页面归档、合并导出去重、相关度索引、订阅调度、正文压缩统计）都使用 article_id。
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import get_env_var
+from file_lock import file_lock
+
+
+WECHAT_HOST = "mp.weixin.qq.com"
+# 公众号文章链接中标识文章的参数，其余（scene、chksm、来源追踪等）不影响内容
+WECHAT_LINK_PARAMS = ("__biz", "mid", "idx", "sn")
+
+_SHORT_PATH = re.compile(r"^/s/([A-Za-z0-9_-]+)/?$")
+_AID = re.compile(r"^(\d+)_(\d+)$")
+# 页面脚本中的文章参数：var msg_link = "http://mp.weixin.qq.com/s?__biz=...&amp;mid=..."; var mid = "" || "123";
+_MSG_LINK = re.compile(rb'var\s+msg_link\s*=\s*"([^"]+)"')
+_PAGE_VARS = {name: re.compile(rb'var\s+' + name.encode() + rb'\s*=\s*(?:"[^"]*"\s*\|\|\s*)*"([^"]+)"')
+              for name in ("biz", "mid", "idx")}
+# <head> 中的 <meta property="og:url" content="http://mp.weixin.qq.com/s?__biz=...&amp;mid=...">
+_OG_URL_META = re.compile(rb'<meta\b[^>]*\bproperty\s*=\s*["\']og:url["\'][^>]*>', re.IGNORECASE)
+_CONTENT_ATTR = re.compile(rb'\bcontent\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+# 只在页面开头和结尾查找（标识脚本位于正文之后），避免对整页做正则扫描
+PAGE_SCAN_BYTES = 256 * 1024
+
+
+def normalize_link(url: str) -> str:
+    """规范化文章链接，使同一篇文章的不同分享链接得到同一个链接"""
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower()
+    scheme = "https" if parts.scheme in ("http", "https", "") else parts.scheme
+    query = parse_qsl(parts.query, keep_blank_values=False)
+    if netloc == WECHAT_HOST and parts.path in ("/s", "/mp/appmsg/show"):
+        params = dict(query)
+        query = [(name, params[name]) for name in WECHAT_LINK_PARAMS if name in params]
+        return urlunsplit((scheme, netloc, "/s", urlencode(query), ""))
+    return urlunsplit((scheme, netloc, parts.path, urlencode(sorted(query)), ""))
+
+
+def _params_id(params: Dict[str, str]) -> Optional[str]:
+    biz = params.get("__biz")
+    if not biz:
+        return None
+    if params.get("mid") and params.get("idx"):
+        return f"{biz}:{params['mid']}:{params['idx']}"
+    if params.get("sn"):
+        return f"{biz}:sn:{params['sn']}"
+    return None
+
+
+def short_token(url: str) -> Optional[str]:
+    """短链接 /s/xxxx 中的标识，不是短链接时返回 None"""
+    parts = urlsplit(url.strip())
+    if parts.netloc.lower() != WECHAT_HOST:
+        return None
+    match = _SHORT_PATH.match(parts.path)
+    return match.group(1) if match else None
+
+
+def id_from_aid(fake_id: str, aid: str) -> Optional[str]:
+    """列表接口返回的 aid（"mid_idx"）加公众号 fake_id 得到文章标识"""
+    match = _AID.match(aid or "")
+    if not fake_id or not match:
+        return None
+    return f"{fake_id}:{match.group(1)}:{match.group(2)}"
+
+
+class AliasTable:
+    """短链接标识 → 文章标识，每条别名以一行 ["短链标识", "文章标识"] 追加写入文件
+
+    新增别名只追加一行（在文件锁内），多个进程同时记录时不会互相覆盖；
+    查不到时读入其他进程新追加的行。旧版本整个文件是一个 JSON 对象，仍可读取，新别名追加在其后。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._aliases: Dict[str, str] = {}
+        self._offset = 0                # 已读入的字节数
+        self._missing_newline = False   # 旧格式文件末尾没有换行，追加前先补上
+        self._lock = threading.Lock()
+
+    def _read_new(self) -> None:
+        """读入文件中新追加的完整行（调用方持有 self._lock）"""
+        try:
+            if os.path.getsize(self.path) <= self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not self._apply(line):
+                print(f"[ARTICLE-ID] 别名表中有损坏的行，已跳过: {line[:80]!r}")
+        self._offset += end
+        # 最后一段没有换行：旧格式的整个文件，或其他进程正在写入的行（下次再读）
+        if data[end:] and self._apply(data[end:]):
+            self._offset += len(data) - end
+            self._missing_newline = True
+
+    def _apply(self, line: bytes) -> bool:
+        if not line.strip():
+            return True
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return False
+        if isinstance(record, dict):
+            self._aliases.update(record)
+        elif isinstance(record, list) and len(record) == 2:
+            self._aliases[record[0]] = record[1]
+        else:
+            return False
+        return True
+
+    def get(self, token: str) -> Optional[str]:
+        with self._lock:
+            canonical_id = self._aliases.get(token)
+            if canonical_id is None:
+                self._read_new()
+                canonical_id = self._aliases.get(token)
+            return canonical_id
+
+    def add(self, token: str, canonical_id: str) -> None:
+        with self._lock:
+            self._read_new()
+            if self._aliases.get(token) == canonical_id:
+                return
+            self._aliases[token] = canonical_id
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            line = json.dumps([token, canonical_id], ensure_ascii=False) + "\n"
+            if self._missing_newline:
+                line = "\n" + line
+                self._missing_newline = False
+            with file_lock(self.path), open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_aliases: Optional[AliasTable] = None
+_aliases_lock = threading.Lock()
+
+
+def get_alias_table() -> AliasTable:
+    global _aliases
+    with _aliases_lock:
+        if _aliases is None:
+            _aliases = AliasTable(get_env_var("ARTICLE_ALIAS_FILE", os.path.join("cache", "article_aliases.json")))
+        return _aliases
+
+
+def article_id(url: str, fake_id: str = "", aid: str = "") -> str:
+    """文章的规范标识；传入列表接口的 fake_id 和 aid 时，短链接也能直接得到标识"""
+    if not url:
+        return id_from_aid(fake_id, aid) or ""
+    parts = urlsplit(url.strip())
+    if parts.netloc.lower() == WECHAT_HOST:
+        if parts.path in ("/s", "/mp/appmsg/show"):
+            canonical_id = _params_id(dict(parse_qsl(parts.query)))
+            if canonical_id:
+                return canonical_id
+        token = short_token(url)
+        if token:
+            canonical_id = id_from_aid(fake_id, aid)
+            aliases = get_alias_table()
+            if canonical_id:
+                aliases.add(token, canonical_id)
+                return canonical_id
+            return aliases.get(token) or f"s:{token}"
+    return normalize_link(url)
+
+
+def _link_id(raw: bytes) -> Optional[str]:
+    link = raw.decode("utf-8", "replace").replace("&amp;", "&")
+    return _params_id(dict(parse_qsl(urlsplit(link).query)))
+
+
+def id_from_page(html: bytes) -> Optional[str]:
+    """从文章页面的 og:url 或页面脚本中解析文章标识"""
+    head = html[:PAGE_SCAN_BYTES]
+    meta = _OG_URL_META.search(head)
+    if meta:
+        content = _CONTENT_ATTR.search(meta.group(0))
+        canonical_id = _link_id(content.group(1)) if content else None
+        if canonical_id:
+            return canonical_id
+
+    regions = [html] if len(html) <= 2 * PAGE_SCAN_BYTES else [head, html[-PAGE_SCAN_BYTES:]]
+    for region in regions:
+        match = _MSG_LINK.search(region)
+        canonical_id = _link_id(match.group(1)) if match else None
+        if canonical_id:
+            return canonical_id
+        values = {}
+        for name, pattern in _PAGE_VARS.items():
+            match = pattern.search(region)
+            if not match:
+                break
+            values[name] = match.group(1).decode("utf-8", "replace")
+        else:
+            return f"{values['biz']}:{values['mid']}:{values['idx']}"
+    return None
+
+
+def learn_from_page(url: str, html: bytes) -> Optional[str]:
+    """下载到短链接的页面后记录其文章标识，返回解析到的标识"""
+    token = short_token(url)
+    if not token:
+        return None
+    canonical_id = id_from_page(html)
+    if canonical_id:
+        get_alias_table().add(token, canonical_id)
+    return canonical_id
+
+
+def content_fingerprint(text: str) -> bytes:
+    """正文指纹：去掉全部空白后取哈希，用于识别不同链接下的相同正文（转载）"""
+    return hashlib.blake2b(_WHITESPACE.sub("", text).encode("utf-8"), digest_size=16).digest()
+
+
+_UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def account_file_name(account: str) -> str:
+    """公众号（fake_id 或名称）对应的缓存文件名（不含扩展名）
+
+    可读部分只保留 ASCII 字母、数字、下划线和连字符，并附加原名的短哈希，
+    中文名称或只差符号的 fake_id 不会映射到同一个文件。
+    """
+    readable = _UNSAFE_NAME_CHARS.sub("_", account)[:48] or "unknown"
+    return f"{readable}-{hashlib.sha1(account.encode('utf-8')).hexdigest()[:10]}"
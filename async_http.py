@@ -0,0 +1,40 @@
+"""异步工作流共用的 HTTP 客户端
+
+每个事件循环共享一个 httpx.AsyncClient，同一进程中并发运行的多个任务复用连接池，
+不需要每个任务占用一个线程。
+
+配置（.env）：
+    HTTP_MAX_CONNECTIONS=100      # 单个事件循环的最大并发连接数
+    HTTP_TIMEOUT=10
+"""
+import asyncio
+import weakref
+
+from config import get_env_var
+
+
+_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """当前事件循环的共享客户端（首次调用时创建）"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        import httpx  # 仅在异步路径中导入
+
+        max_connections = int(get_env_var("HTTP_MAX_CONNECTIONS", "100"))
+        client = httpx.AsyncClient(
+            timeout=float(get_env_var("HTTP_TIMEOUT", "10")),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=True,  # 与 requests 的默认行为一致
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_async_client() -> None:
+    """关闭当前事件循环的客户端；在事件循环结束前调用"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
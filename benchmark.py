@@ -0,0 +1,558 @@
+"""性能基准测试脚本
+
+用法：
+    python benchmark.py importtime              # 检查入口模块导入耗时预算，并报告冷启动时间
+    python benchmark.py importtime --budget-ms 100
+    python benchmark.py record cassettes/job.jsonl.gz "请查询银行科技研究社的文章，最近5篇"
+    python benchmark.py replay cassettes/job.jsonl.gz --latency-scale 0 --repeat 5
+    python benchmark.py filter --rows 50000             # 逐行筛选、向量化筛选与本地文章历史查询的耗时对比
+    python benchmark.py scale --modes async,threads --concurrency 1,2,4,8 --jobs 16 --error-rate 0.02
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 入口模块的导入耗时预算（毫秒），以 python -X importtime 报告的累计耗时为准
+IMPORT_BUDGETS_MS = {
+    "main": 150,
+    "workflow": 150,
+    "worker": 150,
+}
+
+# 入口模块导入阶段不允许加载的重量级依赖，只能在节点运行时导入
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "langchain",
+    "langchain_core",
+    "langchain_openai",
+    "langgraph",
+    "openai",
+    "bs4",
+    "requests",
+]
+
+# 冷启动场景：命令行启动 与 批处理worker启动（需要编译工作流）
+COLD_START_SCENARIOS = {
+    "cli": "import main",
+    "worker": "import worker, workflow; workflow.create_workflow()",
+}
+
+
+def _run_python(args: list) -> subprocess.CompletedProcess:
+    """在项目目录下用当前解释器启动一个全新的子进程"""
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+    )
+
+
+def measure_import_time(module: str) -> tuple:
+    """返回 (累计导入耗时微秒, 导入过程中加载的模块名集合)"""
+    proc = _run_python(["-X", "importtime", "-c", f"import {module}"])
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr}")
+
+    cumulative_us = 0
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # 表头行
+        name = parts[2].strip()
+        imported.add(name)
+        if name == module:
+            cumulative_us = int(parts[1].strip())
+    return cumulative_us, imported
+
+
+def measure_cold_start(snippet: str, repeat: int) -> list:
+    """多次启动全新解释器执行代码片段，返回每次的墙钟耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = _run_python(["-c", snippet])
+        elapsed = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError(f"执行 {snippet!r} 失败:\n{proc.stderr}")
+        timings.append(elapsed)
+    return timings
+
+
+def run_import_budget(repeat: int, budget_ms: float = None) -> int:
+    """检查导入耗时预算，返回进程退出码（0 表示全部通过）"""
+    failures = []
+
+    # 预热一次，确保 .pyc 已生成，避免把编译时间算进导入耗时
+    _run_python(["-c", "import main"])
+
+    print("=== 导入耗时预算检查 (python -X importtime) ===")
+    for module, default_budget in IMPORT_BUDGETS_MS.items():
+        budget = budget_ms if budget_ms is not None else default_budget
+        samples = []
+        imported = set()
+        for _ in range(repeat):
+            cumulative_us, imported = measure_import_time(module)
+            samples.append(cumulative_us / 1000)
+        median_ms = statistics.median(samples)
+
+        heavy = sorted(
+            name for name in imported
+            if name.split(".")[0] in HEAVY_MODULES and "." not in name
+        )
+        status = "OK"
+        if median_ms > budget:
+            status = "超出预算"
+            failures.append(f"{module}: {median_ms:.1f}ms > {budget}ms")
+        if heavy:
+            status = "加载了重量级依赖"
+            failures.append(f"{module}: 导入阶段加载了 {', '.join(heavy)}")
+        print(f"{module:<12} 中位数 {median_ms:8.1f}ms  预算 {budget:6.1f}ms  [{status}]")
+
+    print("\n=== 冷启动耗时（全新进程墙钟时间） ===")
+    for scenario, snippet in COLD_START_SCENARIOS.items():
+        try:
+            timings = measure_cold_start(snippet, repeat)
+        except RuntimeError as e:
+            print(f"{scenario:<12} 无法测量: {e}")
+            continue
+        print(f"{scenario:<12} 中位数 {statistics.median(timings):8.1f}ms  "
+              f"最小 {min(timings):8.1f}ms  最大 {max(timings):8.1f}ms")
+
+    if failures:
+        print("\n❌ 导入耗时预算检查未通过：")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+
+    print("\n✅ 导入耗时预算检查通过")
+    return 0
+
+
+def run_record(cassette_path: str, user_input: str) -> int:
+    """真实执行一次工作流，把全部外部调用录制到cassette文件"""
+    from cassette import RECORD, use_cassette
+    from workflow import run_workflow
+
+    with use_cassette(cassette_path, RECORD, metadata={"user_input": user_input}):
+        result = run_workflow(user_input)
+    return 1 if result.get("error_message") else 0
+
+
+def run_replay(cassette_path: str, user_input: str, repeat: int, latency_scale: float,
+               order_fallback: bool = False) -> int:
+    """离线回放cassette，多次执行工作流并报告耗时"""
+    from cassette import REPLAY, use_cassette
+    from workflow import run_workflow
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with use_cassette(cassette_path, REPLAY, latency_scale=latency_scale,
+                          order_fallback=order_fallback) as cassette:
+            result = run_workflow(user_input or cassette.metadata["user_input"])
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.get("error_message"):
+            print(f"❌ 回放失败: {result['error_message']}")
+            return 1
+
+    print("\n=== 回放耗时 ===")
+    print(f"cassette: {cassette_path}  延迟缩放: {latency_scale}  次数: {repeat}")
+    print(f"中位数 {statistics.median(timings):.1f}ms  最小 {min(timings):.1f}ms  最大 {max(timings):.1f}ms")
+    return 0
+
+
+def run_filter_benchmark(rows: int, repeat: int) -> int:
+    """在合成的文章列表上对比逐行筛选、向量化筛选和文章历史查询的耗时"""
+    import random
+    import tempfile
+    from datetime import datetime
+
+    import workflow_nodes
+    from article_batch import ArticleBatch
+    from vector_filter import ArticleHistory, filter_batch
+    from workflow_state import FilterConditions
+
+    random.seed(0)
+    words = ["AI", "大模型", "银行", "数字化", "Fintech", "监管", "支付", "开放银行", "风控", "数据"]
+    start_ts = int(datetime(2015, 1, 1).timestamp())
+    articles = ArticleBatch()
+    for i in range(rows):
+        articles.append(title=" ".join(random.sample(words, 3)) + f" 第{i}篇",
+                        link=f"https://mp.weixin.qq.com/s?__biz=BENCH==&mid={i}&idx=1",
+                        publish_ts=start_ts + random.randint(0, 10 * 365 * 86400), fake_id="BENCH==")
+    conditions = FilterConditions(
+        title_keywords=["AI", "大模型"], max_articles=None,
+        start_date=datetime(2020, 1, 1), end_date=datetime(2020, 3, 31),
+        required_keywords=None, excluded_keywords=["监管"], match_body=False, topic=None
+    )
+
+    def measure(fn) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["ARTICLE_HISTORY_DIR"] = directory
+        history = ArticleHistory("BENCH==")
+        history.merge(articles)
+        history.query(conditions)  # 预先计算小写标题列
+        workflow_nodes.VECTOR_FILTER_MIN_ROWS = rows + 1  # 强制走逐行版本
+        results = {
+            "逐行筛选": measure(lambda: workflow_nodes.apply_filters(articles, conditions)),
+            "向量化筛选": measure(lambda: filter_batch(articles, conditions)),
+            "历史查询": measure(lambda: history.query(conditions)),
+        }
+
+    print(f"\n=== 筛选耗时（{rows} 篇，重复 {repeat} 次取中位数） ===")
+    for name, elapsed_ms in results.items():
+        print(f"{name:<10} {elapsed_ms:8.1f}ms")
+    return 0
+
+
+# 扩展性基准的运行方式：async 为一个事件循环中 asyncio.gather 并发 arun_workflow，
+# threads 为线程池中并发调用 run_workflow，worker 为若干个 worker 线程从 SQLite 任务队列领取任务
+SCALE_MODES = ("async", "threads", "worker")
+
+SCALE_CSV_FIELDS = [
+    "timestamp", "commit", "python", "mode", "concurrency", "fetch_concurrency", "http_connections",
+    "llm_concurrency", "jobs", "accounts", "articles", "warmup", "api_latency_ms", "page_latency_ms", "llm_latency_ms",
+    "error_rate", "seed", "env", "wall_s", "throughput_jobs_per_s", "latency_p50_ms", "latency_p90_ms",
+    "latency_p99_ms", "latency_max_ms", "failed_jobs", "short_news",
+    "api_requests", "page_requests", "llm_requests", "injected_errors",
+]
+
+
+def _percentile(values: list, percent: float) -> float:
+    """最近秩法的百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))  # 向上取整
+    return ordered[int(rank) - 1]
+
+
+def _git_commit() -> str:
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return ""
+    dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_DIR,
+                           capture_output=True, text=True).stdout.strip()
+    return proc.stdout.strip() + ("-dirty" if dirty else "")
+
+
+def _split_ints(text: str) -> list:
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def scale_point(spec_json: str) -> int:
+    """子进程入口：按 spec 运行一组并发任务，把每个任务的耗时和结果写入 spec["result_path"]"""
+    import threading
+
+    spec = json.loads(spec_json)
+    queries = [f"请查询基准号{i % spec['accounts']}的文章，最近{spec['articles']}篇，标题包含AI"
+               for i in range(spec["jobs"])]
+    if spec["warmup"]:
+        # 预热任务（使用单独的公众号）完成各节点的延迟导入，不计入结果
+        from workflow import run_workflow
+
+        for i in range(spec["warmup"]):
+            run_workflow(f"请查询预热号{i}的文章，最近{spec['articles']}篇，标题包含AI")
+    before = _standin_stats(spec["standin_url"])
+    concurrency = spec["concurrency"]
+    latencies, outcomes = [], []
+    lock = threading.Lock()
+
+    def record(started: float, ok: bool, short_news: int) -> None:
+        with lock:
+            latencies.append((time.perf_counter() - started) * 1000)
+            outcomes.append((ok, short_news))
+
+    def summarize(result) -> tuple:
+        return not result.get("error_message"), len(result.get("short_news_list") or [])
+
+    start = time.perf_counter()
+    if spec["mode"] == "async":
+        import asyncio
+        from async_http import close_async_client
+        from workflow import arun_workflow
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run_one(query):
+                async with semaphore:
+                    started = time.perf_counter()
+                    record(started, *summarize(await arun_workflow(query)))
+
+            try:
+                await asyncio.gather(*(run_one(query) for query in queries))
+            finally:
+                await close_async_client()
+
+        asyncio.run(run_all())
+    elif spec["mode"] == "threads":
+        from concurrent.futures import ThreadPoolExecutor
+        from workflow import run_workflow
+
+        def run_one(query):
+            started = time.perf_counter()
+            record(started, *summarize(run_workflow(query)))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(run_one, queries))
+    else:
+        import worker
+        from job_queue import SQLiteJobQueue
+
+        queue = SQLiteJobQueue(os.path.join("cache", "bench_jobs.db"), retry_delay=0)
+        for i, query in enumerate(queries):
+            queue.submit({"user_input": query, "bench_index": i})
+
+        def run_worker_thread(worker_id: str):
+            while True:
+                job = queue.claim(worker_id, 300)
+                if job is None:
+                    return
+                started = time.perf_counter()
+                ok = worker.run_job(queue, job, worker_id, 300)
+                result = queue.get(job["id"]).get("result") or {}
+                record(started, ok, result.get("short_news", 0))
+
+        threads = [threading.Thread(target=run_worker_thread, args=(f"bench-{i}",)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - start
+    after = _standin_stats(spec["standin_url"])
+
+    with open(spec["result_path"], "w", encoding="utf-8") as f:
+        json.dump({"wall_s": wall, "latencies_ms": latencies, "outcomes": outcomes,
+                   "requests": {kind: after[kind]["requests"] - before[kind]["requests"] for kind in after},
+                   "errors": sum(after[kind]["errors"] - before[kind]["errors"] for kind in after)}, f)
+    return 0
+
+
+def _start_standin(args) -> tuple:
+    """在子进程中启动替身服务，返回 (进程, 服务地址)"""
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_DIR, "standin_server.py"), "--port", "0",
+         "--api-latency-ms", str(args.api_latency_ms), "--page-latency-ms", str(args.page_latency_ms),
+         "--llm-latency-ms", str(args.llm_latency_ms), "--error-rate", str(args.error_rate),
+         "--seed", str(args.seed), "--account-articles", str(args.account_articles),
+         "--page-kb", str(args.page_kb)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline().strip()
+    if not line.startswith("[STANDIN] "):
+        proc.kill()
+        raise RuntimeError(f"替身服务启动失败: {line}")
+    return proc, line[len("[STANDIN] "):]
+
+
+def _standin_stats(base_url: str) -> dict:
+    from urllib.request import urlopen
+
+    with urlopen(f"{base_url}/__stats", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def _reset_standin(base_url: str) -> None:
+    """清空替身服务记录的请求出现次数，各扫描点的请求得到相同的延迟和错误"""
+    from urllib.request import Request, urlopen
+
+    with urlopen(Request(f"{base_url}/__reset", data=b"{}", method="POST"), timeout=10) as response:
+        response.read()
+
+
+def _scale_env(base_url: str, point: dict, extra_env: dict) -> dict:
+    """子进程的环境变量：外部服务全部指向替身服务，各阶段的并发上限按扫描点设置"""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": PROJECT_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+        "NO_PROXY": "127.0.0.1,localhost",
+        "WXDOWN_API_BASE": f"{base_url}/api/v1",
+        "API_TOKEN": "",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "OPENAI_API_KEY": "standin",
+        "OPENAI_MODEL": "standin",
+        "ARTICLE_FETCH_CONCURRENCY": str(point["fetch_concurrency"]),
+        "HTTP_MAX_CONNECTIONS": str(point["http_connections"]),
+        "LLM_ENDPOINTS": "",
+        "LLM_ENDPOINTS_FILE": "",
+        "WX_CASSETTE_MODE": "",
+    })
+    if point["llm_concurrency"]:
+        # 通过单端点的 LLM 池限制 LLM 并发
+        env["LLM_ENDPOINTS"] = json.dumps([{"name": "standin", "base_url": f"{base_url}/v1", "api_key": "standin",
+                                            "model": "standin", "max_concurrency": point["llm_concurrency"]}])
+    env.update(extra_env)
+    return env
+
+
+def run_scale_benchmark(args) -> int:
+    """在本地替身服务上扫描任务并发与各阶段并发上限，输出吞吐量与延迟百分位（追加到CSV）"""
+    import csv
+    import itertools
+    import platform
+    import tempfile
+    from datetime import datetime
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = set(modes) - set(SCALE_MODES)
+    if unknown:
+        print(f"❌ 未知的运行方式: {', '.join(sorted(unknown))}（可选 {', '.join(SCALE_MODES)}）")
+        return 1
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    accounts = args.accounts or args.jobs
+    commit = _git_commit()
+
+    server, base_url = _start_standin(args)
+    print(f"替身服务: {base_url}  提交: {commit or '未知'}")
+    rows = []
+    try:
+        for mode, concurrency, fetch_concurrency, http_connections, llm_concurrency, _ in itertools.product(
+                modes, _split_ints(args.concurrency), _split_ints(args.fetch_concurrency),
+                _split_ints(args.http_connections), _split_ints(args.llm_concurrency), range(args.repeat)):
+            point = {"mode": mode, "concurrency": concurrency, "fetch_concurrency": fetch_concurrency,
+                     "http_connections": http_connections, "llm_concurrency": llm_concurrency}
+            # 每个扫描点使用全新的子进程和工作目录，页面归档等缓存不会在扫描点之间共享；
+            # 替身服务同时重置，注入的延迟和错误不受之前扫描点的影响
+            _reset_standin(base_url)
+            with tempfile.TemporaryDirectory(prefix="wx_scale_") as workdir:
+                spec = dict(point, jobs=args.jobs, accounts=accounts, articles=args.articles, warmup=args.warmup,
+                            standin_url=base_url, result_path=os.path.join(workdir, "result.json"))
+                proc = subprocess.run(
+                    [sys.executable, "-c", "import sys, benchmark; sys.exit(benchmark.scale_point(sys.argv[1]))",
+                     json.dumps(spec)],
+                    cwd=workdir, env=_scale_env(base_url, point, extra_env), capture_output=True, text=True,
+                )
+                if proc.returncode != 0:
+                    print(f"❌ 扫描点 {point} 运行失败:\n{proc.stderr[-2000:]}")
+                    return 1
+                with open(spec["result_path"], encoding="utf-8") as f:
+                    result = json.load(f)
+            requests = result["requests"]
+            latencies = result["latencies_ms"]
+            rows.append(dict(
+                point,
+                timestamp=datetime.now().isoformat(timespec="seconds"), commit=commit,
+                python=platform.python_version(), jobs=args.jobs, accounts=accounts, articles=args.articles,
+                warmup=args.warmup,
+                api_latency_ms=args.api_latency_ms, page_latency_ms=args.page_latency_ms,
+                llm_latency_ms=args.llm_latency_ms, error_rate=args.error_rate, seed=args.seed,
+                env=" ".join(args.env), wall_s=round(result["wall_s"], 3),
+                throughput_jobs_per_s=round(args.jobs / result["wall_s"], 3),
+                latency_p50_ms=round(_percentile(latencies, 50), 1),
+                latency_p90_ms=round(_percentile(latencies, 90), 1),
+                latency_p99_ms=round(_percentile(latencies, 99), 1),
+                latency_max_ms=round(max(latencies, default=0), 1),
+                failed_jobs=sum(1 for ok, _ in result["outcomes"] if not ok),
+                short_news=sum(count for _, count in result["outcomes"]),
+                api_requests=requests["api"], page_requests=requests["page"], llm_requests=requests["llm"],
+                injected_errors=result["errors"],
+            ))
+            row = rows[-1]
+            print(f"{mode:<8} 并发 {concurrency:>3}  正文 {fetch_concurrency:>3}  连接 {http_connections:>4}  "
+                  f"LLM {llm_concurrency or '-':>3}  吞吐 {row['throughput_jobs_per_s']:>7.2f} 任务/s  "
+                  f"p50 {row['latency_p50_ms']:>8.1f}ms  p99 {row['latency_p99_ms']:>8.1f}ms  "
+                  f"失败 {row['failed_jobs']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    new_file = not os.path.exists(args.output) or os.path.getsize(args.output) == 0
+    with open(args.output, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SCALE_CSV_FIELDS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n结果已追加到 {args.output}（{len(rows)} 行）")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="微信公众号文章收集工具 性能基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    importtime_parser = subparsers.add_parser("importtime", help="导入耗时预算检查与冷启动时间")
+    importtime_parser.add_argument("--repeat", type=int, default=5, help="每项测量的重复次数")
+    importtime_parser.add_argument("--budget-ms", type=float, default=None,
+                                   help="覆盖所有入口模块的导入预算（毫秒）")
+
+    record_parser = subparsers.add_parser("record", help="执行一次真实任务并录制全部外部调用")
+    record_parser.add_argument("cassette", help="cassette文件路径（.jsonl.gz）")
+    record_parser.add_argument("query", help="用户输入")
+
+    replay_parser = subparsers.add_parser("replay", help="离线回放cassette并测量耗时")
+    replay_parser.add_argument("cassette", help="cassette文件路径（.jsonl.gz）")
+    replay_parser.add_argument("--query", default=None, help="用户输入，默认使用录制时的输入")
+    replay_parser.add_argument("--repeat", type=int, default=3, help="回放次数")
+    replay_parser.add_argument("--latency-scale", type=float, default=1.0,
+                               help="回放延迟缩放，1 为录制时的真实延迟，0 为不等待")
+    replay_parser.add_argument("--order-fallback", action="store_true",
+                               help="键不匹配时按录制顺序回放同类记录（默认直接报错）")
+
+    filter_parser = subparsers.add_parser("filter", help="逐行/向量化筛选与文章历史查询的耗时对比")
+    filter_parser.add_argument("--rows", type=int, default=50000, help="合成文章数")
+    filter_parser.add_argument("--repeat", type=int, default=5)
+
+    scale_parser = subparsers.add_parser("scale", help="在本地替身服务上扫描并发设置，输出吞吐量与延迟百分位CSV")
+    scale_parser.add_argument("--modes", default="async", help=f"运行方式，逗号分隔：{'/'.join(SCALE_MODES)}")
+    scale_parser.add_argument("--concurrency", default="1,2,4,8", help="同时运行的任务数，逗号分隔")
+    scale_parser.add_argument("--fetch-concurrency", default="8", help="每个任务同时获取的正文篇数（ARTICLE_FETCH_CONCURRENCY）")
+    scale_parser.add_argument("--http-connections", default="100", help="异步HTTP连接池上限（HTTP_MAX_CONNECTIONS）")
+    scale_parser.add_argument("--llm-concurrency", default="0", help="LLM并发上限，0 表示不经LLM池、不限制")
+    scale_parser.add_argument("--jobs", type=int, default=16, help="每个扫描点运行的任务数")
+    scale_parser.add_argument("--accounts", type=int, default=None, help="任务涉及的不同公众号数，默认与任务数相同")
+    scale_parser.add_argument("--articles", type=int, default=5, help="每个任务要求的文章数")
+    scale_parser.add_argument("--warmup", type=int, default=1,
+                              help="每个扫描点先运行的预热任务数（不计入结果），0 表示包括冷启动")
+    scale_parser.add_argument("--account-articles", type=int, default=40, help="替身服务中每个公众号的文章数")
+    scale_parser.add_argument("--page-kb", type=int, default=64, help="替身文章页面大小（KB）")
+    scale_parser.add_argument("--api-latency-ms", type=float, default=50)
+    scale_parser.add_argument("--page-latency-ms", type=float, default=100)
+    scale_parser.add_argument("--llm-latency-ms", type=float, default=500)
+    scale_parser.add_argument("--error-rate", type=float, default=0.0, help="每个上游请求返回 HTTP 500 的概率")
+    scale_parser.add_argument("--seed", type=int, default=0, help="延迟与错误注入的随机种子")
+    scale_parser.add_argument("--repeat", type=int, default=1, help="每个扫描点的重复次数")
+    scale_parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                              help="传给任务进程的额外环境变量，可重复，如 --env SINGLE_FLIGHT_ENABLED=false")
+    scale_parser.add_argument("--output", default=os.path.join("output", "benchmarks", "scale.csv"),
+                              help="结果CSV（追加写入，便于比较不同提交）")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "importtime":
+        return run_import_budget(args.repeat, args.budget_ms)
+    if args.command == "record":
+        return run_record(args.cassette, args.query)
+    if args.command == "replay":
+        return run_replay(args.cassette, args.query, args.repeat, args.latency_scale, args.order_fallback)
+    if args.command == "filter":
+        return run_filter_benchmark(args.rows, args.repeat)
+    if args.command == "scale":
+        return run_scale_benchmark(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
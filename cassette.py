@@ -0,0 +1,298 @@
+"""外部调用的录制与回放（cassette）
+
+性能对比需要可复现的输入，而 wxdown API、文章页面和 LLM 每次返回都不一样。
+录制模式下，get_account_info / get_articles / fetch_article_content / llm.invoke
+的每次调用（参数键、返回值、耗时）都写入一个 gzip 压缩的 JSONL cassette 文件；
+回放模式下直接从文件返回这些结果，并按录制耗时（可缩放）sleep，模拟真实延迟。
+异步版本（aget_articles、llm.ainvoke 等）与同步版本共用录制记录，可以互相回放。
+
+通过环境变量启用：
+    WX_CASSETTE_MODE=record|replay
+    WX_CASSETTE_PATH=cassettes/job.jsonl.gz
+    WX_CASSETTE_LATENCY_SCALE=1.0     # 回放延迟缩放，0 表示不等待
+    WX_CASSETTE_ORDER_FALLBACK=false  # 键不匹配时是否按录制顺序兜底
+
+回放时按 (类型, 参数键) 精确匹配，找不到时抛出 CassetteMissError，避免把别的请求的
+录制结果悄悄当成本次结果。LLM 提示词中的"当前日期"在计算键时会被忽略，隔天回放仍能命中；
+修改过提示词或用旧版本录制的 cassette 可以显式开启按录制顺序兜底（order_fallback）。
+
+或在代码中使用：
+    with use_cassette("cassettes/job.jsonl.gz", "replay", latency_scale=0):
+        run_workflow(user_input)
+"""
+import atexit
+import contextlib
+import functools
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import get_env_var
+
+
+RECORD = "record"
+REPLAY = "replay"
+META_KIND = "__meta__"  # 文件首行：录制时的元信息，如用户输入
+# 提示词中随运行日期变化的部分，计算键时替换为固定文本
+_VOLATILE_PROMPT_PATTERN = re.compile(r"当前日期：\d{4}-\d{2}-\d{2}")
+
+
+class CassetteMissError(KeyError):
+    """回放时找不到对应的录制记录"""
+
+
+class Cassette:
+    """一次任务中全部外部调用的录制记录"""
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0,
+                 metadata: Optional[Dict[str, Any]] = None, order_fallback: bool = False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"未知的cassette模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.order_fallback = order_fallback
+        self.metadata: Dict[str, Any] = dict(metadata or {})
+        self._lock = threading.Lock()
+        self._entries = []
+        # 回放索引：按 (类型, 键) 精确匹配；开启 order_fallback 时键不一致才按录制顺序兜底
+        self._by_key: Dict[Tuple[str, str], deque] = defaultdict(deque)
+        self._by_kind: Dict[str, deque] = defaultdict(deque)
+        self._used = set()
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get("kind") == META_KIND:
+                    self.metadata.update(entry.get("metadata", {}))
+                    continue
+                position = len(self._entries)
+                self._entries.append(entry)
+                self._by_key[(entry["kind"], entry["key"])].append(position)
+                self._by_kind[entry["kind"]].append(position)
+        print(f"[CASSETTE] 已加载 {len(self._entries)} 条录制记录: {self.path}")
+
+    def save(self) -> None:
+        if self.mode != RECORD:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            entries = list(self._entries)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"kind": META_KIND, "metadata": self.metadata}, ensure_ascii=False) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        print(f"[CASSETTE] 已保存 {len(entries)} 条录制记录: {self.path}")
+
+    def record(self, kind: str, key: str, response: Any, latency: float) -> None:
+        with self._lock:
+            self._entries.append({"kind": kind, "key": key, "response": response,
+                                  "latency": round(latency, 4)})
+
+    def replay(self, kind: str, key: str) -> Any:
+        """返回录制结果，并按录制耗时等待"""
+        entry = self._take(kind, key)
+        if self.latency_scale > 0:
+            time.sleep(entry["latency"] * self.latency_scale)
+        return entry["response"]
+
+    async def areplay(self, kind: str, key: str) -> Any:
+        """replay 的异步版本，等待时不阻塞事件循环"""
+        import asyncio  # 仅异步路径使用，不拖慢命令行启动
+
+        entry = self._take(kind, key)
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+        return entry["response"]
+
+    def _take(self, kind: str, key: str) -> Dict[str, Any]:
+        with self._lock:
+            position = self._next_unused(self._by_key.get((kind, key)))
+            if position is None:
+                if not self.order_fallback:
+                    raise CassetteMissError(f"cassette中没有匹配的 {kind} 录制记录: {key[:80]}")
+                position = self._next_unused(self._by_kind.get(kind))
+                if position is None:
+                    raise CassetteMissError(f"cassette中没有 {kind} 的录制记录: {key[:80]}")
+                print(f"[CASSETTE] {kind} 键不匹配，按录制顺序回放")
+            self._used.add(position)
+            return self._entries[position]
+
+    def _next_unused(self, positions: Optional[deque]) -> Optional[int]:
+        if not positions:
+            return None
+        for position in positions:
+            if position not in self._used:
+                return position
+        # 全部用过时重复使用最后一条，允许多次回放同一请求
+        return positions[-1]
+
+
+_active: Optional[Cassette] = None
+_env_checked = False
+
+
+def get_active_cassette() -> Optional[Cassette]:
+    """当前生效的cassette；首次调用时按环境变量初始化"""
+    global _active, _env_checked
+    if _active is None and not _env_checked:
+        _env_checked = True
+        mode = get_env_var("WX_CASSETTE_MODE")
+        path = get_env_var("WX_CASSETTE_PATH")
+        if mode and path:
+            _active = Cassette(
+                path, mode, float(get_env_var("WX_CASSETTE_LATENCY_SCALE", "1.0")),
+                order_fallback=get_env_var("WX_CASSETTE_ORDER_FALLBACK", "false").lower() == "true",
+            )
+            if mode == RECORD:
+                atexit.register(_active.save)
+    return _active
+
+
+@contextlib.contextmanager
+def use_cassette(path: str, mode: str, latency_scale: float = 1.0,
+                 metadata: Optional[Dict[str, Any]] = None, order_fallback: bool = False):
+    """在代码块内启用cassette，录制模式在退出时保存"""
+    global _active
+    previous = _active
+    cassette = Cassette(path, mode, latency_scale, metadata, order_fallback)
+    _active = cassette
+    try:
+        yield cassette
+    finally:
+        _active = previous
+        cassette.save()
+
+
+def _call_key(args: tuple, kwargs: dict) -> str:
+    return json.dumps([list(args), kwargs], ensure_ascii=False, sort_keys=True, default=str)
+
+
+def recorded(kind: str) -> Callable:
+    """装饰外部调用函数：录制模式记录返回值，回放模式直接返回录制结果"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cassette = get_active_cassette()
+            if cassette is None:
+                return fn(*args, **kwargs)
+            key = _call_key(args, kwargs)
+            if cassette.mode == REPLAY:
+                return cassette.replay(kind, key)
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            cassette.record(kind, key, result, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+
+def arecorded(kind: str) -> Callable:
+    """recorded 的异步版本；与同名的同步调用使用相同的 kind，录制记录可以互相回放"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            cassette = get_active_cassette()
+            if cassette is None:
+                return await fn(*args, **kwargs)
+            key = _call_key(args, kwargs)
+            if cassette.mode == REPLAY:
+                return await cassette.areplay(kind, key)
+            start = time.perf_counter()
+            result = await fn(*args, **kwargs)
+            cassette.record(kind, key, result, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+
+def _messages_key(messages) -> str:
+    text = "\n".join(getattr(message, "content", str(message)) for message in messages)
+    text = _VOLATILE_PROMPT_PATTERN.sub("当前日期：", text)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class CassetteLLM:
+    """包装 LLM：录制/回放 invoke 和 stream 的返回内容；回放模式下不需要真实的 LLM
+
+    invoke、stream 及其异步版本使用同一类录制记录，录制时用哪种方式调用都可以用另一种方式回放。
+    """
+
+    def __init__(self, llm, cassette: Cassette):
+        self._llm = llm
+        self._cassette = cassette
+
+    def bind(self, **kwargs) -> "CassetteLLM":
+        """绑定调用参数（如 response_format），回放模式下忽略"""
+        if self._cassette.mode == REPLAY:
+            return self
+        return CassetteLLM(self._llm.bind(**kwargs), self._cassette)
+
+    def invoke(self, messages, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        key = _messages_key(messages)
+        if self._cassette.mode == REPLAY:
+            return AIMessage(content=self._cassette.replay("llm.invoke", key))
+        start = time.perf_counter()
+        response = self._llm.invoke(messages, **kwargs)
+        self._cassette.record("llm.invoke", key, response.content, time.perf_counter() - start)
+        return response
+
+    def stream(self, messages, **kwargs):
+        from langchain_core.messages import AIMessageChunk
+
+        key = _messages_key(messages)
+        if self._cassette.mode == REPLAY:
+            yield AIMessageChunk(content=self._cassette.replay("llm.invoke", key))
+            return
+        start = time.perf_counter()
+        parts = []
+        for chunk in self._llm.stream(messages, **kwargs):
+            parts.append(chunk.content if isinstance(chunk.content, str) else "")
+            yield chunk
+        self._cassette.record("llm.invoke", key, "".join(parts), time.perf_counter() - start)
+
+    async def ainvoke(self, messages, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        key = _messages_key(messages)
+        if self._cassette.mode == REPLAY:
+            return AIMessage(content=await self._cassette.areplay("llm.invoke", key))
+        start = time.perf_counter()
+        response = await self._llm.ainvoke(messages, **kwargs)
+        self._cassette.record("llm.invoke", key, response.content, time.perf_counter() - start)
+        return response
+
+    async def astream(self, messages, **kwargs):
+        from langchain_core.messages import AIMessageChunk
+
+        key = _messages_key(messages)
+        if self._cassette.mode == REPLAY:
+            yield AIMessageChunk(content=await self._cassette.areplay("llm.invoke", key))
+            return
+        start = time.perf_counter()
+        parts = []
+        async for chunk in self._llm.astream(messages, **kwargs):
+            parts.append(chunk.content if isinstance(chunk.content, str) else "")
+            yield chunk
+        self._cassette.record("llm.invoke", key, "".join(parts), time.perf_counter() - start)
+
+
+def wrap_llm(llm):
+    """有生效的cassette时返回包装后的LLM，否则原样返回"""
+    cassette = get_active_cassette()
+    if cassette is None:
+        return llm
+    return CassetteLLM(llm, cassette)
@@ -0,0 +1,318 @@
+"""CPU 采样分析（main.py --profile / worker.py --profile）
+
+以前只能手工包一层 cProfile 运行 main.py，而且 cProfile 只统计调用它的线程，
+看不到线程池中执行的正文解析和导出。这里用一个后台线程定时采样所有线程的调用栈（sys._current_frames）：
+- 每个样本按该线程自上次采样以来消耗的 CPU 时间加权（time.pthread_getcpuclockid），
+  等待网络和 LLM 响应的线程不计入；不支持的平台退回按采样间隔计权，此时包括等待时间
+- 调用栈中出现工作流节点函数时，样本归入该节点；节点通过 asyncio.gather 派生的任务、
+  通过 asyncio.to_thread 放到线程池的函数用 bind_node 包装后同样归入该节点，
+  其余样本（LangGraph 调度、事件循环等）归入“(节点外)”
+- 每个样本再归入一个库：最后一个项目代码帧调用的第三方库或标准库模块（bs4、pandas、dateutil、
+  langgraph 等），用于判断 CPU 时间主要花在哪个依赖上；延迟导入模块的耗时单独归为“导入 <库>”
+
+每次任务结束后在 CPU_PROFILE_DIR 下写出两个文件并打印报告：
+- *.collapsed：折叠调用栈（每行“节点;帧;帧;... 微秒数”），可直接交给 flamegraph.pl 或 speedscope 生成火焰图
+- *.txt：按节点汇总的 CPU 时间、按库的占比和自身耗时最多的函数
+
+配置（.env）：
+    CPU_PROFILE_DIR=output/profiles
+    CPU_PROFILE_INTERVAL_MS=5        # 采样间隔
+    CPU_PROFILE_TOP=10               # 每个节点输出的函数数
+"""
+import contextlib
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from config import get_env_var
+
+
+OUTSIDE_NODES = "(节点外)"
+PROJECT_CODE = "项目代码"
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 节点函数的代码对象 → 节点名（由 create_workflow 登记）
+_node_codes: Dict[object, str] = {}
+# 节点派生出去的工作（asyncio 任务、线程池中的函数）运行时的栈帧 → 节点名（由 bind_node 登记）
+_frame_nodes: Dict[object, str] = {}
+_active: Optional["CPUProfiler"] = None
+
+
+def register_nodes(nodes: Dict[str, Callable]) -> None:
+    """登记工作流节点函数，采样时据此把调用栈归入节点"""
+    for name, fn in nodes.items():
+        code = getattr(fn, "__code__", None)
+        if code is not None:
+            _node_codes[code] = name
+
+
+def current_node() -> Optional[str]:
+    """当前调用栈所在的工作流节点（最外层的节点帧）"""
+    node = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        node = _node_codes.get(frame.f_code) or _frame_nodes.get(frame) or node
+        frame = frame.f_back
+    return node
+
+
+def bind_node(fn: Callable) -> Callable:
+    """包装节点派生出去的函数或协程函数（asyncio.gather 的任务、asyncio.to_thread 的函数），
+    使其中的样本归入调用方所在的节点；未开启采样时原样返回"""
+    if _active is None:
+        return fn
+    node = current_node()
+    if node is None:
+        return fn
+
+    import inspect
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            frame = sys._getframe()
+            _frame_nodes[frame] = node
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _frame_nodes.pop(frame, None)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        frame = sys._getframe()
+        _frame_nodes[frame] = node
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _frame_nodes.pop(frame, None)
+    return wrapper
+
+
+class _Locations:
+    """代码对象的显示名与所属库（按文件路径判断），结果缓存"""
+
+    def __init__(self):
+        import sysconfig
+
+        paths = sysconfig.get_paths()
+        self.stdlib = os.path.normcase(paths["stdlib"])
+        self._labels: Dict[object, str] = {}
+        self._libraries: Dict[object, Optional[str]] = {}
+
+    def label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({self._short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _short_path(self, filename: str) -> str:
+        parts = re.split(r"[\\/](?:site|dist)-packages[\\/]", filename)
+        if len(parts) > 1:
+            return parts[-1].replace("\\", "/")
+        path = os.path.normcase(os.path.abspath(filename))
+        for base in (_PROJECT_DIR, self.stdlib):
+            if path.startswith(os.path.normcase(base) + os.sep):
+                return os.path.relpath(path, base).replace("\\", "/")
+        return filename
+
+    def library(self, code) -> Optional[str]:
+        """第三方库或标准库模块的顶层名；项目代码返回 None"""
+        if code in self._libraries:
+            return self._libraries[code]
+        filename = code.co_filename
+        parts = re.split(r"[\\/](?:site|dist)-packages[\\/]", filename)
+        if len(parts) > 1:
+            library = re.split(r"[\\/]", parts[-1])[0]
+            library = library[:-3] if library.endswith(".py") else library
+        elif os.path.normcase(os.path.abspath(filename)).startswith(os.path.normcase(_PROJECT_DIR) + os.sep):
+            library = None
+        else:
+            # 标准库（含 <frozen ...> 模块）按顶层模块名归类
+            short = self._short_path(filename)
+            library = re.split(r"[/.<> ]", short.strip("<>"))[0] or short
+        self._libraries[code] = library
+        return library
+
+    def sample_library(self, codes: Tuple) -> str:
+        """样本归入的库：最后一个项目代码帧调用的库；栈中没有项目代码时取第一个第三方库
+
+        正在导入模块（延迟导入的 pandas、bs4 等）的样本单独归为“导入 <最外层被导入的库>”。
+        """
+        importing = False
+        for code in codes:
+            if code.co_filename.startswith("<frozen importlib"):
+                importing = True
+            elif importing and code.co_name == "<module>":
+                return f"导入 {self.library(code) or PROJECT_CODE}"
+        if importing:
+            return "导入"  # 查找模块阶段，尚未开始执行被导入的模块
+        last_project = None
+        for i, code in enumerate(codes):
+            if self.library(code) is None:
+                last_project = i
+        if last_project is not None:
+            if last_project == len(codes) - 1:
+                return PROJECT_CODE
+            return self.library(codes[last_project + 1])
+        for code in codes:
+            filename = code.co_filename
+            if re.search(r"[\\/](?:site|dist)-packages[\\/]", filename):
+                return self.library(code)
+        return self.library(codes[-1])
+
+
+class CPUProfiler:
+    """后台线程定时采样所有线程的调用栈，按线程 CPU 时间加权"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.cpu_weighted = hasattr(time, "pthread_getcpuclockid")
+        self.samples = 0
+        self.stacks: Counter = Counter()   # (节点, 由外到内的代码对象) → 权重（微秒）
+        # 以 (线程标识, 系统线程号) 为键：线程退出后 Python 会复用线程标识，系统线程号区分新旧线程
+        self._clocks: Dict[Tuple[int, Optional[int]], int] = {}
+        self._last_cpu: Dict[Tuple[int, Optional[int]], float] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cpu-profile", daemon=True)
+        self.started_at = 0.0
+        self.elapsed = 0.0
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own)
+
+    def _weight(self, key: Tuple[int, Optional[int]]) -> int:
+        """线程自上次采样以来的 CPU 时间（微秒）；不支持时按采样间隔计"""
+        if not self.cpu_weighted:
+            return int(self.interval * 1e6)
+        try:
+            clock = self._clocks.get(key)
+            if clock is None:
+                clock = self._clocks[key] = time.pthread_getcpuclockid(key[0])
+            now = time.clock_gettime(clock)
+        except OSError:
+            return 0  # 线程已退出
+        last = self._last_cpu.get(key)
+        self._last_cpu[key] = now
+        return 0 if last is None else int((now - last) * 1e6)
+
+    def _sample(self, own: int) -> None:
+        self.samples += 1
+        frames = sys._current_frames()
+        native_ids = {thread.ident: thread.native_id for thread in threading.enumerate()}
+        keys = {ident: (ident, native_ids.get(ident)) for ident in frames}
+        # 丢弃已退出线程的时钟，避免复用同一标识的新线程读到旧线程的时钟
+        live = set(keys.values())
+        for key in [key for key in self._clocks if key not in live]:
+            del self._clocks[key]
+            self._last_cpu.pop(key, None)
+        for ident, frame in frames.items():
+            if ident == own:
+                continue
+            weight = self._weight(keys[ident])
+            if weight <= 0:
+                continue
+            codes = []
+            node = None
+            # 由内向外遍历，最后得到的是最外层的节点
+            while frame is not None:
+                code = frame.f_code
+                codes.append(code)
+                node = _node_codes.get(code) or _frame_nodes.get(frame) or node
+                frame = frame.f_back
+            codes.reverse()
+            self.stacks[(node or OUTSIDE_NODES, tuple(codes))] += weight
+
+    def collapsed(self, locations: _Locations) -> Iterator[str]:
+        """折叠调用栈格式的各行，节点名作为根帧"""
+        lines = Counter()
+        for (node, codes), weight in self.stacks.items():
+            lines[";".join([node] + [locations.label(code) for code in codes])] += weight
+        for stack, weight in sorted(lines.items()):
+            yield f"{stack} {weight}"
+
+    def report(self, label: str, locations: _Locations, top: int) -> str:
+        node_total: Counter = Counter()
+        node_libraries: Dict[str, Counter] = defaultdict(Counter)
+        node_functions: Dict[str, Counter] = defaultdict(Counter)
+        for (node, codes), weight in self.stacks.items():
+            node_total[node] += weight
+            node_libraries[node][locations.sample_library(codes)] += weight
+            node_functions[node][codes[-1]] += weight
+        total = sum(node_total.values()) or 1
+
+        weight_name = "线程CPU时间" if self.cpu_weighted else "墙钟时间（含等待）"
+        lines = [f"=== CPU 采样报告（{label}） ===",
+                 f"采样 {self.samples} 次，间隔 {self.interval * 1000:.0f}ms，权重：{weight_name}；"
+                 f"运行 {self.elapsed:.2f}s，采样到 {total / 1e6:.2f}s"]
+        lines.append(f"{'节点':<24}{'CPU时间':>10}{'占比':>8}")
+        for node, weight in node_total.most_common():
+            lines.append(f"{node:<24}{weight / 1e6:>9.2f}s{weight / total:>8.1%}")
+
+        for node, weight in node_total.most_common():
+            libraries = ", ".join(f"{library} {lib_weight / weight:.0%}"
+                                  for library, lib_weight in node_libraries[node].most_common(6))
+            lines.append(f"\n[{node}] {weight / 1e6:.2f}s  按库：{libraries}")
+            lines.append("  自身耗时最多的函数：")
+            for code, fn_weight in node_functions[node].most_common(top):
+                lines.append(f"  {fn_weight / 1e6:>8.3f}s {fn_weight / total:>6.1%}  {locations.label(code)}")
+        return "\n".join(lines)
+
+
+def _profile_dir() -> str:
+    return get_env_var("CPU_PROFILE_DIR", os.path.join("output", "profiles"))
+
+
+@contextlib.contextmanager
+def profiling(label: str) -> Iterator[Optional[CPUProfiler]]:
+    """在 with 块运行期间采样，结束后写出折叠调用栈和报告；已有采样在进行时不重复开启"""
+    global _active
+    if _active is not None:
+        yield None
+        return
+
+    profiler = CPUProfiler(float(get_env_var("CPU_PROFILE_INTERVAL_MS", "5")) / 1000)
+    _active = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active = None
+        write_profile(profiler, label)
+
+
+def write_profile(profiler: CPUProfiler, label: str) -> Tuple[str, str]:
+    """写出 .collapsed 和 .txt 文件并打印报告，返回两个文件路径"""
+    locations = _Locations()
+    report = profiler.report(label, locations, int(get_env_var("CPU_PROFILE_TOP", "10")))
+    os.makedirs(_profile_dir(), exist_ok=True)
+    base = os.path.join(_profile_dir(), f"cpu_{re.sub(r'[^A-Za-z0-9_-]', '_', label)}_"
+                                        f"{datetime.now():%Y%m%d_%H%M%S}")
+    with open(base + ".collapsed", "w", encoding="utf-8") as f:
+        for line in profiler.collapsed(locations):
+            f.write(line + "\n")
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(report + "\n")
+    print(report)
+    print(f"[PROFILE] 折叠调用栈: {base}.collapsed（flamegraph.pl 或 speedscope 可生成火焰图）")
+    print(f"[PROFILE] 报告: {base}.txt")
+    return base + ".collapsed", base + ".txt"
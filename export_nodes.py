@@ -1,34 +1,40 @@
-import pandas as pd
 from datetime import datetime
 import os
 
 from workflow_state import WorkflowState
+from article_batch import ArticleBatch, NO_TIME
+from rolling_dataset import MERGE, export_mode
 
 
 def export_to_excel_node(state: WorkflowState) -> WorkflowState:
     """将短新闻列表导出到Excel文件"""
+    import pandas as pd  # pandas较重，仅在导出时导入
+
     short_news_list = state["short_news_list"]
     print(f"[DEBUG] 准备导出，短新闻数量: {len(short_news_list)}")
     
+    # 合并导出模式只更新滚动数据集，不生成带时间戳的单次文件（包括没有短新闻的情况）
+    if export_mode() == MERGE:
+        return merge_export(state)
+    
     if not short_news_list:
         # 如果没有短新闻数据，尝试直接导出文章列表
-        filtered_articles = state.get("filtered_articles", [])
+        filtered_articles = ArticleBatch.from_dicts(state.get("filtered_articles") or [])
         print(f"[DEBUG] 没有短新闻，尝试导出原文章，文章数量: {len(filtered_articles)}")
         
         if not filtered_articles:
             state["error_message"] = "没有找到符合条件的文章可以导出"
             return state
         
-        # 将文章转换为简单格式导出
-        excel_data = []
-        for i, article in enumerate(filtered_articles, 1):
-            excel_data.append({
-                "序号": i,
-                "文章标题": article["title"],
-                "发布时间": article["publish_time"],
-                "文章链接": article["link"],
-                "创建时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
+        # 直接按列导出，无需逐行构造字典
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        excel_data = {
+            "序号": range(1, len(filtered_articles) + 1),
+            "文章标题": filtered_articles.titles,
+            "发布时间": [str(ts) if ts != NO_TIME else "" for ts in filtered_articles.publish_ts],
+            "文章链接": filtered_articles.links,
+            "创建时间": [created_at] * len(filtered_articles)
+        }
         
         try:
             # 创建DataFrame
@@ -126,6 +132,35 @@ def export_to_excel_node(state: WorkflowState) -> WorkflowState:
     return state
 
 
+def merge_export(state: WorkflowState) -> WorkflowState:
+    """合并导出：把新的短新闻追加到该公众号的滚动数据集，已导出过的跳过
+
+    没有短新闻时数据集保持不变；连筛选后的文章也没有时与单次导出一样报错。
+    """
+    from rolling_dataset import RollingDataset
+
+    short_news_list = state["short_news_list"]
+    if not short_news_list and not state.get("filtered_articles"):
+        state["error_message"] = "没有找到符合条件的文章可以导出"
+        return state
+    if not short_news_list:
+        print("[DEBUG] 没有短新闻，滚动数据集保持不变")
+    
+    # 按 fake_id 区分公众号：同一公众号换个搜索关键词也追加到同一个数据集
+    account = state.get("fake_id") or state.get("account_keyword") or "unknown"
+    try:
+        dataset = RollingDataset(account)
+        result = dataset.append(short_news_list)
+        state["excel_file_path"] = dataset.path
+        state.setdefault("run_stats", {})["export"] = result
+        print(f"已合并到数据集: {dataset.path}")
+        print(f"新增 {result['added']} 条短新闻，跳过已存在的 {result['duplicates']} 条")
+    except Exception as e:
+        state["error_message"] = f"合并导出时出错: {str(e)}"
+    
+    return state
+
+
 def should_continue(state: WorkflowState) -> str:
     """决定工作流是否继续"""
     print(f"[DEBUG] 检查工作流状态...")
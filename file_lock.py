@@ -0,0 +1,37 @@
+"""多进程共享缓存文件的写入锁
+
+页面归档、套话统计、短链接别名表等缓存文件可能被多个任务进程同时更新。
+写入方在锁内重新读取磁盘上的最新内容、合并自己的改动，再写入各自的临时文件并原子替换，
+避免后写入的进程覆盖先写入进程的数据。
+"""
+import os
+import threading
+
+
+class file_lock:
+    """对 {path}.lock 加排他锁（不支持 fcntl 的平台上只依赖调用方的线程锁）"""
+
+    def __init__(self, path: str):
+        self.path = path + ".lock"
+        self._file = None
+
+    def __enter__(self):
+        try:
+            import fcntl
+        except ImportError:
+            return self
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def writer_tmp_path(path: str) -> str:
+    """每个写入方（进程 + 线程）各自的临时文件名，写完后用 os.replace 替换目标文件"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
@@ -0,0 +1,378 @@
+"""多机 worker 共享的任务队列
+
+单个进程处理不完批量任务时，可以在多台机器上启动 worker.py，从同一个队列领取任务
+（每个任务是一条 user_input 或一个公众号）并执行工作流，不需要外部消息中间件。
+
+两种实现，接口相同：
+- SQLiteJobQueue：SQLite 文件，可放在共享存储上供多台机器直接访问
+  （网络文件系统上不使用 WAL 模式，依赖 SQLite 的文件锁）
+- HTTPJobQueue：访问 `python job_queue.py serve` 启动的小型队列服务，适合共享存储不支持文件锁的场景
+
+可靠性：
+- 租约：worker 领取任务后持有一段时间的租约，期间通过心跳续约；
+  worker 崩溃、租约过期后任务会被其他 worker 重新领取
+- 重试：执行失败按指数退避重新排队，超过最大尝试次数后标记为 failed
+- 幂等：任务 id 默认由任务内容计算，重复提交同一任务不会产生重复执行
+
+用法：
+    python job_queue.py submit "请查询银行科技研究社的文章，最近5篇"
+    python job_queue.py submit --account 科技日报 --account 创业邦
+    python job_queue.py status
+    python job_queue.py serve --port 8765            # 队列服务（默认只监听本机），worker 使用 --queue http://host:8765
+    python job_queue.py serve --host 0.0.0.0         # 接受其他机器的worker；服务没有鉴权，只应在受信任的内网开放
+
+配置（.env）：
+    JOB_QUEUE_URL=cache/jobs.db        # SQLite 文件路径，或 http://host:port
+    JOB_LEASE_SECONDS=300
+    JOB_MAX_ATTEMPTS=3
+    JOB_RETRY_DELAY=30                 # 首次重试的等待秒数，之后指数增长
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional, TypedDict
+
+from config import get_env_var
+
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job(TypedDict):
+    id: str
+    payload: Dict[str, Any]   # {"user_input": ...} 或 {"account": ..., "query": ...}
+    status: str
+    attempts: int
+    max_attempts: int
+    lease_owner: Optional[str]
+    lease_expires: Optional[float]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+
+def job_id_for(payload: Dict[str, Any]) -> str:
+    """由任务内容计算幂等的任务id"""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class JobQueue:
+    """任务队列接口"""
+
+    def submit(self, payload: Dict[str, Any], job_id: Optional[str] = None,
+               max_attempts: Optional[int] = None) -> str:
+        """提交任务；相同id的任务已存在时不重复提交，返回任务id"""
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Job]:
+        """领取一个可执行的任务并持有租约；没有任务时返回None"""
+        raise NotImplementedError
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """续约；租约已被其他worker接管时返回False"""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """记录一次失败；未超过最大尝试次数时按退避时间重新排队"""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class SQLiteJobQueue(JobQueue):
+    """基于SQLite文件的任务队列，每次操作使用独立连接，可跨线程、跨进程、跨机器共享"""
+
+    def __init__(self, path: str, max_attempts: Optional[int] = None, retry_delay: Optional[float] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_attempts = max_attempts or int(get_env_var("JOB_MAX_ATTEMPTS", "3"))
+        self.retry_delay = retry_delay if retry_delay is not None else float(get_env_var("JOB_RETRY_DELAY", "30"))
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None：手动控制事务，领取任务时用 BEGIN IMMEDIATE 抢写锁
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            payload=json.loads(row["payload"]),
+            status=row["status"],
+            attempts=row["attempts"],
+            max_attempts=row["max_attempts"],
+            lease_owner=row["lease_owner"],
+            lease_expires=row["lease_expires"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+        )
+
+    def submit(self, payload, job_id=None, max_attempts=None) -> str:
+        job_id = job_id or job_id_for(payload)
+        now = time.time()
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, payload, status, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload, ensure_ascii=False), PENDING,
+                 max_attempts or self.max_attempts, now, now, now),
+            )
+        return job_id
+
+    def claim(self, worker_id, lease_seconds) -> Optional[Job]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # 租约过期且已用完尝试次数的任务直接标记失败
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = COALESCE(error, '租约过期'), lease_owner = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+                (FAILED, now, RUNNING, now),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?) "
+                "ORDER BY available_at LIMIT 1",
+                (PENDING, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["status"] == RUNNING:
+                print(f"[QUEUE] 任务 {row['id']} 的租约已过期（原worker {row['lease_owner']}），重新领取")
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, worker_id, now + lease_seconds, now, row["id"]),
+            )
+            claimed = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+            return self._to_job(claimed)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _update_owned(self, job_id: str, worker_id: str, sql: str, params: tuple) -> bool:
+        """只在当前worker仍持有租约时更新"""
+        with contextlib.closing(self._connect()) as conn:
+            cursor = conn.execute(sql + " WHERE id = ? AND status = ? AND lease_owner = ?",
+                                  params + (job_id, RUNNING, worker_id))
+            return cursor.rowcount == 1
+
+    def heartbeat(self, job_id, worker_id, lease_seconds) -> bool:
+        now = time.time()
+        return self._update_owned(job_id, worker_id, "UPDATE jobs SET lease_expires = ?, updated_at = ?",
+                                  (now + lease_seconds, now))
+
+    def complete(self, job_id, worker_id, result) -> bool:
+        return self._update_owned(
+            job_id, worker_id,
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_owner = NULL, lease_expires = NULL, updated_at = ?",
+            (DONE, json.dumps(result, ensure_ascii=False, default=str), time.time()),
+        )
+
+    def fail(self, job_id, worker_id, error) -> bool:
+        job = self.get(job_id)
+        if job is None:
+            return False
+        now = time.time()
+        if job["attempts"] >= job["max_attempts"]:
+            return self._update_owned(
+                job_id, worker_id,
+                "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?",
+                (FAILED, error, now),
+            )
+        delay = self.retry_delay * (2 ** (job["attempts"] - 1))
+        return self._update_owned(
+            job_id, worker_id,
+            "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL, "
+            "updated_at = ?",
+            (PENDING, error, now + delay, now),
+        )
+
+    def get(self, job_id) -> Optional[Job]:
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with contextlib.closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+class HTTPJobQueue(JobQueue):
+    """访问队列服务的客户端，仅使用标准库"""
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method: str, **params) -> Any:
+        from urllib import request
+
+        data = json.dumps(params, ensure_ascii=False).encode("utf-8")
+        req = request.Request(f"{self.base_url}/{method}", data=data,
+                              headers={"Content-Type": "application/json"}, method="POST")
+        with request.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))["result"]
+
+    def submit(self, payload, job_id=None, max_attempts=None) -> str:
+        return self._call("submit", payload=payload, job_id=job_id, max_attempts=max_attempts)
+
+    def claim(self, worker_id, lease_seconds):
+        return self._call("claim", worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def heartbeat(self, job_id, worker_id, lease_seconds) -> bool:
+        return self._call("heartbeat", job_id=job_id, worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def complete(self, job_id, worker_id, result) -> bool:
+        return self._call("complete", job_id=job_id, worker_id=worker_id, result=result)
+
+    def fail(self, job_id, worker_id, error) -> bool:
+        return self._call("fail", job_id=job_id, worker_id=worker_id, error=error)
+
+    def get(self, job_id):
+        return self._call("get", job_id=job_id)
+
+    def counts(self) -> Dict[str, int]:
+        return self._call("counts")
+
+
+# 队列服务对外开放的方法
+SERVER_METHODS = ("submit", "claim", "heartbeat", "complete", "fail", "get", "counts")
+
+
+def serve(queue: JobQueue, host: str = "127.0.0.1", port: int = 8765) -> None:
+    """把队列以 HTTP JSON 接口提供给worker；接口没有鉴权，默认只监听本机"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = self.path.strip("/")
+            if method not in SERVER_METHODS:
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            params = json.loads(self.rfile.read(length) or b"{}")
+            try:
+                body = {"result": getattr(queue, method)(**params)}
+                status = 200
+            except Exception as e:
+                body = {"error": str(e)}
+                status = 500
+            data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"[QUEUE] 队列服务已启动: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[QUEUE] 队列服务已停止")
+    finally:
+        server.server_close()
+
+
+def open_queue(url: Optional[str] = None) -> JobQueue:
+    """按 URL 打开队列：http(s):// 为队列服务，其余视为 SQLite 文件路径（可带 sqlite:// 前缀）"""
+    url = url or get_env_var("JOB_QUEUE_URL", "cache/jobs.db")
+    if url.startswith(("http://", "https://")):
+        return HTTPJobQueue(url)
+    if url.startswith("sqlite://"):
+        url = url[len("sqlite://"):]
+    return SQLiteJobQueue(url)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="任务队列管理")
+    parser.add_argument("--queue", default=None, help="队列地址：SQLite 文件路径或 http://host:port")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = subparsers.add_parser("submit", help="提交任务")
+    submit_parser.add_argument("queries", nargs="*", help="用户输入，每条一个任务")
+    submit_parser.add_argument("--account", action="append", default=[], help="公众号名称，每个一个任务")
+    submit_parser.add_argument("--job-id", default=None, help="指定任务id（仅提交单个任务时）")
+
+    subparsers.add_parser("status", help="查看各状态的任务数")
+
+    serve_parser = subparsers.add_parser("serve", help="启动队列服务")
+    serve_parser.add_argument("--db", default="cache/jobs.db", help="服务端使用的SQLite文件")
+    serve_parser.add_argument("--host", default="127.0.0.1",
+                              help="监听地址，默认只监听本机；其他机器的worker访问时设为 0.0.0.0（没有鉴权，仅限受信任网络）")
+    serve_parser.add_argument("--port", type=int, default=8765)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(SQLiteJobQueue(args.db), args.host, args.port)
+        return 0
+
+    queue = open_queue(args.queue)
+    if args.command == "submit":
+        payloads: List[Dict[str, Any]] = [{"user_input": query} for query in args.queries]
+        payloads += [{"account": account} for account in args.account]
+        if not payloads:
+            print("❌ 请提供至少一个用户输入或 --account")
+            return 1
+        for payload in payloads:
+            job_id = queue.submit(payload, job_id=args.job_id if len(payloads) == 1 else None)
+            print(f"已提交任务 {job_id}: {payload}")
+        return 0
+
+    if args.command == "status":
+        for status, count in queue.counts().items():
+            print(f"{status:<8} {count}")
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
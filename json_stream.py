@@ -0,0 +1,200 @@
+"""LLM返回JSON的增量解析与修复
+
+原先对整段返回直接 json.loads，模型用 ```json 代码块包裹或输出被截断时解析失败，
+整篇文章降级为一条1000字的"短新闻"，这次LLM调用等于白花。这里：
+- ShortNewsStreamParser 逐块接收流式输出，short_news 数组中每个条目一完整就立即产出，
+  不受前后的代码块标记或说明文字影响
+- 输出被截断时，已完整的条目全部保留，最后一个不完整的条目尽量修复（补全字符串和括号）
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+
+ITEMS_KEY = "short_news"
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def strip_code_fences(text: str) -> str:
+    """去掉包裹JSON的 markdown 代码块标记"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+    if text.rstrip().endswith("```"):
+        text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def _scan(text: str):
+    """返回 (未闭合的括号栈, 是否停在字符串内, 是否停在转义符后)"""
+    stack = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]" and stack:
+            stack.pop()
+    return stack, in_string, escape
+
+
+def _close(prefix: str) -> str:
+    """为前缀补上未闭合的字符串和括号"""
+    stack, in_string, escape = _scan(prefix)
+    if escape:
+        prefix = prefix[:-1]
+    if in_string:
+        prefix += '"'
+    prefix = prefix.rstrip().rstrip(",")
+    return prefix + "".join(_CLOSERS[ch] for ch in reversed(stack))
+
+
+def repair_json(text: str, max_attempts: int = 50) -> Optional[Any]:
+    """尽量把被截断的JSON修复为合法值；先直接补全，不行再逐个退回到前一个逗号处补全"""
+    text = strip_code_fences(text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    candidate = text
+    for _ in range(max_attempts):
+        try:
+            return json.loads(_close(candidate))
+        except json.JSONDecodeError:
+            pass
+        # 退回到前一个不在字符串内的逗号
+        cut = _last_comma_outside_string(candidate)
+        if cut is None:
+            return None
+        candidate = candidate[:cut]
+    return None
+
+
+def _last_comma_outside_string(text: str) -> Optional[int]:
+    last = None
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == ",":
+            last = i
+    return last
+
+
+class ShortNewsStreamParser:
+    """增量解析 {"short_news": [{...}, ...]}，每个条目闭合时立即产出
+
+    也接受顶层直接是数组的返回。feed() 只扫描新到达的部分。
+    """
+
+    def __init__(self, items_key: str = ITEMS_KEY):
+        self.items_key = items_key
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._after_colon = False
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+        self.found_array = False   # 是否找到了条目数组
+        self.array_closed = False
+        self.truncated = False
+        self.items_parsed = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """接收一段新输出，返回其中新完成的条目"""
+        if not chunk:
+            return []
+        self._buffer += chunk
+        items = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                self._after_colon = True
+                continue
+            elif ch in "{[":
+                if (ch == "[" and self._array_depth is None and not self.array_closed
+                        and (not self._stack or (self._after_colon and self._last_string == self.items_key))):
+                    self._array_depth = len(self._stack) + 1
+                    self.found_array = True
+                elif (ch == "{" and self._array_depth is not None
+                      and len(self._stack) == self._array_depth):
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                depth = len(self._stack)
+                if ch == "}" and self._item_start is not None and depth == self._array_depth:
+                    item = self._load_item(buffer[self._item_start:i + 1])
+                    if item is not None:
+                        items.append(item)
+                    self._item_start = None
+                elif ch == "]" and self._array_depth is not None and depth == self._array_depth - 1:
+                    self._array_depth = None
+                    self.array_closed = True
+            if not ch.isspace():
+                self._after_colon = False
+        self._pos = len(buffer)
+        return items
+
+    def _load_item(self, text: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            item = repair_json(text)
+        if not isinstance(item, dict):
+            return None
+        self.items_parsed += 1
+        return item
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """输出结束：数组未闭合说明被截断，尝试修复最后一个不完整的条目"""
+        if not self.found_array or self.array_closed:
+            return []
+        self.truncated = True
+        if self._item_start is None:
+            return []
+        item = repair_json(self._buffer[self._item_start:])
+        self._item_start = None
+        if isinstance(item, dict) and item.get("title") and item.get("content"):
+            self.items_parsed += 1
+            return [item]
+        return []
+
+    @property
+    def text(self) -> str:
+        return self._buffer
@@ -0,0 +1,176 @@
+"""多关键词匹配：Aho-Corasick 自动机 + OR/AND/NOT 关键词组
+
+标题关键词筛选原先对每个标题逐个执行 `keyword in title`，耗时为 标题数 × 关键词数 × 长度。
+这里把所有关键词编译成一个 Aho-Corasick 自动机，每段文本只需扫描一遍即可得到全部命中的关键词。
+自动机按 FilterConditions 中的关键词组合缓存，跨分页、跨公众号复用。
+
+关键词组语义：
+- title_keywords     (OR)  至少命中其中一个
+- required_keywords  (AND) 必须全部命中
+- excluded_keywords  (NOT) 不能命中任何一个
+匹配不区分英文大小写；match_body 为真时同时在正文中匹配。
+"""
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from workflow_state import FilterConditions
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式串匹配自动机"""
+
+    __slots__ = ("patterns", "_goto", "_fail", "_output")
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[int]] = [frozenset()]
+
+        outputs: List[Set[int]] = [set()]
+        for pattern in patterns:
+            pattern = pattern.lower()
+            if not pattern or pattern in self.patterns:
+                continue
+            pattern_id = len(self.patterns)
+            self.patterns.append(pattern)
+
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                state = next_state
+            outputs[state].add(pattern_id)
+
+        # 广度优先构建失败指针，并把失败链上的输出合并到当前状态
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail_target if fail_target != next_state else 0
+                outputs[next_state] |= outputs[self._fail[next_state]]
+
+        self._output = [frozenset(output) for output in outputs]
+
+    def find_ids(self, text: str) -> Set[int]:
+        """返回文本中出现的全部模式串编号"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found: Set[int] = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+    def find(self, text: str) -> Set[str]:
+        """返回文本中出现的全部模式串"""
+        return {self.patterns[pattern_id] for pattern_id in self.find_ids(text)}
+
+
+class KeywordMatcher:
+    """预编译的 OR/AND/NOT 关键词组匹配器"""
+
+    def __init__(self,
+                 any_keywords: Optional[Iterable[str]] = None,
+                 all_keywords: Optional[Iterable[str]] = None,
+                 none_keywords: Optional[Iterable[str]] = None,
+                 match_body: bool = False):
+        self.any_keywords = _normalize_keywords(any_keywords)
+        self.all_keywords = _normalize_keywords(all_keywords)
+        self.none_keywords = _normalize_keywords(none_keywords)
+        self.match_body = match_body
+
+        self._automaton = AhoCorasick(self.any_keywords + self.all_keywords + self.none_keywords)
+        ids = {pattern: i for i, pattern in enumerate(self._automaton.patterns)}
+        self._any_ids = frozenset(ids[keyword] for keyword in self.any_keywords)
+        self._all_ids = frozenset(ids[keyword] for keyword in self.all_keywords)
+        self._none_ids = frozenset(ids[keyword] for keyword in self.none_keywords)
+
+    def __bool__(self) -> bool:
+        return bool(self._automaton.patterns)
+
+    @property
+    def has_positive_keywords(self) -> bool:
+        """是否包含 OR/AND 组关键词"""
+        return bool(self._any_ids or self._all_ids)
+
+    def hits(self, title: str, body: Optional[str] = None) -> Set[str]:
+        """返回命中的全部关键词；match_body 为真且给出正文时同时扫描正文"""
+        found = self._automaton.find_ids(title)
+        if self.match_body and body:
+            found |= self._automaton.find_ids(body)
+        return {self._automaton.patterns[pattern_id] for pattern_id in found}
+
+    def positive_hits(self, text: str) -> Set[str]:
+        """返回文本中命中的 OR/AND 组关键词（不含排除词），用于相关性打分"""
+        found = self._automaton.find_ids(text) - self._none_ids
+        return {self._automaton.patterns[pattern_id] for pattern_id in found}
+
+    def _matches_ids(self, found: Set[int]) -> bool:
+        if self._none_ids and not found.isdisjoint(self._none_ids):
+            return False
+        if self._all_ids and not self._all_ids <= found:
+            return False
+        if self._any_ids and found.isdisjoint(self._any_ids):
+            return False
+        return True
+
+    def matches(self, title: str, body: Optional[str] = None) -> bool:
+        """判断标题（以及可选的正文）是否满足全部关键词组"""
+        found = self._automaton.find_ids(title)
+        if self.match_body and body:
+            found |= self._automaton.find_ids(body)
+        return self._matches_ids(found)
+
+    def title_may_match(self, title: str) -> bool:
+        """仅凭标题做预筛：
+        只在标题上匹配时等价于 matches；需要匹配正文时，只有命中排除词才能提前判定为不匹配。"""
+        if not self.match_body:
+            return self.matches(title)
+        if not self._none_ids:
+            return True
+        return self._automaton.find_ids(title).isdisjoint(self._none_ids)
+
+
+def _normalize_keywords(keywords: Optional[Iterable[str]]) -> List[str]:
+    if not keywords:
+        return []
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    normalized = []
+    for keyword in keywords:
+        keyword = str(keyword).strip().lower()
+        if keyword and keyword not in normalized:
+            normalized.append(keyword)
+    return normalized
+
+
+@lru_cache(maxsize=256)
+def _cached_matcher(any_keywords: Tuple[str, ...],
+                    all_keywords: Tuple[str, ...],
+                    none_keywords: Tuple[str, ...],
+                    match_body: bool) -> KeywordMatcher:
+    return KeywordMatcher(any_keywords, all_keywords, none_keywords, match_body)
+
+
+def get_keyword_matcher(conditions: FilterConditions) -> Optional[KeywordMatcher]:
+    """按筛选条件获取（缓存的）关键词匹配器；没有任何关键词条件时返回 None"""
+    any_keywords = tuple(_normalize_keywords(conditions.get("title_keywords")))
+    all_keywords = tuple(_normalize_keywords(conditions.get("required_keywords")))
+    none_keywords = tuple(_normalize_keywords(conditions.get("excluded_keywords")))
+    if not (any_keywords or all_keywords or none_keywords):
+        return None
+    return _cached_matcher(any_keywords, all_keywords, none_keywords,
+                           bool(conditions.get("match_body")))
@@ -0,0 +1,153 @@
+"""LLM解析的成本与延迟预算
+
+parse_articles_with_llm_node 原先不管耗时和token消耗，逐篇解析全部筛选后的文章。
+这里为每个任务设置三项预算：墙钟时间、总token数、LLM调用次数。
+文章按优先级（发布时间越新、关键词命中越多、正文越充实越优先）依次解析，
+预算用完后剩余文章降级为不调用LLM的标题+摘要条目（或直接跳过），并在统计中报告。
+
+配置（.env，留空表示不限制）：
+    LLM_BUDGET_SECONDS=120
+    LLM_BUDGET_TOKENS=200000
+    LLM_BUDGET_CALLS=50
+    LLM_BUDGET_ACTION=fallback     # fallback：降级为标题+摘要；stop：直接跳过
+"""
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+from config import get_env_var
+from keyword_matcher import KeywordMatcher
+
+
+FALLBACK = "fallback"
+STOP = "stop"
+
+# 中文约 1.5 字符/token，用于没有 usage 信息时的估算
+CHARS_PER_TOKEN = 1.5
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _optional_number(var_name: str, cast):
+    value = get_env_var(var_name)
+    if value is None or not str(value).strip():
+        return None
+    return cast(value)
+
+
+class LLMBudget:
+    """单个任务的LLM预算：墙钟时间、总token数、调用次数"""
+
+    def __init__(self,
+                 max_seconds: Optional[float] = None,
+                 max_tokens: Optional[int] = None,
+                 max_calls: Optional[int] = None,
+                 action: str = FALLBACK,
+                 started_at: Optional[float] = None):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_calls = max_calls
+        self.action = action if action in (FALLBACK, STOP) else FALLBACK
+
+        # 时间预算从第一次LLM调用前（start）开始计算，不包括等待第一篇正文的耗时
+        self.started_at = started_at
+        self.calls = 0
+        self.tokens = 0
+        self.downgraded = 0
+        self.skipped = 0
+        self.exhausted_by: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, started_at: Optional[float] = None) -> "LLMBudget":
+        return cls(
+            max_seconds=_optional_number("LLM_BUDGET_SECONDS", float),
+            max_tokens=_optional_number("LLM_BUDGET_TOKENS", int),
+            max_calls=_optional_number("LLM_BUDGET_CALLS", int),
+            action=(get_env_var("LLM_BUDGET_ACTION", FALLBACK) or FALLBACK).lower(),
+            started_at=started_at,
+        )
+
+    def start(self) -> None:
+        """开始计时；已经开始时不重置"""
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return time.monotonic() - self.started_at
+
+    def exhausted_reason(self, next_tokens: int = 0) -> Optional[str]:
+        """下一次调用（预计消耗 next_tokens）是否会超出预算；超出时返回原因"""
+        if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            return f"时间预算 {self.max_seconds}s"
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            return f"调用次数预算 {self.max_calls} 次"
+        if self.max_tokens is not None and self.tokens + next_tokens > self.max_tokens:
+            return f"token预算 {self.max_tokens}"
+        return None
+
+    def charge(self, tokens: int) -> None:
+        """记录一次LLM调用的消耗"""
+        self.calls += 1
+        self.tokens += tokens
+
+    def record_exhausted(self, reason: str) -> None:
+        """记录一篇因预算用完而未调用LLM的文章"""
+        if self.exhausted_by is None:
+            self.exhausted_by = reason
+        if self.action == FALLBACK:
+            self.downgraded += 1
+        else:
+            self.skipped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.calls,
+            "tokens": self.tokens,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "downgraded": self.downgraded,
+            "skipped": self.skipped,
+            "exhausted_by": self.exhausted_by,
+        }
+
+
+def response_tokens(response, prompt: str) -> int:
+    """优先使用模型返回的usage信息，否则按字符数估算"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    return estimate_tokens(prompt) + estimate_tokens(getattr(response, "content", "") or "")
+
+
+def prioritize(tasks: List[Dict[str, Any]], matcher: Optional[KeywordMatcher]) -> List[Dict[str, Any]]:
+    """按优先级排序待解析的文章：发布时间越新、关键词命中越多、正文越充实越靠前
+
+    每个任务需要包含 article（ArticleView 或 ArticleInfo）和 content（正文）；
+    正文尚未获取时 content 传空字符串，只按标题和发布时间排序。
+    """
+    if not tasks:
+        return []
+
+    timestamps = [getattr(task["article"], "publish_ts", -1) for task in tasks]
+    valid = [ts for ts in timestamps if ts > 0]
+    newest, oldest = (max(valid), min(valid)) if valid else (0, 0)
+    span = max(newest - oldest, 1)
+
+    def priority(item) -> float:
+        task, ts = item
+        recency = (ts - oldest) / span if ts > 0 else 0.0
+        keyword = 0.0
+        if matcher and matcher.has_positive_keywords:
+            hits = matcher.positive_hits(task["article"]["title"] + task["content"])
+            keyword = min(1.0, len(hits) / 3)
+        # 正文 4000 字以上视为充实，太短的文章信息量有限
+        length = min(1.0, len(task["content"]) / 4000)
+        return 0.5 * recency + 0.3 * keyword + 0.2 * length
+
+    ranked = sorted(zip(tasks, timestamps), key=priority, reverse=True)
+    return [task for task, _ in ranked]
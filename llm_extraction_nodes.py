@@ -1,16 +1,38 @@
 import json
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
 
 from workflow_state import WorkflowState, FilterConditions
 from config import get_env_var
+from api_request import cassette_in_use
 from datetime import datetime
-from dateutil import parser as date_parser
+
+
+def _wrap_llm(llm):
+    """使用cassette时返回录制/回放包装，否则原样返回；未使用时不加载 cassette 模块"""
+    if not cassette_in_use():
+        return llm
+    from cassette import wrap_llm as cassette_llm
+    return cassette_llm(llm)
 
 
 def create_llm():
-    """创建LLM实例"""
+    """创建LLM实例（启用cassette时返回录制/回放包装，并合并并发任务中相同的调用）"""
+    from single_flight import coalesce_llm
+
+    if cassette_in_use():
+        from cassette import REPLAY, get_active_cassette
+        cassette = get_active_cassette()
+        if cassette is not None and cassette.mode == REPLAY:
+            return coalesce_llm(_wrap_llm(None))  # 回放模式不需要真实的LLM
+    
     try:
+        # 配置了 LLM_ENDPOINTS 时使用多端点池，否则沿用单个 OPENAI_BASE_URL
+        from llm_pool import get_llm_pool
+        pool = get_llm_pool()
+        if pool is not None:
+            return coalesce_llm(_wrap_llm(pool))
+
+        from langchain_openai import ChatOpenAI  # 延迟导入，避免拖慢启动
+
         llm_config = {
             "model": get_env_var("OPENAI_MODEL", "gpt-3.5-turbo"),
             "temperature": 0,
@@ -21,7 +43,7 @@ def create_llm():
         if base_url:
             llm_config["base_url"] = base_url
             
-        return ChatOpenAI(**llm_config)
+        return coalesce_llm(_wrap_llm(ChatOpenAI(**llm_config)))
     except Exception as e:
         print(f"[ERROR] 创建LLM失败: {str(e)}")
         return None
@@ -37,7 +59,40 @@ def llm_extract_account_keyword_node(state: WorkflowState) -> WorkflowState:
         # 回退到正则表达式方法
         return regex_extract_account_keyword(state)
     
-    prompt = f"""
+    try:
+        from langchain.schema import HumanMessage
+        response = llm.invoke([HumanMessage(content=account_keyword_prompt(user_input))])
+        return apply_account_keyword_result(state, response.content)
+        
+    except Exception as e:
+        print(f"[ERROR] LLM提取关键词失败: {str(e)}")
+        print("[INFO] 回退到正则表达式方法")
+        return regex_extract_account_keyword(state)
+
+
+async def allm_extract_account_keyword_node(state: WorkflowState) -> WorkflowState:
+    """llm_extract_account_keyword_node 的异步版本"""
+    user_input = state["user_input"]
+    print(f"[DEBUG] 使用LLM提取关键词，输入: {user_input}")
+    
+    llm = create_llm()
+    if not llm:
+        return regex_extract_account_keyword(state)
+    
+    try:
+        from langchain.schema import HumanMessage
+        response = await llm.ainvoke([HumanMessage(content=account_keyword_prompt(user_input))])
+        return apply_account_keyword_result(state, response.content)
+        
+    except Exception as e:
+        print(f"[ERROR] LLM提取关键词失败: {str(e)}")
+        print("[INFO] 回退到正则表达式方法")
+        return regex_extract_account_keyword(state)
+
+
+def account_keyword_prompt(user_input: str) -> str:
+    """提取公众号关键词的提示词"""
+    return f"""
 请分析以下用户输入，提取其中的微信公众号名称或关键词。
 
 用户输入："{user_input}"
@@ -60,29 +115,25 @@ def llm_extract_account_keyword_node(state: WorkflowState) -> WorkflowState:
 - "搜索科技相关的公众号文章" → "科技"
 - "查找AI相关内容" → "AI"
 """
+
+
+def apply_account_keyword_result(state: WorkflowState, content: str) -> WorkflowState:
+    """解析LLM返回的关键词并写入状态；没有提取到时回退到正则方法，JSON无效时抛出异常"""
+    result = json.loads(content)
     
-    try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        result = json.loads(response.content)
-        
-        account_keyword = result.get("account_keyword", "").strip()
-        confidence = result.get("confidence", "medium")
-        reasoning = result.get("reasoning", "")
-        
-        print(f"[DEBUG] LLM提取结果: 关键词='{account_keyword}', 置信度={confidence}")
-        print(f"[DEBUG] 提取理由: {reasoning}")
-        
-        if not account_keyword:
-            print("[WARNING] LLM未能提取到关键词，尝试回退到正则方法")
-            return regex_extract_account_keyword(state)
-        
-        state["account_keyword"] = account_keyword
-        return state
-        
-    except Exception as e:
-        print(f"[ERROR] LLM提取关键词失败: {str(e)}")
-        print("[INFO] 回退到正则表达式方法")
+    account_keyword = result.get("account_keyword", "").strip()
+    confidence = result.get("confidence", "medium")
+    reasoning = result.get("reasoning", "")
+    
+    print(f"[DEBUG] LLM提取结果: 关键词='{account_keyword}', 置信度={confidence}")
+    print(f"[DEBUG] 提取理由: {reasoning}")
+    
+    if not account_keyword:
+        print("[WARNING] LLM未能提取到关键词，尝试回退到正则方法")
         return regex_extract_account_keyword(state)
+    
+    state["account_keyword"] = account_keyword
+    return state
 
 
 def llm_parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
@@ -95,10 +146,43 @@ def llm_parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
         # 回退到正则表达式方法
         return regex_parse_filter_conditions(state)
     
+    try:
+        from langchain.schema import HumanMessage
+        response = llm.invoke([HumanMessage(content=filter_conditions_prompt(user_input))])
+        return apply_filter_conditions_result(state, response.content)
+        
+    except Exception as e:
+        print(f"[ERROR] LLM解析筛选条件失败: {str(e)}")
+        print("[INFO] 回退到正则表达式方法")
+        return regex_parse_filter_conditions(state)
+
+
+async def allm_parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
+    """llm_parse_filter_conditions_node 的异步版本"""
+    user_input = state["user_input"]
+    print(f"[DEBUG] 使用LLM解析筛选条件，输入: {user_input}")
+    
+    llm = create_llm()
+    if not llm:
+        return regex_parse_filter_conditions(state)
+    
+    try:
+        from langchain.schema import HumanMessage
+        response = await llm.ainvoke([HumanMessage(content=filter_conditions_prompt(user_input))])
+        return apply_filter_conditions_result(state, response.content)
+        
+    except Exception as e:
+        print(f"[ERROR] LLM解析筛选条件失败: {str(e)}")
+        print("[INFO] 回退到正则表达式方法")
+        return regex_parse_filter_conditions(state)
+
+
+def filter_conditions_prompt(user_input: str) -> str:
+    """解析筛选条件的提示词"""
     # 获取当前日期用于相对时间计算
     current_date = datetime.now().strftime("%Y-%m-%d")
     
-    prompt = f"""
+    return f"""
 请分析以下用户输入，提取其中的文章筛选条件。
 
 用户输入："{user_input}"
@@ -106,7 +190,11 @@ def llm_parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
 
 请按照以下JSON格式返回结果：
 {{
-    "title_keywords": ["关键词1", "关键词2"],  // 标题中需要包含的关键词，如果没有则为null
+    "title_keywords": ["关键词1", "关键词2"],  // 标题中需要包含的关键词（任一命中即可），如果没有则为null
+    "required_keywords": ["关键词"],  // 必须同时包含的关键词，如果没有则为null
+    "excluded_keywords": ["关键词"],  // 不能包含的关键词，如果没有则为null
+    "match_body": false,  // 用户要求"内容/正文包含"时为true，关键词同时在正文中匹配
+    "topic": "主题",  // 用户按主题查找（如"数字化转型相关文章"、"关于区块链的报道"）时的主题词，否则为null
     "max_articles": 数字,  // 需要的文章数量，如果没有指定则为null
     "start_date": "YYYY-MM-DD",  // 开始日期，如果没有则为null
     "end_date": "YYYY-MM-DD",  // 结束日期，如果没有则为null
@@ -115,7 +203,8 @@ def llm_parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
 }}
 
 解析规则：
-1. 标题关键词：提取"标题包含"、"关键词"、"包含...的文章"等表述
+1. 标题关键词：提取"标题包含"、"关键词"、"包含...的文章"等表述；"或"连接的放入title_keywords，
+   "同时包含"、"并且"连接的放入required_keywords，"不包含"、"排除"的放入excluded_keywords
 2. 文章数量：提取"20篇"、"最多10个"、"前5篇"等数量表述
 3. 时间范围：
    - "最近的" → 从当前日期往前推算
@@ -128,6 +217,10 @@ def llm_parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
 输入："请查询银行科技研究社的文章，筛选最近的20篇，标题包含'AI'或'人工智能'"
 输出：{{
     "title_keywords": ["AI", "人工智能"],
+    "required_keywords": null,
+    "excluded_keywords": null,
+    "match_body": false,
+    "topic": null,
     "max_articles": 20,
     "start_date": null,
     "end_date": null,
@@ -135,50 +228,54 @@ def llm_parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
     "reasoning": "用户需要20篇文章，标题包含AI或人工智能，最近发布的文章"
 }}
 """
+
+
+def apply_filter_conditions_result(state: WorkflowState, content: str) -> WorkflowState:
+    """解析LLM返回的筛选条件并写入状态，JSON无效时抛出异常"""
+    result = json.loads(content)
     
-    try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        result = json.loads(response.content)
-        
-        # 转换为FilterConditions格式
-        conditions = FilterConditions(
-            title_keywords=result.get("title_keywords"),
-            max_articles=result.get("max_articles"),
-            start_date=None,
-            end_date=None
-        )
-        
-        # 处理日期
-        start_date_str = result.get("start_date")
-        end_date_str = result.get("end_date")
-        
-        if start_date_str:
-            try:
-                conditions["start_date"] = datetime.strptime(start_date_str, "%Y-%m-%d")
-            except:
-                print(f"[WARNING] 无法解析开始日期: {start_date_str}")
-        
-        if end_date_str:
-            try:
-                conditions["end_date"] = datetime.strptime(end_date_str, "%Y-%m-%d")
-            except:
-                print(f"[WARNING] 无法解析结束日期: {end_date_str}")
-        
-        print(f"[DEBUG] LLM解析条件结果:")
-        print(f"  - 标题关键词: {conditions['title_keywords']}")
-        print(f"  - 文章数量: {conditions['max_articles']}")
-        print(f"  - 开始日期: {conditions['start_date']}")
-        print(f"  - 结束日期: {conditions['end_date']}")
-        print(f"  - 时间描述: {result.get('time_description', '')}")
-        print(f"  - 解析理由: {result.get('reasoning', '')}")
-        
-        state["filter_conditions"] = conditions
-        return state
-        
-    except Exception as e:
-        print(f"[ERROR] LLM解析筛选条件失败: {str(e)}")
-        print("[INFO] 回退到正则表达式方法")
-        return regex_parse_filter_conditions(state)
+    # 转换为FilterConditions格式
+    conditions = FilterConditions(
+        title_keywords=result.get("title_keywords"),
+        max_articles=result.get("max_articles"),
+        start_date=None,
+        end_date=None,
+        required_keywords=result.get("required_keywords"),
+        excluded_keywords=result.get("excluded_keywords"),
+        match_body=bool(result.get("match_body")),
+        topic=result.get("topic")
+    )
+    
+    # 处理日期
+    start_date_str = result.get("start_date")
+    end_date_str = result.get("end_date")
+    
+    if start_date_str:
+        try:
+            conditions["start_date"] = datetime.strptime(start_date_str, "%Y-%m-%d")
+        except:
+            print(f"[WARNING] 无法解析开始日期: {start_date_str}")
+    
+    if end_date_str:
+        try:
+            conditions["end_date"] = datetime.strptime(end_date_str, "%Y-%m-%d")
+        except:
+            print(f"[WARNING] 无法解析结束日期: {end_date_str}")
+    
+    print(f"[DEBUG] LLM解析条件结果:")
+    print(f"  - 标题关键词: {conditions['title_keywords']}")
+    print(f"  - 必须包含: {conditions['required_keywords']}")
+    print(f"  - 排除关键词: {conditions['excluded_keywords']}")
+    print(f"  - 匹配正文: {conditions['match_body']}")
+    print(f"  - 主题: {conditions['topic']}")
+    print(f"  - 文章数量: {conditions['max_articles']}")
+    print(f"  - 开始日期: {conditions['start_date']}")
+    print(f"  - 结束日期: {conditions['end_date']}")
+    print(f"  - 时间描述: {result.get('time_description', '')}")
+    print(f"  - 解析理由: {result.get('reasoning', '')}")
+    
+    state["filter_conditions"] = conditions
+    return state
 
 
 def regex_extract_account_keyword(state: WorkflowState) -> WorkflowState:
@@ -225,7 +322,11 @@ def regex_parse_filter_conditions(state: WorkflowState) -> WorkflowState:
         title_keywords=None,
         max_articles=None,
         start_date=None,
-        end_date=None
+        end_date=None,
+        required_keywords=None,
+        excluded_keywords=None,
+        match_body=False,
+        topic=None
     )
     
     # 提取标题关键词
@@ -242,6 +343,18 @@ def regex_parse_filter_conditions(state: WorkflowState) -> WorkflowState:
             conditions["title_keywords"] = keywords
             break
     
+    # 提取排除关键词
+    excluded_match = re.search(r"(?:不包含|排除)[：:]?(.+?)(?:的文章|[，,。]|$)", user_input)
+    if excluded_match:
+        conditions["excluded_keywords"] = [
+            kw.strip().strip("'\"") for kw in re.split(r'[,，或和]', excluded_match.group(1)) if kw.strip()
+        ]
+    
+    # 提取主题，如"数字化转型相关文章"、"关于区块链的报道"
+    topic_match = re.search(r"(?:的|^)([^的，,。]+?)相关", user_input) or re.search(r"关于(.+?)的", user_input)
+    if topic_match:
+        conditions["topic"] = topic_match.group(1).strip().strip("'\"")
+    
     # 提取文章数量
     count_match = re.search(r"(\d+)篇|最多(\d+)|前(\d+)", user_input)
     if count_match:
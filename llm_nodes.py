@@ -1,52 +1,364 @@
-import requests
-from bs4 import BeautifulSoup
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
-import json
+import sys
 
 from workflow_state import WorkflowState, ShortNews
+from article_identity import article_id, content_fingerprint, learn_from_page
+from keyword_matcher import get_keyword_matcher
+from relevance_prefilter import load_prefilter_config, score_article
+from text_compaction import get_text_compactor
+from llm_extraction_nodes import create_llm
+from api_request import aexternal_call, external_call
+from llm_budget import FALLBACK, LLMBudget, estimate_tokens, prioritize, response_tokens
+from result_stream import get_result_sink
+from json_stream import ShortNewsStreamParser
 from config import get_env_var
 
 
-def parse_articles_with_llm_node(state: WorkflowState) -> WorkflowState:
-    """使用LLM解析文章内容，提取短新闻"""
-    filtered_articles = state["filtered_articles"]
-    if not filtered_articles:
+def parse_articles_with_llm_node(state: WorkflowState, config=None) -> WorkflowState:
+    """使用LLM解析文章内容，提取短新闻
+
+    调用方通过 config["configurable"]["result_sink"] 传入 ResultSink 时，
+    每篇文章解析完成后立即输出其短新闻，不必等待整个工作流结束。
+    """
+    if not state["filtered_articles"]:
         state["short_news_list"] = []
         return state
     
     # 初始化OpenAI模型，支持自定义base_url
-    try:
-        llm_config = {
-            "model": get_env_var("OPENAI_MODEL", "gpt-3.5-turbo"),
-            "temperature": 0,
-            "api_key": get_env_var("OPENAI_API_KEY")
-        }
-        
-        # 如果设置了自定义base_url，则使用它
-        base_url = get_env_var("OPENAI_BASE_URL")
-        if base_url:
-            llm_config["base_url"] = base_url
-            
-        llm = ChatOpenAI(**llm_config)
-    except Exception as e:
-        state["error_message"] = f"初始化LLM时出错: {str(e)}"
+    llm = create_llm()
+    if llm is None:
+        state["error_message"] = "初始化LLM时出错"
+        return state
+    
+    # 正文在后台按优先级并发获取，并做本地筛选；每篇正文就绪后立即进入LLM解析，
+    # 预算用完后剩余文章降级或跳过
+    run = ArticleParseRun(state, llm, config)
+    screen = ArticleScreen(state)
+    for task in iter_parse_tasks(run, screen):
+        prompt = run.admit(task)
+        if prompt is None:
+            continue
+        article = task["article"]
+        on_news = run.news_callback()
+        try:
+            try:
+                news_list, response = extract_short_news(
+                    run.json_llm, prompt, article, task["content"], on_news)
+            except Exception as e:
+                if not run.disable_json_mode(e):
+                    raise
+                news_list, response = extract_short_news(llm, prompt, article, task["content"], on_news)
+            run.complete(task, prompt, news_list, response)
+        except Exception as e:
+            print(f"处理文章时出错 {article['title']}: {str(e)}")
+            continue
+    
+    return run.finish(screen.finish())
+
+
+async def aparse_articles_with_llm_node(state: WorkflowState, config=None) -> WorkflowState:
+    """parse_articles_with_llm_node 的异步版本：正文并发获取，LLM通过 astream/ainvoke 调用"""
+    if not state["filtered_articles"]:
+        state["short_news_list"] = []
         return state
     
-    all_short_news = []
+    llm = create_llm()
+    if llm is None:
+        state["error_message"] = "初始化LLM时出错"
+        return state
     
-    for i, article in enumerate(filtered_articles):
-        print(f"正在处理第 {i+1}/{len(filtered_articles)} 篇文章: {article['title']}")
-        
+    run = ArticleParseRun(state, llm, config)
+    screen = ArticleScreen(state)
+    async for task in aiter_parse_tasks(run, screen):
+        prompt = run.admit(task)
+        if prompt is None:
+            continue
+        article = task["article"]
+        on_news = run.news_callback()
         try:
-            # 获取文章内容
-            article_content = fetch_article_content(article["content_url"] or article["link"])
-            if not article_content:
-                print(f"无法获取文章内容: {article['title']}")
+            try:
+                news_list, response = await aextract_short_news(
+                    run.json_llm, prompt, article, task["content"], on_news)
+            except Exception as e:
+                if not run.disable_json_mode(e):
+                    raise
+                news_list, response = await aextract_short_news(llm, prompt, article, task["content"], on_news)
+            run.complete(task, prompt, news_list, response)
+        except Exception as e:
+            print(f"处理文章时出错 {article['title']}: {str(e)}")
+            continue
+    
+    return run.finish(screen.finish())
+
+
+class ArticleParseRun:
+    """一次文章解析的预算、输出和结果汇总（同步/异步节点共用，不发起LLM调用）"""
+
+    def __init__(self, state: WorkflowState, llm, config=None):
+        self.state = state
+        self.llm = llm
+        self.json_llm = structured_llm(llm)
+        self.budget = LLMBudget.from_env()
+        self.matcher = get_keyword_matcher(state.get("filter_conditions") or {})
+        self.result_sink = get_result_sink(config)
+        self.news_by_task = {}
+
+    def news_callback(self):
+        """单篇文章的输出回调：JSON模式流式输出到一半失败、改用普通模式重试时，已输出的短新闻不再重复输出"""
+        if not self.result_sink:
+            return None
+        emitted = set()
+
+        def emit(news):
+            key = (news["title"], news["original_link"])
+            if key not in emitted:
+                emitted.add(key)
+                self.result_sink.emit(news)
+        return emit
+
+    def fetch_order(self):
+        """获取正文的顺序：按标题和发布时间排优先级，优先级高的文章先拿到正文、先进入LLM解析"""
+        tasks = [{"index": i, "article": article, "content": ""}
+                 for i, article in enumerate(self.state["filtered_articles"])]
+        return prioritize(tasks, self.matcher)
+
+    def next_task(self, pending):
+        """从已获取正文的任务中取出优先级最高的一篇"""
+        task = prioritize(pending, self.matcher)[0]
+        pending.remove(task)
+        return task
+
+    def admit(self, task):
+        """返回该文章的提示词；预算已用完时按配置降级或跳过，返回 None"""
+        article = task["article"]
+        print(f"正在处理第 {task['index']+1}/{len(self.state['filtered_articles'])} 篇文章: {article['title']}")
+        
+        prompt = build_article_prompt(article, task["content"])
+        self.budget.start()
+        exhausted = self.budget.exhausted_reason(estimate_tokens(prompt))
+        if not exhausted:
+            return prompt
+        self.budget.record_exhausted(exhausted)
+        if self.budget.action == FALLBACK:
+            print(f"[BUDGET] 已用完{exhausted}，降级为标题+摘要: {article['title']}")
+            self.news_by_task[task["index"]] = [fallback_short_news(article, task["content"])]
+            if self.result_sink:
+                self.result_sink.emit_many(self.news_by_task[task["index"]])
+        else:
+            print(f"[BUDGET] 已用完{exhausted}，跳过: {article['title']}")
+        return None
+
+    def disable_json_mode(self, error: Exception) -> bool:
+        """JSON输出模式调用失败：返回 True 表示应改用普通模式重试
+
+        只有模型服务拒绝 response_format 参数时才改用普通模式；超时、5xx、限流等错误照常抛出。
+        """
+        if self.json_llm is self.llm or not json_mode_unsupported(error):
+            return False
+        # 模型服务不支持JSON输出模式时，本次任务改用普通调用
+        print(f"[DEBUG] 模型服务不支持JSON输出模式，改用普通模式: {str(error)}")
+        self.json_llm = self.llm
+        return True
+
+    def complete(self, task, prompt: str, news_list, response) -> None:
+        self.budget.charge(response_tokens(response, prompt))
+        self.news_by_task[task["index"]] = news_list
+
+    def finish(self, prefilter_stats) -> WorkflowState:
+        """按原文章顺序汇总短新闻并记录统计"""
+        state, budget = self.state, self.budget
+        all_short_news = []
+        for index in sorted(self.news_by_task):
+            all_short_news.extend(self.news_by_task[index])
+        
+        state["short_news_list"] = all_short_news
+        run_stats = state.setdefault("run_stats", {})
+        run_stats["prefilter"] = prefilter_stats
+        run_stats["llm_budget"] = budget.stats()
+        from llm_pool import get_llm_pool
+        from single_flight import single_flight_stats
+        pool = get_llm_pool()
+        if pool is not None:
+            run_stats["llm_pool"] = pool.stats()
+        flights = single_flight_stats()
+        run_stats["single_flight"] = flights
+        print(f"总共提取到 {len(all_short_news)} 条短新闻")
+        if prefilter_stats["checked"]:
+            print(f"[PREFILTER] 预筛 {prefilter_stats['checked']} 篇，节省LLM调用 {prefilter_stats['llm_calls_saved']} 次")
+        if budget.exhausted_by:
+            print(f"[BUDGET] 预算用完（{budget.exhausted_by}）：降级 {budget.downgraded} 篇，跳过 {budget.skipped} 篇")
+        merged = sum(counters["merged"] for counters in flights.values())
+        if merged:
+            print(f"[SINGLE-FLIGHT] 进程内累计合并相同请求 {merged} 次：" +
+                  "，".join(f"{kind} {counters['merged']}/{counters['calls']}" for kind, counters in flights.items()))
+        pool_stats = run_stats.get("llm_pool")
+        if pool_stats and pool_stats["hedges"]:
+            print(f"[LLM-POOL] 对冲请求 {pool_stats['hedges']} 次，其中 {pool_stats['hedges_won']} 次先于首选端点返回")
+        return state
+
+
+def _bind_node(fn):
+    """CPU 采样（--profile）时用 cpu_profile.bind_node 包装；未开启采样时不加载采样模块，原样返回"""
+    if "cpu_profile" not in sys.modules:
+        return fn
+    from cpu_profile import bind_node
+    return bind_node(fn)
+
+
+def fetch_concurrency() -> int:
+    return int(get_env_var("ARTICLE_FETCH_CONCURRENCY", "8"))
+
+
+def iter_parse_tasks(run: ArticleParseRun, screen: "ArticleScreen"):
+    """在线程中并发获取正文（最多 ARTICLE_FETCH_CONCURRENCY 篇同时进行），逐篇产出待LLM解析的任务
+
+    正文按 run.fetch_order() 的顺序获取并交给 screen 做正文关键词匹配和本地预筛；
+    每次从已就绪的任务中取优先级最高的一篇，不必等全部正文获取完成。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    order = run.fetch_order()
+    fetch = _bind_node(fetch_article_content)  # CPU 采样时这些线程归入解析节点
+    executor = ThreadPoolExecutor(max_workers=fetch_concurrency())
+    try:
+        futures = [executor.submit(fetch, task["article"]["link"]) for task in order]
+        pending = []
+        for future, task in zip(futures, order):
+            # 下一篇正文还没获取完成时，先解析已就绪的文章
+            while pending and not future.done():
+                yield run.next_task(pending)
+            try:
+                article_content = future.result()
+            except Exception as e:
+                print(f"处理文章时出错 {task['article']['title']}: {str(e)}")
+                continue
+            ready = screen.add(task["index"], task["article"], article_content)
+            if ready is not None:
+                pending.append(ready)
+        while pending:
+            yield run.next_task(pending)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def aiter_parse_tasks(run: ArticleParseRun, screen: "ArticleScreen"):
+    """iter_parse_tasks 的异步版本：正文获取在事件循环中并发进行"""
+    import asyncio
+
+    order = run.fetch_order()
+    semaphore = asyncio.Semaphore(fetch_concurrency())
+
+    async def fetch(article):
+        async with semaphore:
+            return await afetch_article_content(article["link"])
+
+    fetch = _bind_node(fetch)  # CPU 采样时这些任务归入解析节点
+    futures = [asyncio.ensure_future(fetch(task["article"])) for task in order]
+    try:
+        pending = []
+        for future, task in zip(futures, order):
+            while pending and not future.done():
+                yield run.next_task(pending)
+            try:
+                article_content = await future
+            except Exception as e:
+                print(f"处理文章时出错 {task['article']['title']}: {str(e)}")
                 continue
-            
-            # 使用LLM解析文章
-            prompt = f"""
+            ready = screen.add(task["index"], task["article"], article_content)
+            if ready is not None:
+                pending.append(ready)
+        while pending:
+            yield run.next_task(pending)
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class ArticleScreen:
+    """正文获取后的去重、压缩、关键词匹配和本地预筛，筛出需要LLM解析的任务"""
+
+    def __init__(self, state: WorkflowState):
+        self.state = state
+        self.matcher = get_keyword_matcher(state.get("filter_conditions") or {})
+        self.prefilter_config = load_prefilter_config()
+        self.compactor = get_text_compactor()
+        self.stats = {"checked": 0, "llm_calls_saved": 0}
+        self.compaction = {"articles": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0}
+        self.seen_ids = set()
+        self.seen_content = set()
+        self.duplicates = 0
+
+    def add(self, index: int, article, article_content: str):
+        """筛选一篇已获取正文的文章，需要LLM解析时返回任务（index、article、content），否则返回 None"""
+        if not article_content:
+            print(f"无法获取文章内容: {article['title']}")
+            return None
+        
+        # 短链接在下载页面后才能解析出标识，这里重新推导
+        canonical_id = article["article_id"]
+        if canonical_id.startswith("s:"):
+            canonical_id = article_id(article["link"])
+        
+        # 去掉该公众号的固定套话和重复行，后续匹配、预筛和LLM都使用压缩后的正文
+        if self.compactor is not None:
+            article_content = self.compact(article, canonical_id, article_content)
+        
+        # 同一篇文章的不同链接、转载的相同正文只解析一次
+        if self.is_duplicate(article, canonical_id, article_content):
+            return None
+        
+        # 需要在正文中匹配关键词时，获取内容后再做一次完整匹配
+        matcher = self.matcher
+        if matcher and matcher.match_body and not matcher.matches(article["title"], article_content):
+            print(f"标题和正文均未满足关键词条件，跳过: {article['title']}")
+            return None
+        
+        # 本地相关性预筛，低分文章不调用LLM
+        if self.prefilter_config["enabled"]:
+            self.stats["checked"] += 1
+            prefilter = score_article(article["title"], article_content, matcher, self.prefilter_config)
+            if not prefilter["passed"]:
+                self.stats["llm_calls_saved"] += 1
+                print(f"[PREFILTER] 跳过 (得分 {prefilter['score']}): {article['title']} - {'; '.join(prefilter['reasons'])}")
+                return None
+        
+        return {"index": index, "article": article, "content": article_content}
+
+    def is_duplicate(self, article, canonical_id: str, article_content: str) -> bool:
+        fingerprint = content_fingerprint(article_content)
+        if canonical_id in self.seen_ids or fingerprint in self.seen_content:
+            self.duplicates += 1
+            print(f"[DEDUP] 与已处理的文章重复，跳过: {article['title']}")
+            return True
+        self.seen_ids.add(canonical_id)
+        self.seen_content.add(fingerprint)
+        return False
+
+    def compact(self, article, canonical_id: str, article_content: str) -> str:
+        compacted, stats = self.compactor.compact(article["fake_id"], canonical_id, article_content)
+        saved = stats["tokens_before"] - stats["tokens_after"]
+        self.compaction["articles"] += 1
+        self.compaction["tokens_before"] += stats["tokens_before"]
+        self.compaction["tokens_after"] += stats["tokens_after"]
+        self.compaction["tokens_saved"] += saved
+        if saved:
+            print(f"[COMPACT] {article['title']}: {stats['tokens_before']} → {stats['tokens_after']} tokens"
+                  f"（套话 {stats['boilerplate_lines']} 行，重复 {stats['duplicate_lines']} 行）")
+        return compacted
+
+    def finish(self):
+        """保存套话统计并记录压缩、去重统计，返回预筛统计"""
+        self.state.setdefault("run_stats", {})["duplicates_skipped"] = self.duplicates
+        if self.compactor is not None:
+            self.compactor.flush()
+            self.state.setdefault("run_stats", {})["compaction"] = self.compaction
+            if self.compaction["tokens_saved"]:
+                print(f"[COMPACT] 正文压缩共节省约 {self.compaction['tokens_saved']} tokens")
+        return self.stats
+
+
+def build_article_prompt(article, article_content: str) -> str:
+    """构造把文章拆分为短新闻的提示词"""
+    return f"""
 请分析以下微信公众号文章，将其拆分为多个独立的短新闻。每个短新闻应该包含完整的信息，可以独立阅读理解。
 
 文章标题: {article['title']}
@@ -69,79 +381,248 @@ def parse_articles_with_llm_node(state: WorkflowState) -> WorkflowState:
 3. 内容包含关键信息
 4. 如果文章本身就是一个整体，可以作为一个短新闻
 """
-            
-            response = llm.invoke([HumanMessage(content=prompt)])
-            
-            # 解析LLM返回的JSON
-            try:
-                result = json.loads(response.content)
-                short_news_data = result.get("short_news", [])
-                
-                for news in short_news_data:
-                    short_news = ShortNews(
-                        title=news.get("title", ""),
-                        content=news.get("content", ""),
-                        original_link=article["link"]
-                    )
-                    all_short_news.append(short_news)
-                    
-                print(f"从文章中提取到 {len(short_news_data)} 条短新闻")
-                
-            except json.JSONDecodeError:
-                # 如果JSON解析失败，将整篇文章作为一个短新闻
-                short_news = ShortNews(
-                    title=article["title"],
-                    content=article_content[:1000] + "...",
-                    original_link=article["link"]
-                )
-                all_short_news.append(short_news)
-                print("JSON解析失败，将整篇文章作为一个短新闻")
-                
-        except Exception as e:
-            print(f"处理文章时出错 {article['title']}: {str(e)}")
-            continue
-    
-    state["short_news_list"] = all_short_news
-    print(f"总共提取到 {len(all_short_news)} 条短新闻")
-    return state
 
 
+def fallback_short_news(article, article_content: str) -> ShortNews:
+    """不经LLM，将整篇文章作为一个短新闻（标题+正文摘要）"""
+    return ShortNews(
+        title=article["title"],
+        content=article_content[:1000] + "...",
+        original_link=article["link"]
+    )
+
+
+def structured_llm(llm):
+    """尽量使用模型服务的JSON输出模式（OpenAI兼容接口的 response_format），可通过 LLM_JSON_MODE=false 关闭"""
+    if (get_env_var("LLM_JSON_MODE", "true") or "").lower() != "true":
+        return llm
+    try:
+        return llm.bind(response_format={"type": "json_object"})
+    except Exception:
+        return llm
+
+
+def json_mode_unsupported(error: Exception) -> bool:
+    """错误是否表示模型服务不支持JSON输出模式（参数无效的 400/422，或错误信息提到 response_format）"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    message = str(error).lower()
+    return status in (400, 422) or "response_format" in message or "json_object" in message
+
+
+def extract_short_news(llm, prompt: str, article, article_content: str, on_news=None):
+    """调用LLM把文章拆分为短新闻，返回 (短新闻列表, 完整响应)
+
+    LLM_STREAM=true（默认）时流式调用，short_news 中每个条目一完整就解析出来并回调 on_news。
+    """
+    from langchain.schema import HumanMessage  # 重量级依赖在节点真正运行时才导入
+
+    messages = [HumanMessage(content=prompt)]
+    collector = ShortNewsCollector(article, article_content, on_news)
+
+    if stream_enabled() and hasattr(llm, "stream"):
+        response = None
+        for chunk in llm.stream(messages):
+            response = chunk if response is None else response + chunk
+            collector.feed(chunk.content)
+    else:
+        response = llm.invoke(messages)
+        collector.feed(response.content)
+    return collector.finish(), response
+
+
+async def aextract_short_news(llm, prompt: str, article, article_content: str, on_news=None):
+    """extract_short_news 的异步版本，使用 astream / ainvoke"""
+    from langchain.schema import HumanMessage
+
+    messages = [HumanMessage(content=prompt)]
+    collector = ShortNewsCollector(article, article_content, on_news)
+
+    if stream_enabled() and hasattr(llm, "astream"):
+        response = None
+        async for chunk in llm.astream(messages):
+            response = chunk if response is None else response + chunk
+            collector.feed(chunk.content)
+    else:
+        response = await llm.ainvoke(messages)
+        collector.feed(response.content)
+    return collector.finish(), response
+
+
+def stream_enabled() -> bool:
+    return (get_env_var("LLM_STREAM", "true") or "").lower() == "true"
+
+
+class ShortNewsCollector:
+    """增量解析LLM输出中的短新闻，每条完整后立即回调 on_news"""
+
+    def __init__(self, article, article_content: str, on_news=None):
+        self.article = article
+        self.article_content = article_content
+        self.on_news = on_news
+        self.parser = ShortNewsStreamParser()
+        self.short_news_list = []
+
+    def _collect(self, news_list) -> None:
+        for news in news_list:
+            self.short_news_list.append(news)
+            if self.on_news:
+                self.on_news(news)
+
+    def feed(self, content) -> None:
+        if isinstance(content, str):
+            self._collect(to_short_news(self.parser.feed(content), self.article))
+
+    def finish(self) -> list:
+        parser = self.parser
+        self._collect(to_short_news(parser.finish(), self.article))
+        if not parser.found_array:
+            # 返回中找不到 short_news 数组，将整篇文章作为一个短新闻
+            print("JSON解析失败，将整篇文章作为一个短新闻")
+            self._collect([fallback_short_news(self.article, self.article_content)])
+        elif parser.truncated:
+            print(f"[DEBUG] LLM输出被截断，已保留 {len(self.short_news_list)} 条完整或修复后的短新闻")
+        else:
+            print(f"从文章中提取到 {len(self.short_news_list)} 条短新闻")
+        return self.short_news_list
+
+
+def to_short_news(items, article) -> list:
+    """把解析出的条目转换为 ShortNews"""
+    return [
+        ShortNews(
+            title=item.get("title", ""),
+            content=item.get("content", ""),
+            original_link=article["link"]
+        )
+        for item in items
+    ]
+
+
+# 同一篇文章的并发请求按文章标识合并
+@external_call("fetch_article_content", key_fn=article_id)
 def fetch_article_content(url: str) -> str:
-    """获取文章内容"""
+    """获取文章内容；启用页面归档时优先读取归档，新下载的完整页面写入归档"""
+    from page_archive import get_page_archive
+
+    archive = get_page_archive()
+    html = archive.get(url) if archive is not None else None
+    if html is None:
+        # 启用归档时读取完整页面；超过下载上限被截断的页面不写入归档，以免以后当作原页面读取
+        html, complete = download_article_html(url, full_page=archive is not None)
+        if not html:
+            return ""
+        learn_from_page(url, html)  # 短链接：记录页面中的文章标识，归档按标识保存
+        if archive is not None and complete:
+            archive.put(url, html)
+    return extract_article_text(html)
+
+
+@aexternal_call("fetch_article_content", key_fn=article_id)
+async def afetch_article_content(url: str) -> str:
+    """fetch_article_content 的异步版本；正文提取（BeautifulSoup）在线程中执行，不阻塞事件循环"""
+    import asyncio
+    from page_archive import get_page_archive
+
+    archive = get_page_archive()
+    html = archive.get(url) if archive is not None else None
+    if html is None:
+        html, complete = await adownload_article_html(url, full_page=archive is not None)
+        if not html:
+            return ""
+        learn_from_page(url, html)
+        if archive is not None and complete:
+            archive.put(url, html)
+    return await asyncio.to_thread(_bind_node(extract_article_text), html)
+
+
+ARTICLE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+
+def download_article_html(url: str, full_page: bool = False):
+    """下载文章页面的原始 HTML，返回 (HTML, 是否读取了完整页面)，失败时返回 (b"", False)
+
+    默认有字节上限、正文读完即停止；full_page=True 时一直读到页面结束或字节上限。
+    """
+    from article_download import BYTE_LIMIT, COMPLETE, download_html
+
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # 使用BeautifulSoup解析HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # 尝试找到文章内容区域
-        content_selectors = [
-            '.rich_media_content',
-            '#js_content', 
-            '.weui-article__bd',
-            'article',
-            '.content'
-        ]
+        html, download_stats = download_html(url, ARTICLE_HEADERS, timeout=10, full_page=full_page)
+        if download_stats["stop_reason"] == BYTE_LIMIT:
+            print(f"[DEBUG] 页面超过下载上限，只读取前 {download_stats['bytes']} 字节: {url}")
+        return html, download_stats["stop_reason"] == COMPLETE
         
-        content = ""
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                content = content_elem.get_text(strip=True)
-                break
-        
-        if not content:
-            # 如果找不到特定区域，提取body中的文本
-            body = soup.find('body')
-            if body:
-                content = body.get_text(strip=True)
-        
-        return content
+    except Exception as e:
+        print(f"获取文章内容失败: {str(e)}")
+        return b"", False
+
+
+async def adownload_article_html(url: str, full_page: bool = False):
+    """download_article_html 的异步版本"""
+    from article_download import BYTE_LIMIT, COMPLETE, adownload_html
+
+    try:
+        html, download_stats = await adownload_html(url, ARTICLE_HEADERS, timeout=10, full_page=full_page)
+        if download_stats["stop_reason"] == BYTE_LIMIT:
+            print(f"[DEBUG] 页面超过下载上限，只读取前 {download_stats['bytes']} 字节: {url}")
+        return html, download_stats["stop_reason"] == COMPLETE
         
     except Exception as e:
         print(f"获取文章内容失败: {str(e)}")
-        return ""
\ No newline at end of file
+        return b"", False
+
+
+# 块级元素的开头换行，保留段落结构（行内元素的文字仍直接拼接）
+BLOCK_TAGS = {"p", "div", "section", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+              "blockquote", "pre", "table", "tr", "figure", "figcaption", "header", "footer", "article", "hr"}
+
+
+def paragraph_text(element) -> str:
+    """提取元素的文字，每个段落一行"""
+    from bs4 import CData, NavigableString
+
+    parts = []
+    for node in element.descendants:
+        # 与 get_text 一致，只取普通文字，跳过注释、脚本和样式
+        if type(node) in (NavigableString, CData):
+            text = node.strip()
+            if text:
+                parts.append(text)
+        elif getattr(node, "name", None) in BLOCK_TAGS:
+            parts.append("\n")
+    return "\n".join(line for line in "".join(parts).split("\n") if line)
+
+
+def extract_article_text(html: bytes) -> str:
+    """从文章页面 HTML 中提取正文文本（按段落分行）"""
+    from bs4 import BeautifulSoup
+
+    # 使用BeautifulSoup解析HTML
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # 尝试找到文章内容区域
+    content_selectors = [
+        '.rich_media_content',
+        '#js_content', 
+        '.weui-article__bd',
+        'article',
+        '.content'
+    ]
+    
+    content = ""
+    for selector in content_selectors:
+        content_elem = soup.select_one(selector)
+        if content_elem:
+            content = paragraph_text(content_elem)
+            break
+    
+    if not content:
+        # 如果找不到特定区域，提取body中的文本
+        body = soup.find('body')
+        if body:
+            content = paragraph_text(body)
+    
+    return content
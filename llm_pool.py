@@ -0,0 +1,500 @@
+"""多个 OpenAI 兼容端点组成的 LLM 池：负载均衡、对冲请求与健康剔除
+
+create_llm() 原先只绑定一个 OPENAI_BASE_URL/key/model，某个端点变慢或被限流时整个任务的尾延迟都被拖高。
+配置 LLM_ENDPOINTS 后，create_llm() 返回 LLMPool，对外提供与 ChatOpenAI 相同的 invoke / stream / bind
+（以及异步的 ainvoke / astream）：
+- 每个端点有并发上限，请求路由到当前负载（进行中请求数/并发上限）最低的健康端点
+- 对冲：请求在该端点最近延迟的 p{LLM_HEDGE_PERCENTILE} 内还没有返回（流式调用看首个分块），
+  就向另一个端点再发一次，采用先返回的结果
+- 剔除：端点连续失败 LLM_EJECT_FAILURES 次后暂停使用 LLM_EJECT_SECONDS 秒；失败的请求转到其他端点重试
+
+配置（.env）：
+    LLM_ENDPOINTS=[{"name": "a", "base_url": "https://api.a.com/v1", "api_key_env": "A_KEY", "model": "gpt-4o-mini", "max_concurrency": 8},
+                   {"name": "b", "base_url": "https://api.b.com/v1", "api_key": "sk-...", "max_concurrency": 4}]
+    # 或 LLM_ENDPOINTS_FILE=llm_endpoints.json；未指定的 model/api_key 使用 OPENAI_MODEL/OPENAI_API_KEY
+    LLM_HEDGE_PERCENTILE=95
+    LLM_HEDGE_MIN_SAMPLES=10       # 样本不足时不对冲
+    LLM_EJECT_FAILURES=3
+    LLM_EJECT_SECONDS=30
+"""
+import asyncio
+import copy
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from config import get_env_var
+
+
+# 每个端点保留的延迟样本数
+LATENCY_WINDOW = 200
+# 异步调用在所有端点都达到并发上限时的重试间隔
+ACQUIRE_POLL_SECONDS = 0.05
+INVOKE = "invoke"
+STREAM = "stream"
+
+
+def _percentile(samples, percentile: float) -> float:
+    ordered = sorted(samples)
+    position = min(len(ordered) - 1, max(0, round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[position]
+
+
+class Endpoint:
+    """池中的一个端点及其负载、延迟和健康状态"""
+
+    def __init__(self, name: str, llm, max_concurrency: int):
+        self.name = name
+        self.llm = llm
+        self.max_concurrency = max(1, max_concurrency)
+        self.in_flight = 0
+        # invoke 记录完整耗时，stream 记录首个分块的耗时
+        self.latencies = {INVOKE: deque(maxlen=LATENCY_WINDOW), STREAM: deque(maxlen=LATENCY_WINDOW)}
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.max_concurrency
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def typical_latency(self, kind: str) -> float:
+        samples = self.latencies[kind]
+        return _percentile(samples, 50) if samples else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"requests": self.requests, "failures": self.failures, "ejections": self.ejections,
+                 "in_flight": self.in_flight}
+        for kind, samples in self.latencies.items():
+            if samples:
+                stats[f"{kind}_p50"] = round(_percentile(samples, 50), 3)
+                stats[f"{kind}_p99"] = round(_percentile(samples, 99), 3)
+        return stats
+
+
+class Slot:
+    """一次调用占用的端点并发名额
+
+    调用结束时归还；调用方已不再等待（落选的对冲请求）时提前归还，
+    之后调用结束时不再重复归还，也不计入端点的延迟和失败统计。
+    """
+
+    __slots__ = ("endpoint", "released")
+
+    def __init__(self, endpoint: Endpoint):
+        self.endpoint = endpoint
+        self.released = False
+
+
+class LLMPool:
+    """对外表现为一个 LLM，内部在多个端点间路由、对冲和重试"""
+
+    def __init__(self, endpoints: List[Endpoint], hedge_percentile: float = 95, hedge_min_samples: int = 10,
+                 eject_failures: int = 3, eject_seconds: float = 30):
+        if not endpoints:
+            raise ValueError("LLM池中至少需要一个端点")
+        self.endpoints = endpoints
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self._bind_kwargs: Dict[str, Any] = {}
+        self._cond = threading.Condition()
+        self.counters = {"hedges": 0, "hedges_won": 0, "retries": 0}
+
+    @classmethod
+    def from_config(cls, endpoint_configs: List[Dict[str, Any]]) -> "LLMPool":
+        from langchain_openai import ChatOpenAI  # 延迟导入，避免拖慢启动
+
+        endpoints = []
+        for i, endpoint_config in enumerate(endpoint_configs):
+            api_key = endpoint_config.get("api_key")
+            if not api_key and endpoint_config.get("api_key_env"):
+                api_key = get_env_var(endpoint_config["api_key_env"])
+            llm_config = {
+                "model": endpoint_config.get("model") or get_env_var("OPENAI_MODEL", "gpt-3.5-turbo"),
+                "temperature": 0,
+                "api_key": api_key or get_env_var("OPENAI_API_KEY"),
+            }
+            if endpoint_config.get("base_url"):
+                llm_config["base_url"] = endpoint_config["base_url"]
+            endpoints.append(Endpoint(
+                endpoint_config.get("name") or endpoint_config.get("base_url") or f"endpoint-{i}",
+                ChatOpenAI(**llm_config),
+                int(endpoint_config.get("max_concurrency", 4)),
+            ))
+        return cls(
+            endpoints,
+            hedge_percentile=float(get_env_var("LLM_HEDGE_PERCENTILE", "95")),
+            hedge_min_samples=int(get_env_var("LLM_HEDGE_MIN_SAMPLES", "10")),
+            eject_failures=int(get_env_var("LLM_EJECT_FAILURES", "3")),
+            eject_seconds=float(get_env_var("LLM_EJECT_SECONDS", "30")),
+        )
+
+    # ---- 与 ChatOpenAI 相同的调用接口 ----
+
+    def bind(self, **kwargs) -> "LLMPool":
+        """返回共享端点状态、附带调用参数（如 response_format）的池"""
+        bound = copy.copy(self)
+        bound._bind_kwargs = {**self._bind_kwargs, **kwargs}
+        return bound
+
+    def invoke(self, messages, **kwargs):
+        events = self._run(INVOKE, messages, kwargs)
+        try:
+            return next(events)
+        finally:
+            events.close()
+
+    def stream(self, messages, **kwargs):
+        yield from self._run(STREAM, messages, kwargs)
+
+    async def ainvoke(self, messages, **kwargs):
+        events = self._arun(INVOKE, messages, kwargs)
+        try:
+            return await events.__anext__()
+        finally:
+            await events.aclose()
+
+    async def astream(self, messages, **kwargs):
+        async for chunk in self._arun(STREAM, messages, kwargs):
+            yield chunk
+
+    # ---- 路由 ----
+
+    def _pick(self, exclude: set) -> Optional[Endpoint]:
+        """在未尝试过的端点中选负载最低的健康端点；全部被剔除时退而使用最早恢复的端点"""
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e.name not in exclude and e.in_flight < e.max_concurrency]
+        healthy = [e for e in candidates if e.healthy(now)]
+        if healthy:
+            return min(healthy, key=lambda e: (e.load, e.typical_latency(INVOKE)))
+        if candidates and not any(e.healthy(now) for e in self.endpoints if e.name not in exclude):
+            return min(candidates, key=lambda e: e.ejected_until)
+        return None
+
+    def _try_acquire(self, exclude: set) -> Optional[Endpoint]:
+        """占用一个端点的并发名额（调用方持有 self._cond）"""
+        endpoint = self._pick(exclude)
+        if endpoint is not None:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        return endpoint
+
+    def _all_tried(self, exclude: set) -> bool:
+        return all(e.name in exclude for e in self.endpoints)
+
+    def _acquire(self, exclude: set, block: bool) -> Optional[Endpoint]:
+        with self._cond:
+            while True:
+                if self._all_tried(exclude):
+                    return None
+                endpoint = self._try_acquire(exclude)
+                if endpoint is not None or not block:
+                    return endpoint
+                # 全部达到并发上限时等待其他请求结束（有超时，以便被剔除的端点恢复后重新选择）
+                self._cond.wait(timeout=1.0)
+
+    async def _aacquire(self, exclude: set, block: bool) -> Optional[Endpoint]:
+        """_acquire 的异步版本：没有空闲名额时让出事件循环后重试"""
+        while True:
+            with self._cond:
+                if self._all_tried(exclude):
+                    return None
+                endpoint = self._try_acquire(exclude)
+            if endpoint is not None or not block:
+                return endpoint
+            await asyncio.sleep(ACQUIRE_POLL_SECONDS)
+
+    def _release(self, slot: Slot, kind: str, latency: Optional[float], error: Optional[Exception]) -> None:
+        with self._cond:
+            if slot.released:
+                return
+            slot.released = True
+            endpoint = slot.endpoint
+            endpoint.in_flight -= 1
+            if error is None:
+                endpoint.consecutive_failures = 0
+                if latency is not None:
+                    endpoint.latencies[kind].append(latency)
+            else:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.eject_failures:
+                    endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                    endpoint.ejections += 1
+                    endpoint.consecutive_failures = 0
+                    print(f"[LLM-POOL] 端点 {endpoint.name} 连续失败，暂停使用 {self.eject_seconds}s")
+            self._cond.notify_all()
+
+    def _abandon(self, slot: Slot) -> None:
+        """调用方不再等待该调用：立即归还并发名额，调用本身在后台结束后不再归还"""
+        with self._cond:
+            if slot.released:
+                return
+            slot.released = True
+            slot.endpoint.in_flight -= 1
+            self._cond.notify_all()
+
+    def _count(self, name: str) -> None:
+        with self._cond:
+            self.counters[name] += 1
+
+    def _hedge_delay(self, endpoint: Endpoint, kind: str) -> Optional[float]:
+        samples = endpoint.latencies[kind]
+        if len(self.endpoints) < 2 or len(samples) < self.hedge_min_samples:
+            return None
+        return _percentile(samples, self.hedge_percentile)
+
+    # ---- 执行 ----
+
+    def _attempt(self, slot: Slot, kind: str, messages, kwargs, attempt_id: int,
+                 events: queue.Queue, cancel: threading.Event) -> None:
+        """在后台线程中调用一个端点，把结果或分块放入事件队列
+
+        同步调用无法中断：落选后 invoke 照常运行到结束，stream 在下一个分块到达时停止；
+        两者的并发名额都在落选时由调用方提前归还。
+        """
+        endpoint = slot.endpoint
+        llm = endpoint.llm.bind(**self._bind_kwargs) if self._bind_kwargs else endpoint.llm
+        started_at = time.monotonic()
+        latency = None
+        error = None
+        try:
+            if kind == INVOKE:
+                result = llm.invoke(messages, **kwargs)
+                latency = time.monotonic() - started_at
+                events.put((attempt_id, "first", result))
+            else:
+                for chunk in llm.stream(messages, **kwargs):
+                    if latency is None:
+                        latency = time.monotonic() - started_at
+                        events.put((attempt_id, "first", chunk))
+                    else:
+                        events.put((attempt_id, "chunk", chunk))
+                    if cancel.is_set():
+                        break
+            events.put((attempt_id, "done", None))
+        except Exception as e:
+            error = e
+            events.put((attempt_id, "error", e))
+        finally:
+            self._release(slot, kind, latency, error)
+
+    def _run(self, kind: str, messages, kwargs):
+        """调度一次调用：首选端点 + 按需对冲/重试，产出被采用的那次调用的结果（invoke）或分块（stream）"""
+        events: queue.Queue = queue.Queue()
+        attempts: Dict[int, tuple] = {}
+        tried: set = set()
+        active: set = set()
+        hedge_ids: set = set()
+
+        def launch(block: bool) -> Optional[Endpoint]:
+            endpoint = self._acquire(tried, block)
+            if endpoint is None:
+                return None
+            attempt_id = len(attempts)
+            cancel = threading.Event()
+            slot = Slot(endpoint)
+            attempts[attempt_id] = (slot, cancel)
+            tried.add(endpoint.name)
+            active.add(attempt_id)
+            threading.Thread(target=self._attempt, daemon=True,
+                             args=(slot, kind, messages, kwargs, attempt_id, events, cancel)).start()
+            return endpoint
+
+        primary = launch(block=True)
+        delay = self._hedge_delay(primary, kind)
+        hedge_at = time.monotonic() + delay if delay is not None else None
+        committed = None
+
+        try:
+            while True:
+                timeout = None
+                if committed is None and hedge_at is not None:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    attempt_id, event, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_at = None
+                    if launch(block=False) is not None:
+                        hedge_ids.add(len(attempts) - 1)
+                        self._count("hedges")
+                    continue
+
+                if committed is None:
+                    if event == "error":
+                        active.discard(attempt_id)
+                        print(f"[LLM-POOL] 端点 {attempts[attempt_id][0].endpoint.name} 调用失败: {payload}")
+                        if not active:
+                            if launch(block=True) is None:
+                                raise payload
+                            self._count("retries")
+                        continue
+                    # 采用最先返回的调用，其余调用取消并归还并发名额
+                    committed = attempt_id
+                    if attempt_id in hedge_ids:
+                        self._count("hedges_won")
+                    for other_id, (slot, cancel) in attempts.items():
+                        if other_id != committed:
+                            cancel.set()
+                            self._abandon(slot)
+                    if event == "done":
+                        return
+                    yield payload
+                    continue
+
+                if attempt_id != committed:
+                    continue
+                if event == "chunk":
+                    yield payload
+                elif event == "done":
+                    return
+                elif event == "error":
+                    raise payload
+        finally:
+            for slot, cancel in attempts.values():
+                cancel.set()
+                self._abandon(slot)
+
+    async def _aattempt(self, slot: Slot, kind: str, messages, kwargs, attempt_id: int,
+                        events: asyncio.Queue) -> None:
+        """_attempt 的异步版本；落选的调用直接取消任务"""
+        endpoint = slot.endpoint
+        llm = endpoint.llm.bind(**self._bind_kwargs) if self._bind_kwargs else endpoint.llm
+        started_at = time.monotonic()
+        latency = None
+        error = None
+        try:
+            if kind == INVOKE:
+                result = await llm.ainvoke(messages, **kwargs)
+                latency = time.monotonic() - started_at
+                events.put_nowait((attempt_id, "first", result))
+            else:
+                async for chunk in llm.astream(messages, **kwargs):
+                    if latency is None:
+                        latency = time.monotonic() - started_at
+                        events.put_nowait((attempt_id, "first", chunk))
+                    else:
+                        events.put_nowait((attempt_id, "chunk", chunk))
+            events.put_nowait((attempt_id, "done", None))
+        except Exception as e:
+            error = e
+            events.put_nowait((attempt_id, "error", e))
+        finally:
+            self._release(slot, kind, latency, error)
+
+    async def _arun(self, kind: str, messages, kwargs):
+        """_run 的异步版本：各次调用是同一事件循环中的任务"""
+        events: asyncio.Queue = asyncio.Queue()
+        attempts: Dict[int, tuple] = {}
+        tried: set = set()
+        active: set = set()
+        hedge_ids: set = set()
+
+        async def launch(block: bool) -> Optional[Endpoint]:
+            endpoint = await self._aacquire(tried, block)
+            if endpoint is None:
+                return None
+            attempt_id = len(attempts)
+            tried.add(endpoint.name)
+            active.add(attempt_id)
+            attempt = self._aattempt
+            if "cpu_profile" in sys.modules:  # CPU 采样时对冲任务归入调用方所在的节点；未开启采样时不加载该模块
+                from cpu_profile import bind_node
+                attempt = bind_node(attempt)
+            slot = Slot(endpoint)
+            task = asyncio.create_task(attempt(slot, kind, messages, kwargs, attempt_id, events))
+            attempts[attempt_id] = (slot, task)
+            return endpoint
+
+        primary = await launch(block=True)
+        delay = self._hedge_delay(primary, kind)
+        hedge_at = time.monotonic() + delay if delay is not None else None
+        committed = None
+
+        try:
+            while True:
+                timeout = None
+                if committed is None and hedge_at is not None:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    attempt_id, event, payload = await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    hedge_at = None
+                    if await launch(block=False) is not None:
+                        hedge_ids.add(len(attempts) - 1)
+                        self._count("hedges")
+                    continue
+
+                if committed is None:
+                    if event == "error":
+                        active.discard(attempt_id)
+                        print(f"[LLM-POOL] 端点 {attempts[attempt_id][0].endpoint.name} 调用失败: {payload}")
+                        if not active:
+                            if await launch(block=True) is None:
+                                raise payload
+                            self._count("retries")
+                        continue
+                    committed = attempt_id
+                    if attempt_id in hedge_ids:
+                        self._count("hedges_won")
+                    for other_id, (slot, task) in attempts.items():
+                        if other_id != committed:
+                            self._abandon(slot)
+                            task.cancel()
+                    if event == "done":
+                        return
+                    yield payload
+                    continue
+
+                if attempt_id != committed:
+                    continue
+                if event == "chunk":
+                    yield payload
+                elif event == "done":
+                    return
+                elif event == "error":
+                    raise payload
+        finally:
+            for slot, task in attempts.values():
+                self._abandon(slot)
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"endpoints": {e.name: e.stats() for e in self.endpoints}, **self.counters}
+
+
+_pool: Optional[LLMPool] = None
+
+
+def load_endpoint_configs() -> Optional[List[Dict[str, Any]]]:
+    """读取 LLM_ENDPOINTS（JSON）或 LLM_ENDPOINTS_FILE；未配置时返回 None"""
+    raw = get_env_var("LLM_ENDPOINTS")
+    path = get_env_var("LLM_ENDPOINTS_FILE")
+    if not raw and path:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = f.read()
+    if not raw or not raw.strip():
+        return None
+    return json.loads(raw)
+
+
+def get_llm_pool() -> Optional[LLMPool]:
+    """进程内共享的 LLM 池（延迟统计跨任务累积）；未配置多个端点时返回 None"""
+    global _pool
+    if _pool is None:
+        endpoint_configs = load_endpoint_configs()
+        if endpoint_configs:
+            _pool = LLMPool.from_config(endpoint_configs)
+    return _pool
@@ -1,9 +1,64 @@
+import argparse
+import contextlib
+import os
+import sys
+
 from workflow import run_workflow
 from config import check_required_env_vars, print_env_config
+from result_stream import create_sink
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="微信公众号文章收集工具")
+    parser.add_argument("query", nargs="?", default=None,
+                        help="查询请求；提供时只执行一次，不进入交互模式")
+    parser.add_argument("--stream", choices=["jsonl", "file"], default=None,
+                        help="渐进输出短新闻：jsonl 逐条输出到标准输出，file 写入部分结果文件")
+    parser.add_argument("--stream-file", default=None,
+                        help="--stream file 时的部分结果文件路径，默认 output/partial_<时间>.jsonl")
+    parser.add_argument("--memory-profile", action="store_true",
+                        help="统计每个工作流节点的内存占用，每次任务结束后输出报告")
+    parser.add_argument("--profile", action="store_true",
+                        help="CPU采样分析：每次任务结束后写出火焰图用的折叠调用栈和按节点的热点报告")
+    return parser.parse_args(argv)
+
+
+def cpu_profiling(profile: bool):
+    """--profile 时在CPU采样下运行；未开启时不加载采样模块"""
+    if not profile:
+        return contextlib.nullcontext()
+    from cpu_profile import profiling
+    return profiling("cli")
 
 
-def main():
+def run_once(user_input: str, stream: str = None, stream_file: str = None, profile: bool = False):
+    """执行一次查询；开启渐进输出时，每条短新闻提取后立即输出"""
+    if not stream:
+        with cpu_profiling(profile):
+            return run_workflow(user_input)
+
+    sink = create_sink(stream, stream_file)
+    try:
+        if stream == "jsonl":
+            # 标准输出只保留JSONL结果，日志（包括CPU采样报告）改写到标准错误
+            with contextlib.redirect_stdout(sys.stderr), cpu_profiling(profile):
+                return run_workflow(user_input, result_sink=sink)
+        print(f"📝 短新闻将逐条写入: {sink.path}")
+        with cpu_profiling(profile):
+            return run_workflow(user_input, result_sink=sink)
+    finally:
+        sink.close()
+
+
+def main(argv=None):
     """主函数，提供用户交互界面"""
+    args = parse_args(argv)
+    if args.memory_profile:
+        os.environ["MEMORY_PROFILE"] = "true"
+    if args.query:
+        result = run_once(args.query, args.stream, args.stream_file, args.profile)
+        return 1 if result.get("error_message") else 0
+
     print("=== 微信公众号文章收集工具 ===")
     print("使用说明：")
     print("1. 输入包含公众号名称的查询请求")
@@ -48,7 +103,7 @@ def main():
             
             # 执行工作流
             print(f"\n开始处理请求: {user_input}")
-            result = run_workflow(user_input)
+            result = run_once(user_input, args.stream, args.stream_file, args.profile)
             
             # 显示结果总结
             if result.get("error_message"):
@@ -84,4 +139,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""按工作流节点统计内存占用（可选开启）
+
+长时间运行的 main.main 会话和批处理中观察到内存持续上涨，但无法判断是哪个阶段持有对象不释放。
+开启后（MEMORY_PROFILE=true 或 main.py --memory-profile），create_workflow 中的每个节点都被包装：
+- 节点运行前后各取一次 tracemalloc 快照，记录节点运行期间的峰值增量和运行结束后仍保留的增量
+- 按源代码行汇总保留的分配
+tracemalloc 的计数和峰值是进程级的，同时运行的节点（如并行分支 llm_extract_keyword 与
+llm_parse_conditions）无法分开统计，因此合并为一步：从第一个节点开始到最后一个节点结束，
+报告中以 "节点A + 节点B" 的形式列出。
+每次 run_workflow 结束后输出报告，并记录 WorkflowState 各字段的大小；
+同一进程中某字段的大小在连续多次任务中持续增长时予以标记。
+
+配置（.env）：
+    MEMORY_PROFILE=false
+    MEMORY_PROFILE_TOP_LINES=10      # 每个节点输出的源代码行数
+    MEMORY_PROFILE_FRAMES=1          # tracemalloc 记录的调用栈深度
+"""
+import functools
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config import get_env_var
+
+
+# 字段大小连续增长多少次任务后予以标记
+GROWTH_JOBS = 3
+
+
+def enabled() -> bool:
+    return (get_env_var("MEMORY_PROFILE", "false") or "").lower() == "true"
+
+
+def approx_size(obj: Any, seen: Optional[set] = None) -> int:
+    """递归估算对象占用的字节数（容器、__dict__ 和 __slots__ 中的对象都计入，重复引用只算一次）"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += approx_size(vars(obj), seen)
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                size += approx_size(getattr(obj, slot), seen)
+    return size
+
+
+def _retained_lines(after: "tracemalloc.Snapshot", before: "tracemalloc.Snapshot", limit: int) -> list:
+    """按源代码行比较两次快照，返回保留分配增长最多的行"""
+    import tracemalloc
+
+    # 排除 tracemalloc 和本模块自身的分配（快照对象等）
+    excluded = {tracemalloc.__file__, __file__}
+    stats = (stat for stat in after.compare_to(before, "lineno")
+             if stat.size_diff > 0 and stat.traceback[0].filename not in excluded)
+    return [stat for _, stat in zip(range(limit), stats)]
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+class MemoryProfiler:
+    """进程内的节点内存统计，跨多次任务累积"""
+
+    def __init__(self):
+        self.top_lines = int(get_env_var("MEMORY_PROFILE_TOP_LINES", "10"))
+        self.frames = int(get_env_var("MEMORY_PROFILE_FRAMES", "1"))
+        self.jobs = 0
+        self.node_stats: List[Dict[str, Any]] = []       # 当前任务中各节点的统计
+        self.field_history: Dict[str, List[int]] = {}     # 各状态字段在每次任务结束时的大小
+        self.process_history: List[int] = []              # 每次任务结束时 tracemalloc 跟踪的总内存
+        self._lock = threading.Lock()
+        self._open: Optional[Dict[str, Any]] = None       # 正在进行的测量，同时运行的节点共用
+
+    def start(self) -> None:
+        import tracemalloc  # 只在开启内存统计时加载
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def wrap_node(self, name: str, fn: Callable) -> Callable:
+        """包装节点函数；functools.wraps 保留原签名，LangGraph 仍按需传入 config
+
+        异步节点同样可以包装；同一事件循环中并发运行的任务与并行分支一样合并为一步统计，
+        定位某个节点的内存问题时应一次只运行一个任务。
+        """
+        import inspect
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                measurement = self._begin(name)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self._end(measurement)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            measurement = self._begin(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._end(measurement)
+        return wrapper
+
+    def _begin(self, name: str) -> Dict[str, Any]:
+        """开始测量；已有节点在运行时加入其测量，不重置进程级的峰值"""
+        import tracemalloc
+
+        self.start()
+        with self._lock:
+            measurement = self._open
+            if measurement is None:
+                # 先取快照再读计数，快照本身占用的内存不计入节点
+                before = tracemalloc.take_snapshot()
+                tracemalloc.reset_peak()
+                before_current, _ = tracemalloc.get_traced_memory()
+                measurement = self._open = {"nodes": [], "running": 0, "before": before,
+                                            "before_current": before_current, "started_at": time.perf_counter()}
+            if name not in measurement["nodes"]:
+                measurement["nodes"].append(name)
+            measurement["running"] += 1
+            return measurement
+
+    def _end(self, measurement: Dict[str, Any]) -> None:
+        """结束测量；同时运行的节点全部结束后才记录一行统计"""
+        import tracemalloc
+
+        with self._lock:
+            measurement["running"] -= 1
+            if measurement["running"]:
+                return
+            self._open = None
+            elapsed = time.perf_counter() - measurement["started_at"]
+            after_current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            self.node_stats.append({
+                "node": " + ".join(measurement["nodes"]),
+                "seconds": elapsed,
+                "peak": peak - measurement["before_current"],
+                "retained": after_current - measurement["before_current"],
+                "lines": _retained_lines(after, measurement["before"], self.top_lines),
+            })
+
+    def end_job(self, state: Dict[str, Any]) -> str:
+        """一次任务结束：记录状态字段大小与进程内存，返回报告文本并清空节点统计"""
+        import tracemalloc
+
+        self.jobs += 1
+        for field, value in state.items():
+            self.field_history.setdefault(field, []).append(approx_size(value))
+        if tracemalloc.is_tracing():
+            self.process_history.append(tracemalloc.get_traced_memory()[0])
+        report = self.report(state)
+        self.node_stats = []
+        return report
+
+    def growing_fields(self) -> List[str]:
+        """最近 GROWTH_JOBS 次任务中大小持续增长的状态字段"""
+        growing = []
+        for field, sizes in self.field_history.items():
+            recent = sizes[-(GROWTH_JOBS + 1):]
+            if len(recent) > GROWTH_JOBS and all(b > a for a, b in zip(recent, recent[1:])):
+                growing.append(field)
+        return growing
+
+    def report(self, state: Dict[str, Any]) -> str:
+        lines = [f"=== 内存报告（进程内第 {self.jobs} 次任务） ==="]
+        width = max([24] + [len(stat["node"]) + 2 for stat in self.node_stats])
+        lines.append(f"{'节点':<{width}}{'耗时':>10}{'峰值增量':>14}{'保留增量':>14}")
+        lines.append("（tracemalloc 按进程统计，同时运行的节点合并为一行）")
+        for stat in self.node_stats:
+            lines.append(f"{stat['node']:<{width}}{stat['seconds']:>9.2f}s"
+                         f"{_format_bytes(stat['peak']):>14}{_format_bytes(stat['retained']):>14}")
+
+        for stat in self.node_stats:
+            if not stat["lines"]:
+                continue
+            lines.append(f"\n[{stat['node']}] 保留分配最多的源代码行：")
+            for line_stat in stat["lines"]:
+                frame = line_stat.traceback[0]
+                lines.append(f"  {_format_bytes(line_stat.size_diff):>10}  {line_stat.count_diff:+7d} 个  "
+                             f"{frame.filename}:{frame.lineno}")
+
+        lines.append("\n状态字段大小：")
+        for field in state:
+            sizes = self.field_history.get(field, [])
+            if sizes:
+                lines.append(f"  {field:<20}{_format_bytes(sizes[-1]):>12}")
+
+        if len(self.process_history) > 1:
+            growth = self.process_history[-1] - self.process_history[0]
+            lines.append(f"\n进程跟踪内存：{_format_bytes(self.process_history[-1])}"
+                         f"（较第1次任务结束时 {'+' if growth >= 0 else ''}{_format_bytes(growth)}）")
+        for field in self.growing_fields():
+            sizes = ", ".join(_format_bytes(size) for size in self.field_history[field][-(GROWTH_JOBS + 1):])
+            lines.append(f"⚠️ 状态字段 {field} 在连续 {GROWTH_JOBS} 次任务中持续增长: {sizes}")
+        return "\n".join(lines)
+
+
+_profiler: Optional[MemoryProfiler] = None
+
+
+def get_profiler() -> Optional[MemoryProfiler]:
+    """开启内存统计时返回进程内唯一的 MemoryProfiler，否则返回 None"""
+    global _profiler
+    if _profiler is None and enabled():
+        _profiler = MemoryProfiler()
+        _profiler.start()
+    return _profiler
+
+
+def profiled(name: str, fn: Callable) -> Callable:
+    """开启内存统计时包装节点，否则原样返回"""
+    profiler = get_profiler()
+    return profiler.wrap_node(name, fn) if profiler else fn
@@ -0,0 +1,240 @@
+"""已抓取文章页面的压缩归档
+
+fetch_article_content 原先提取正文后就丢掉了 HTML，审计或换一种正文提取方式/提示词重新处理
+历史文章时只能重新下载。这里把抓取到的原始 HTML 追加写入归档：
+- 段文件 seg-00000.dat ...：每条记录为 [链接长度 u32][规范化链接][zlib压缩的HTML]，只追加不修改，
+  超过 PAGE_ARCHIVE_SEGMENT_MB 后换新段
+- 索引 index.bin：定长记录 [文章标识哈希 16B][段号 u32][偏移 u64][长度 u32][抓取时间 u32]，
+  打开时通过 mmap 读入哈希表；读取页面时直接对段文件 mmap 切片解压，不经过额外的读缓冲
+索引键为 article_identity.article_id，同一篇文章的长短链接、带追踪参数的链接命中同一条记录；
+旧版本按规范化链接写入的记录仍可读取。同一篇文章多次写入时以最后一次为准。
+启用归档时文章页面完整下载，超过 ARTICLE_MAX_BYTES 被截断的页面不写入归档。
+
+用法：
+    python page_archive.py stats
+    python page_archive.py get "https://mp.weixin.qq.com/s?__biz=...&mid=...&idx=1&sn=..."
+    python page_archive.py reparse --output output/reparsed.jsonl   # 用当前的正文提取逻辑重新处理全部归档页面
+
+归档只追加、不自动清理，默认关闭；开启后需要自行清理或定期删除 PAGE_ARCHIVE_DIR。
+
+配置（.env）：
+    PAGE_ARCHIVE_ENABLED=false
+    PAGE_ARCHIVE_DIR=cache/pages
+    PAGE_ARCHIVE_SEGMENT_MB=64
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+from article_identity import article_id, normalize_link
+from config import get_env_var
+from file_lock import file_lock
+
+
+INDEX_FILE = "index.bin"
+INDEX_RECORD = struct.Struct("<16sIQII")   # 文章标识哈希, 段号, 偏移, 长度, 抓取时间
+LINK_LENGTH = struct.Struct("<I")
+
+
+def link_hash(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class PageArchive:
+    """只追加的页面归档：压缩段文件 + mmap 定长索引"""
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        self._entries: Dict[bytes, Tuple[int, int, int, int]] = {}
+        self._index_size = 0
+        self._max_segment = 0
+        self._segment_maps: Dict[int, Tuple[int, mmap.mmap]] = {}
+        open(self._index_path, "ab").close()
+        self._load_index()
+
+    # ---- 索引 ----
+
+    def _load_index(self) -> None:
+        """读入索引文件中新增的记录（其他进程也可能在追加）"""
+        size = os.path.getsize(self._index_path)
+        size -= size % INDEX_RECORD.size  # 忽略写了一半的记录
+        if size <= self._index_size:
+            return
+        with open(self._index_path, "rb") as f:
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as index_map:
+                for position in range(self._index_size, size, INDEX_RECORD.size):
+                    key, segment, offset, length, fetched_at = INDEX_RECORD.unpack_from(index_map, position)
+                    self._entries[key] = (segment, offset, length, fetched_at)
+                    self._max_segment = max(self._max_segment, segment)
+        self._index_size = size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return self._lookup(url) is not None
+
+    def _lookup(self, url: str) -> Optional[Tuple[int, int, int, int]]:
+        # 先按文章标识查找，再按旧版本的规范化链接键查找
+        keys = (link_hash(article_id(url)), link_hash(normalize_link(url)))
+        entry = self._find(keys)
+        if entry is None:
+            with self._lock:
+                self._load_index()
+            entry = self._find(keys)
+        return entry
+
+    def _find(self, keys) -> Optional[Tuple[int, int, int, int]]:
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    # ---- 段文件 ----
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"seg-{segment:05d}.dat")
+
+    def _current_segment(self) -> Tuple[int, int]:
+        """返回 (可写入的段号, 当前大小)"""
+        segment = self._max_segment
+        while os.path.exists(self._segment_path(segment + 1)):
+            segment += 1
+        path = self._segment_path(segment)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size >= self.segment_bytes:
+            return segment + 1, 0
+        return segment, size
+
+    def _segment_view(self, segment: int, end: int) -> memoryview:
+        """段文件的只读 mmap；段在映射后增长时重新映射"""
+        mapped = self._segment_maps.get(segment)
+        if mapped is None or mapped[0] < end:
+            if mapped is not None:
+                mapped[1].close()
+            with open(self._segment_path(segment), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                mapped = (size, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ))
+            self._segment_maps[segment] = mapped
+        return memoryview(mapped[1])
+
+    # ---- 读写 ----
+
+    def put(self, url: str, html: bytes) -> None:
+        """追加一个页面"""
+        link = normalize_link(url).encode("utf-8")
+        record = LINK_LENGTH.pack(len(link)) + link + zlib.compress(html, 6)
+        with self._lock:
+            with file_lock(self._index_path):
+                self._load_index()
+                segment, offset = self._current_segment()
+                with open(self._segment_path(segment), "ab") as f:
+                    f.write(record)
+                with open(self._index_path, "ab") as f:
+                    f.write(INDEX_RECORD.pack(link_hash(article_id(url)), segment, offset,
+                                              len(record), int(time.time())))
+            self._load_index()
+
+    def _read_record(self, entry: Tuple[int, int, int, int]) -> Tuple[str, bytes]:
+        segment, offset, length, _ = entry
+        # 切片和解压都直接作用于 mmap，用完立即释放视图，段增长时才能重新映射
+        with self._lock, self._segment_view(segment, offset + length) as view, view[offset:offset + length] as record:
+            (link_length,) = LINK_LENGTH.unpack_from(record)
+            link_end = LINK_LENGTH.size + link_length
+            link = str(record[LINK_LENGTH.size:link_end], "utf-8")
+            return link, zlib.decompress(record[link_end:])
+
+    def get(self, url: str) -> Optional[bytes]:
+        """按链接读取归档的 HTML，没有时返回 None"""
+        entry = self._lookup(url)
+        if entry is None:
+            return None
+        return self._read_record(entry)[1]
+
+    def iter_pages(self) -> Iterator[Tuple[str, bytes]]:
+        """按写入顺序遍历全部页面（每个链接只返回最新的一份）"""
+        with self._lock:
+            self._load_index()
+        for entry in sorted(self._entries.values()):
+            yield self._read_record(entry)
+
+    def stats(self) -> Dict[str, int]:
+        segments = sorted({entry[0] for entry in self._entries.values()})
+        compressed = sum(os.path.getsize(self._segment_path(s)) for s in segments)
+        return {"pages": len(self._entries), "segments": len(segments), "compressed_bytes": compressed}
+
+    def close(self) -> None:
+        for _, mapped in self._segment_maps.values():
+            mapped.close()
+        self._segment_maps.clear()
+
+
+_archive: Optional[PageArchive] = None
+_archive_checked = False
+
+
+def get_page_archive() -> Optional[PageArchive]:
+    """按环境变量打开的全局归档；未设置 PAGE_ARCHIVE_ENABLED=true 时返回 None"""
+    global _archive, _archive_checked
+    if not _archive_checked:
+        _archive_checked = True
+        if (get_env_var("PAGE_ARCHIVE_ENABLED", "false") or "").lower() == "true":
+            _archive = PageArchive(
+                get_env_var("PAGE_ARCHIVE_DIR", "cache/pages"),
+                int(float(get_env_var("PAGE_ARCHIVE_SEGMENT_MB", "64")) * 1024 * 1024),
+            )
+    return _archive
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="文章页面归档")
+    parser.add_argument("--dir", default=get_env_var("PAGE_ARCHIVE_DIR", "cache/pages"), help="归档目录")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="归档统计")
+    get_parser = subparsers.add_parser("get", help="输出某个链接的归档HTML")
+    get_parser.add_argument("url")
+    reparse_parser = subparsers.add_parser("reparse", help="用当前的正文提取逻辑重新处理全部归档页面")
+    reparse_parser.add_argument("--output", default="output/reparsed.jsonl")
+    args = parser.parse_args(argv)
+
+    archive = PageArchive(args.dir)
+    if args.command == "stats":
+        for name, value in archive.stats().items():
+            print(f"{name:<18} {value}")
+    elif args.command == "get":
+        html = archive.get(args.url)
+        if html is None:
+            print(f"❌ 归档中没有该链接: {normalize_link(args.url)}")
+            return 1
+        sys.stdout.buffer.write(html)
+    elif args.command == "reparse":
+        from llm_nodes import extract_article_text
+
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        count = 0
+        with open(args.output, "w", encoding="utf-8") as f:
+            for link, html in archive.iter_pages():
+                f.write(json.dumps({"link": link, "content": extract_article_text(html)}, ensure_ascii=False) + "\n")
+                count += 1
+        print(f"已重新处理 {count} 个归档页面: {args.output}")
+    archive.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
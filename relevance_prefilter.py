@@ -0,0 +1,93 @@
+"""LLM调用前的本地相关性预筛
+
+在把文章发给LLM之前，先基于已获取的正文做低成本打分：
+- 正文关键词命中：关键词只出现在标题、正文毫不相关的文章得分较低
+- 最小长度：正文过短（纯图片、转发语等）直接跳过
+- 套话检测：招聘启事、商务合作、报名推广等明确的广告用语扣分
+得分低于阈值的文章不再调用LLM，节省的调用次数记入 run_stats["prefilter"]。
+标题已命中用户关键词的文章只打分、不跳过：预筛不应改变用户筛选条件选中的结果。
+默认关闭，需要节省LLM调用时再开启。
+
+配置（.env）：
+    PREFILTER_ENABLED=false
+    PREFILTER_MIN_LENGTH=200
+    PREFILTER_SCORE_THRESHOLD=0.5
+"""
+from typing import List, Optional, TypedDict
+
+from config import get_env_var
+from keyword_matcher import AhoCorasick, KeywordMatcher
+
+
+# 只在招聘启事、广告推广文章中出现的用语；福利、折扣、长按识别等普通文章也常用的词不计入
+BOILERPLATE_TERMS = [
+    "诚聘", "招聘启事", "岗位职责", "任职要求", "投递简历", "简历投递",
+    "广告合作", "商务合作", "合作请联系",
+    "扫码报名", "立即报名", "转发集赞",
+]
+
+# 只检查正文开头，套话通常集中在前面
+BOILERPLATE_SCAN_CHARS = 800
+
+_boilerplate_automaton = AhoCorasick(BOILERPLATE_TERMS)
+
+
+class PrefilterConfig(TypedDict):
+    enabled: bool
+    min_length: int
+    score_threshold: float
+
+
+class PrefilterResult(TypedDict):
+    score: float
+    passed: bool
+    reasons: List[str]
+
+
+def load_prefilter_config() -> PrefilterConfig:
+    """从环境变量读取预筛配置"""
+    return PrefilterConfig(
+        enabled=get_env_var("PREFILTER_ENABLED", "false").lower() in ("1", "true", "yes"),
+        min_length=int(get_env_var("PREFILTER_MIN_LENGTH", "200")),
+        score_threshold=float(get_env_var("PREFILTER_SCORE_THRESHOLD", "0.5")),
+    )
+
+
+def score_article(title: str, content: str,
+                  matcher: Optional[KeywordMatcher],
+                  config: PrefilterConfig) -> PrefilterResult:
+    """对一篇文章打分，分数大致落在 [0, 1]，不低于阈值才值得交给LLM；标题命中关键词的文章总是通过"""
+    reasons = []
+    title_matched = bool(matcher and matcher.has_positive_keywords and matcher.positive_hits(title))
+    text_length = len(content.strip())
+
+    # 正文过短，没有可提取的信息
+    if text_length < config["min_length"]:
+        return PrefilterResult(score=0.0, passed=title_matched,
+                               reasons=[f"正文过短({text_length}字)"])
+
+    # 关键词：正文命中 0.5 起，每多命中一个 +0.1；只在标题命中 0.2；没有关键词条件时中性 0.5
+    if matcher and matcher.has_positive_keywords:
+        body_hits = matcher.positive_hits(content)
+        if body_hits:
+            keyword_score = min(1.0, 0.5 + 0.1 * (len(body_hits) - 1))
+        elif title_matched:
+            keyword_score = 0.2
+            reasons.append("关键词仅出现在标题")
+        else:
+            keyword_score = 0.0
+            reasons.append("正文未命中关键词")
+    else:
+        keyword_score = 0.5
+
+    # 长度达标
+    length_score = 0.3
+
+    # 套话：每种扣 0.2，最多扣 0.6
+    boilerplate_hits = _boilerplate_automaton.find(title + content[:BOILERPLATE_SCAN_CHARS])
+    penalty = min(0.6, 0.2 * len(boilerplate_hits))
+    if boilerplate_hits:
+        reasons.append(f"疑似广告/招聘: {', '.join(sorted(boilerplate_hits))}")
+
+    score = round(keyword_score + length_score - penalty, 3)
+    return PrefilterResult(score=score, passed=title_matched or score >= config["score_threshold"], reasons=reasons)
@@ -0,0 +1,214 @@
+"""本地语义相关性排序：字符 n-gram TF-IDF
+
+"数字化转型相关文章"这类主题查询，标题里不一定出现完全相同的词。这里把标题切成
+中文单字+双字 n-gram（英文/数字按词），按公众号持久化词表和文档频率（IDF 统计），
+用 NumPy 稀疏向量计算查询主题与候选标题的余弦相似度，返回最相关的 top-k 篇，
+而不是按发布顺序取前 N 篇关键词命中。
+
+全部计算在本地完成，不需要网络。索引保存在 RELEVANCE_INDEX_DIR（默认 cache/relevance）下，
+每个公众号一个 {fake_id}.npz（词表、文档键、文档频率与文档向量），先写临时文件再原子替换，
+并发任务同时保存时不会留下词表与矩阵不一致的索引。旧版本的 {fake_id}.json + .npz 仍可读取。
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from article_batch import ArticleBatch
+from article_identity import account_file_name, article_id
+from config import get_env_var
+
+
+_SEGMENT_PATTERN = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文按单字+相邻双字切分，英文和数字按整词切分"""
+    tokens = []
+    for segment in _SEGMENT_PATTERN.findall(text.lower()):
+        if not ("\u4e00" <= segment[0] <= "\u9fff"):
+            tokens.append(segment)
+            continue
+        tokens.extend(segment)
+        tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return tokens
+
+
+def _index_dir() -> str:
+    return get_env_var("RELEVANCE_INDEX_DIR", os.path.join("cache", "relevance"))
+
+
+class RelevanceIndex:
+    """单个公众号的 TF-IDF 索引：词表、文档频率以及已入库标题的词频向量（CSR 格式）"""
+
+    def __init__(self, fake_id: str):
+        self.fake_id = fake_id
+        self.vocab: Dict[str, int] = {}
+        self.doc_keys: List[str] = []
+        self._doc_rows: Dict[str, int] = {}
+        self._df = np.zeros(0, dtype=np.int64)
+        # CSR：第 i 篇文档的词为 indices[indptr[i]:indptr[i+1]]，词频为 counts 对应位置
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._counts = np.zeros(0, dtype=np.float32)
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_keys)
+
+    def _paths(self) -> Tuple[str, str]:
+        base = os.path.join(_index_dir(), account_file_name(self.fake_id))
+        return base + ".json", base + ".npz"
+
+    @classmethod
+    def load(cls, fake_id: str) -> "RelevanceIndex":
+        """加载公众号索引，不存在或损坏时返回空索引"""
+        index = cls(fake_id)
+        meta_path, array_path = index._paths()
+        if not os.path.exists(array_path):
+            return index
+        try:
+            with np.load(array_path, allow_pickle=False) as arrays:
+                if "terms" in arrays:
+                    terms, doc_keys = arrays["terms"].tolist(), arrays["doc_keys"].tolist()
+                else:
+                    # 旧版本把词表和文档键单独保存在 .json 中
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                    terms, doc_keys = meta["terms"], meta["doc_keys"]
+                index._df = arrays["df"].astype(np.int64)
+                index._indptr = arrays["indptr"].astype(np.int64)
+                index._indices = arrays["indices"].astype(np.int32)
+                index._counts = arrays["counts"].astype(np.float32)
+            index._check_shapes(len(terms), len(doc_keys))
+            index.vocab = {term: i for i, term in enumerate(terms)}
+            # 旧版本以文章链接为文档键，加载时换算为文章标识
+            index.doc_keys = [article_id(key) if "://" in key else key for key in doc_keys]
+            index._doc_rows = {key: i for i, key in enumerate(index.doc_keys)}
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[RANK] 索引文件损坏，重新构建: {e}")
+            return cls(fake_id)
+        return index
+
+    def _check_shapes(self, n_terms: int, n_docs: int) -> None:
+        """词表、文档键与各数组的长度必须一致，否则视为损坏的索引"""
+        if (len(self._df) != n_terms or len(self._indptr) != n_docs + 1
+                or self._indptr[-1] != len(self._indices) or len(self._indices) != len(self._counts)
+                or (len(self._indices) and int(self._indices.max()) >= n_terms)):
+            raise ValueError("词表与索引矩阵的大小不一致")
+
+    def save(self) -> None:
+        meta_path, array_path = self._paths()
+        os.makedirs(os.path.dirname(array_path), exist_ok=True)
+        terms = [""] * len(self.vocab)
+        for term, i in self.vocab.items():
+            terms[i] = term
+        # 每个写入方使用自己的临时文件，整体替换保证读到的词表与矩阵来自同一次保存
+        tmp_path = f"{array_path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez_compressed(tmp_path, terms=np.asarray(terms, dtype=str),
+                            doc_keys=np.asarray(self.doc_keys, dtype=str), df=self._df,
+                            indptr=self._indptr, indices=self._indices, counts=self._counts)
+        os.replace(tmp_path, array_path)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)  # 旧格式的词表文件已并入 .npz
+
+    def _term_ids(self, tokens: List[str], grow: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """把词序列转换为 (去重后的词编号, 词频)；grow 为假时忽略词表外的词"""
+        ids = []
+        for token in tokens:
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                if not grow:
+                    continue
+                term_id = len(self.vocab)
+                self.vocab[token] = term_id
+            ids.append(term_id)
+        if not ids:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        unique, counts = np.unique(np.asarray(ids, dtype=np.int32), return_counts=True)
+        return unique, counts.astype(np.float32)
+
+    def update(self, articles: ArticleBatch) -> int:
+        """把尚未入库的文章标题加入索引，返回新增文档数"""
+        new_indices, new_counts, new_lengths = [], [], []
+        for title, key in zip(articles.titles, articles.article_ids):
+            if not key or key in self._doc_rows:
+                continue
+            term_ids, counts = self._term_ids(tokenize(title), grow=True)
+            self._doc_rows[key] = len(self.doc_keys)
+            self.doc_keys.append(key)
+            new_indices.append(term_ids)
+            new_counts.append(counts)
+            new_lengths.append(len(term_ids))
+
+        if not new_lengths:
+            return 0
+
+        added_indices = np.concatenate(new_indices) if new_indices else np.zeros(0, dtype=np.int32)
+        if len(self._df) < len(self.vocab):
+            self._df = np.concatenate([self._df, np.zeros(len(self.vocab) - len(self._df), dtype=np.int64)])
+        self._df += np.bincount(added_indices, minlength=len(self.vocab)).astype(np.int64)
+
+        self._indices = np.concatenate([self._indices, added_indices])
+        self._counts = np.concatenate([self._counts] + new_counts)
+        self._indptr = np.concatenate([self._indptr, self._indptr[-1] + np.cumsum(new_lengths)])
+        return len(new_lengths)
+
+    def idf(self) -> np.ndarray:
+        """平滑 IDF：log((1 + N) / (1 + df)) + 1"""
+        return np.log((1.0 + self.n_docs) / (1.0 + self._df)) + 1.0
+
+    def score(self, query: str, keys: List[str]) -> np.ndarray:
+        """计算查询与指定文档（按文档键）的余弦相似度，未入库的文档得分为 0"""
+        scores = np.zeros(len(keys), dtype=np.float64)
+        query_ids, query_counts = self._term_ids(tokenize(query), grow=False)
+        if len(query_ids) == 0 or self.n_docs == 0:
+            return scores
+
+        idf = self.idf()
+        query_weights = np.zeros(len(self.vocab), dtype=np.float64)
+        query_weights[query_ids] = (1.0 + np.log(query_counts)) * idf[query_ids]
+        query_norm = np.linalg.norm(query_weights[query_ids])
+
+        # 所有文档一次性向量化计算：次线性词频 × IDF，再按行累加
+        rows = np.repeat(np.arange(self.n_docs), np.diff(self._indptr))
+        doc_weights = (1.0 + np.log(self._counts)) * idf[self._indices]
+        dots = np.bincount(rows, weights=doc_weights * query_weights[self._indices], minlength=self.n_docs)
+        norms = np.sqrt(np.bincount(rows, weights=doc_weights * doc_weights, minlength=self.n_docs))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cosine = np.where(norms > 0, dots / (norms * query_norm), 0.0)
+
+        for i, key in enumerate(keys):
+            row = self._doc_rows.get(key)
+            if row is not None:
+                scores[i] = cosine[row]
+        return scores
+
+
+def rank_articles(fake_id: str,
+                  account_articles: ArticleBatch,
+                  candidates: ArticleBatch,
+                  topic: str,
+                  top_k: int,
+                  min_score: Optional[float] = None) -> ArticleBatch:
+    """用本次获取的文章更新公众号索引，并按与主题的相关度返回 top-k 候选文章"""
+    if min_score is None:
+        min_score = float(get_env_var("RANK_MIN_SCORE", "0.05"))
+
+    index = RelevanceIndex.load(fake_id)
+    added = index.update(account_articles)
+    if added:
+        try:
+            index.save()
+        except OSError as e:
+            print(f"[RANK] 保存索引失败: {e}")
+
+    scores = index.score(topic, candidates.article_ids)
+    order = np.argsort(-scores, kind="stable")
+    selected = [int(i) for i in order[:top_k] if scores[i] >= min_score]
+    print(f"[RANK] 主题 '{topic}'：索引 {index.n_docs} 篇（新增 {added}），"
+          f"候选 {len(candidates)} 篇，选出 {len(selected)} 篇")
+    return candidates.take(selected)
@@ -0,0 +1,151 @@
+"""短新闻的渐进式输出
+
+原先要等 run_workflow 全部结束、Excel 写完才能看到结果。这里的 ResultSink 在每篇文章
+解析完成后立即收到其短新闻，可以：
+- JsonlStdoutSink：逐条以 JSONL 写到标准输出
+- PartialFileSink：写入 JSONL 部分结果文件，按条数/时间间隔定期 flush
+- CallbackSink：调用回调函数
+- EventStreamSink：放入线程安全队列，供服务端点以事件流（如 SSE）消费
+
+通过 run_workflow(user_input, result_sink=sink) 传入，节点从 LangGraph 的
+config["configurable"]["result_sink"] 中取得。
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from workflow_state import ShortNews
+
+
+class ResultSink:
+    """短新闻输出的基类"""
+
+    def emit(self, news: ShortNews) -> None:
+        raise NotImplementedError
+
+    def emit_many(self, news_list: List[ShortNews]) -> None:
+        for news in news_list:
+            self.emit(news)
+
+    def close(self) -> None:
+        pass
+
+
+def _to_json(news: ShortNews) -> str:
+    return json.dumps(dict(news), ensure_ascii=False)
+
+
+class JsonlStdoutSink(ResultSink):
+    """逐条以 JSONL 写到标准输出（创建时的 sys.stdout）"""
+
+    def __init__(self, stream=None):
+        self._stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, news: ShortNews) -> None:
+        with self._lock:
+            self._stream.write(_to_json(news) + "\n")
+            self._stream.flush()
+
+
+class PartialFileSink(ResultSink):
+    """写入 JSONL 部分结果文件，每 flush_every 条或每 flush_interval 秒 flush 一次"""
+
+    def __init__(self, path: Optional[str] = None, flush_every: int = 1, flush_interval: float = 2.0):
+        if path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = os.path.join("output", f"partial_{timestamp}.jsonl")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def emit(self, news: ShortNews) -> None:
+        with self._lock:
+            self._file.write(_to_json(news) + "\n")
+            self._pending += 1
+            now = time.monotonic()
+            if self._pending >= self.flush_every or now - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._pending = 0
+                self._last_flush = now
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class CallbackSink(ResultSink):
+    """每条短新闻调用一次回调函数"""
+
+    def __init__(self, callback: Callable[[ShortNews], Any]):
+        self._callback = callback
+
+    def emit(self, news: ShortNews) -> None:
+        self._callback(news)
+
+
+class EventStreamSink(ResultSink):
+    """把短新闻放入线程安全队列；服务端点在另一线程中迭代 events() 推送给客户端"""
+
+    _DONE = object()
+
+    def __init__(self, maxsize: int = 0):
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+
+    def emit(self, news: ShortNews) -> None:
+        self._queue.put({"event": "short_news", "data": dict(news)})
+
+    def close(self) -> None:
+        self._queue.put(self._DONE)
+
+    def events(self, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """逐个产出事件，sink 关闭后结束"""
+        while True:
+            item = self._queue.get(timeout=timeout)
+            if item is self._DONE:
+                return
+            yield item
+
+
+class MultiSink(ResultSink):
+    """同时输出到多个 sink"""
+
+    def __init__(self, sinks: List[ResultSink]):
+        self.sinks = sinks
+
+    def emit(self, news: ShortNews) -> None:
+        for sink in self.sinks:
+            sink.emit(news)
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+def get_result_sink(config: Optional[Dict[str, Any]]) -> Optional[ResultSink]:
+    """从 LangGraph 节点收到的 config 中取出 result_sink"""
+    if not config:
+        return None
+    return (config.get("configurable") or {}).get("result_sink")
+
+
+def create_sink(mode: str, path: Optional[str] = None) -> ResultSink:
+    """按命令行参数创建 sink：jsonl 输出到标准输出，file 写入部分结果文件"""
+    if mode == "jsonl":
+        return JsonlStdoutSink()
+    if mode == "file":
+        return PartialFileSink(path)
+    raise ValueError(f"未知的输出模式: {mode}")
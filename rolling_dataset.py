@@ -0,0 +1,131 @@
+"""按公众号滚动累积的短新闻数据集
+
+每次运行 export_to_excel_node 都生成一个新的 wechat_articles_{关键词}_{时间戳}.xlsx，
+下游需要汇总上百个文件再按链接去重。合并导出模式（EXPORT_MODE=merge）改为每个公众号维护一个
+滚动工作簿 output/datasets/{fake_id}-{哈希}.xlsx（按公众号的 fake_id 而不是搜索关键词区分，
+同一公众号用不同关键词查询时追加到同一个数据集）：
+- 每次只追加 (规范化链接, 标题) 键未出现过的行
+- 键的查重通过持久化的 SQLite 索引 output/datasets/index.sqlite 完成，不需要重新读取工作簿
+下游读取某个公众号的全部历史只需扫描一个文件。
+
+配置（.env）：
+    EXPORT_MODE=file                  # file：每次生成新文件；merge：追加到滚动数据集
+    EXPORT_DATASET_DIR=output/datasets
+"""
+import contextlib
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from config import get_env_var
+from article_identity import account_file_name, article_id, normalize_link
+from workflow_state import ShortNews
+
+
+FILE = "file"
+MERGE = "merge"
+
+INDEX_FILE = "index.sqlite"
+SHEET_NAME = "短新闻列表"
+COLUMNS = ["序号", "短新闻标题", "完整内容", "原始文章链接", "创建时间"]
+COLUMN_WIDTHS = {"A": 10, "B": 40, "C": 80, "D": 50, "E": 20}
+
+
+def export_mode() -> str:
+    mode = (get_env_var("EXPORT_MODE", FILE) or FILE).lower()
+    return mode if mode in (FILE, MERGE) else FILE
+
+
+def news_key(news: ShortNews) -> str:
+    """去重键：原文的文章标识 + 短新闻标题"""
+    text = article_id(news["original_link"]) + "\x1f" + news["title"].strip()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def legacy_news_key(news: ShortNews) -> str:
+    """旧版本的去重键（规范化链接 + 标题），用于识别升级前已导出的行"""
+    text = normalize_link(news["original_link"]) + "\x1f" + news["title"].strip()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RollingDataset:
+    """单个公众号（按 fake_id）的滚动工作簿及其键索引"""
+
+    def __init__(self, account: str, directory: str = None):
+        self.directory = directory or get_env_var("EXPORT_DATASET_DIR", os.path.join("output", "datasets"))
+        os.makedirs(self.directory, exist_ok=True)
+        self.account = account
+        self.path = os.path.join(self.directory, f"{account_file_name(account)}.xlsx")
+        # 旧版本的文件名不含哈希，升级后第一次追加时沿用原工作簿
+        legacy_path = os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_-]", "_", account) + ".xlsx")
+        if not os.path.exists(self.path) and os.path.exists(legacy_path):
+            os.replace(legacy_path, self.path)
+        self._index_path = os.path.join(self.directory, INDEX_FILE)
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS news_keys (
+                    account TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    row_number INTEGER NOT NULL,
+                    added_at REAL NOT NULL,
+                    PRIMARY KEY (account, key)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._index_path, timeout=30, isolation_level=None)
+
+    def append(self, short_news_list: List[ShortNews]) -> Dict[str, int]:
+        """追加键未出现过的短新闻，返回 {"added": 新增行数, "duplicates": 重复行数}"""
+        from openpyxl import Workbook, load_workbook  # 仅在合并导出时导入
+
+        conn = self._connect()
+        try:
+            # 索引与工作簿一起更新：工作簿保存失败时回滚索引
+            conn.execute("BEGIN IMMEDIATE")
+            (row_count,) = conn.execute("SELECT COUNT(*) FROM news_keys WHERE account = ?",
+                                        (self.account,)).fetchone()
+            now = time.time()
+            created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            new_rows = []
+            for news in short_news_list:
+                if conn.execute("SELECT 1 FROM news_keys WHERE account = ? AND key = ?",
+                                (self.account, legacy_news_key(news))).fetchone():
+                    continue
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO news_keys (account, key, row_number, added_at) VALUES (?, ?, ?, ?)",
+                    (self.account, news_key(news), row_count + len(new_rows) + 1, now),
+                )
+                if cursor.rowcount == 1:
+                    new_rows.append([row_count + len(new_rows) + 1, news["title"], news["content"],
+                                     news["original_link"], created_at])
+
+            if new_rows:
+                if os.path.exists(self.path):
+                    workbook = load_workbook(self.path)
+                    worksheet = workbook[SHEET_NAME]
+                else:
+                    workbook = Workbook()
+                    worksheet = workbook.active
+                    worksheet.title = SHEET_NAME
+                    worksheet.append(COLUMNS)
+                    for column, width in COLUMN_WIDTHS.items():
+                        worksheet.column_dimensions[column].width = width
+                for row in new_rows:
+                    worksheet.append(row)
+                tmp_path = self.path + ".tmp.xlsx"
+                workbook.save(tmp_path)
+                os.replace(tmp_path, self.path)
+
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return {"added": len(new_rows), "duplicates": len(short_news_list) - len(new_rows)}
@@ -0,0 +1,272 @@
+"""相同请求的合并（single-flight）
+
+同一进程中并发运行多个任务（arun_workflow 并发、多个线程调用 run_workflow）时，针对同一公众号、
+同一批文章的任务会各自发出完全相同的请求，上游压力随任务数增长而不是随实际工作量增长。
+这里对“正在进行中”的相同请求只执行一次，其余调用方等待并共享同一个结果：
+- get_account_info / get_articles：按参数合并
+- fetch_article_content：按文章标识合并，同一篇文章的不同链接也只下载一次
+- LLM 调用：按提示词内容和绑定参数合并；流式调用时首个调用方边收边输出，
+  其余调用方在完成后一次性得到全部分块；首个调用方中途放弃时，其余调用方各自重新调用
+只合并进行中的请求，完成后不缓存结果（跨任务的持久缓存由页面归档等负责）。共享的结果对调用方只读。
+首个调用方出错时，等待中的调用方得到同一个异常。
+
+计数按请求类型统计：calls（调用次数）、executions（实际执行次数）、merged（合并到进行中请求的次数），
+通过 single_flight_stats() 获取，每次解析结束时写入 run_stats["single_flight"]。
+
+配置（.env）：
+    SINGLE_FLIGHT_ENABLED=true
+"""
+import functools
+import hashlib
+import json
+import threading
+from collections import defaultdict
+from concurrent.futures import CancelledError as FutureCancelled, Future
+from typing import Any, Callable, Dict, Tuple
+
+from config import get_env_var
+
+
+def enabled() -> bool:
+    return (get_env_var("SINGLE_FLIGHT_ENABLED", "true") or "").lower() == "true"
+
+
+class SingleFlight:
+    """进行中请求的登记表
+
+    每个进行中的请求对应一个 concurrent.futures.Future：同步调用方阻塞等待，异步调用方通过
+    asyncio.wrap_future 等待，因此不同线程、不同事件循环中的相同请求也会合并。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str], Future] = {}
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "executions": 0, "merged": 0})
+
+    def _join(self, kind: str, key: str) -> Tuple[Future, bool]:
+        """返回 (进行中请求的 Future, 是否由本调用方执行)"""
+        with self._lock:
+            counters = self.counters[kind]
+            counters["calls"] += 1
+            future = self._calls.get((kind, key))
+            if future is not None:
+                counters["merged"] += 1
+                return future, False
+            future = self._calls[(kind, key)] = Future()
+            counters["executions"] += 1
+            return future, True
+
+    def _leave(self, kind: str, key: str) -> None:
+        with self._lock:
+            del self._calls[(kind, key)]
+
+    # ---- 同步 ----
+
+    def do(self, kind: str, key: str, fn: Callable[[], Any]) -> Any:
+        """执行 fn()；已有相同的请求在进行中时等待并返回它的结果"""
+        while True:
+            future, leader = self._join(kind, key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except FutureCancelled:
+                continue  # 首个调用方放弃（异步任务被取消），重新发起
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._leave(kind, key)
+
+    def stream(self, kind: str, key: str, fn: Callable[[], Any]):
+        """流式版本：首个调用方边收边输出，其余调用方在完成后得到全部分块"""
+        future, leader = self._join(kind, key)
+        if not leader:
+            try:
+                chunks = future.result()
+            except FutureCancelled:
+                chunks = None
+            if chunks is None:
+                # 首个调用方中途放弃，自己重新调用
+                yield from fn()
+                return
+            yield from chunks
+            return
+
+        chunks = []
+        try:
+            for chunk in fn():
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(chunks)
+        finally:
+            self._leave(kind, key)
+
+    # ---- 异步 ----
+
+    async def ado(self, kind: str, key: str, fn: Callable[[], Any]) -> Any:
+        """do 的异步版本，fn() 返回协程；等待方被取消时不影响进行中的请求"""
+        import asyncio  # 仅异步路径使用，不拖慢命令行启动
+
+        while True:
+            future, leader = self._join(kind, key)
+            if leader:
+                break
+            try:
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                # 首个调用方被取消时由等待方重新发起，自身被取消时照常传播
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._leave(kind, key)
+
+    async def astream(self, kind: str, key: str, fn: Callable[[], Any]):
+        """stream 的异步版本，fn() 返回异步迭代器"""
+        import asyncio
+
+        future, leader = self._join(kind, key)
+        if not leader:
+            try:
+                chunks = await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                chunks = None
+            if chunks is None:
+                async for chunk in fn():
+                    yield chunk
+                return
+            for chunk in chunks:
+                yield chunk
+            return
+
+        chunks = []
+        try:
+            async for chunk in fn():
+                chunks.append(chunk)
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(chunks)
+        finally:
+            self._leave(kind, key)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {kind: dict(counters) for kind, counters in self.counters.items()}
+
+
+_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _flight
+
+
+def single_flight_stats() -> Dict[str, Dict[str, int]]:
+    """各类请求的调用、实际执行与合并次数（进程内累计）"""
+    return _flight.stats()
+
+
+def call_key(args: tuple, kwargs: dict) -> str:
+    return json.dumps([list(args), kwargs], ensure_ascii=False, sort_keys=True, default=str)
+
+
+def coalesced(kind: str, key_fn: Callable[..., str] = None) -> Callable:
+    """装饰同步外部调用：相同参数（或 key_fn 给出的相同键）的进行中调用只执行一次"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            key = key_fn(*args, **kwargs) if key_fn else call_key(args, kwargs)
+            return _flight.do(kind, key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def acoalesced(kind: str, key_fn: Callable[..., str] = None) -> Callable:
+    """coalesced 的异步版本；与同步调用共用登记表，同种请求可以互相合并"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not enabled():
+                return await fn(*args, **kwargs)
+            key = key_fn(*args, **kwargs) if key_fn else call_key(args, kwargs)
+            return await _flight.ado(kind, key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def _messages_key(messages, kwargs: dict, bound: str) -> str:
+    digest = hashlib.sha1()
+    for message in messages:
+        digest.update(type(message).__name__.encode("utf-8"))
+        digest.update(str(getattr(message, "content", message)).encode("utf-8"))
+    digest.update(bound.encode("utf-8"))
+    digest.update(call_key((), kwargs).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CoalescingLLM:
+    """包装 LLM：相同提示词和参数的进行中调用只发出一次"""
+
+    def __init__(self, llm, bound: str = ""):
+        self._llm = llm
+        self._bound = bound  # 已绑定参数（如 response_format）的序列化，参与合并键
+
+    def bind(self, **kwargs) -> "CoalescingLLM":
+        return CoalescingLLM(self._llm.bind(**kwargs), self._bound + call_key((), kwargs))
+
+    def invoke(self, messages, **kwargs):
+        key = _messages_key(messages, kwargs, self._bound)
+        return _flight.do("llm", key, lambda: self._llm.invoke(messages, **kwargs))
+
+    def stream(self, messages, **kwargs):
+        key = _messages_key(messages, kwargs, self._bound)
+        return _flight.stream("llm", key, lambda: self._llm.stream(messages, **kwargs))
+
+    async def ainvoke(self, messages, **kwargs):
+        key = _messages_key(messages, kwargs, self._bound)
+        return await _flight.ado("llm", key, lambda: self._llm.ainvoke(messages, **kwargs))
+
+    def astream(self, messages, **kwargs):
+        key = _messages_key(messages, kwargs, self._bound)
+        return _flight.astream("llm", key, lambda: self._llm.astream(messages, **kwargs))
+
+
+def coalesce_llm(llm):
+    """启用合并时返回包装后的LLM，否则原样返回"""
+    if llm is None or not enabled():
+        return llm
+    return CoalescingLLM(llm)
@@ -0,0 +1,269 @@
+"""基准测试用的本地替身服务：wxdown API、文章页面与 OpenAI 兼容的 LLM 接口
+
+benchmark.py scale 在子进程中启动它，工作流不访问真实服务也能完整运行，并可以注入延迟和错误：
+- GET  /api/v1/account?keyword=...            按关键词返回一个公众号（fakeid 由关键词确定）
+- GET  /api/v1/article?fakeid=&begin=&size=   每个公众号 account_articles 篇文章，按发布时间从新到旧，
+                                              偶数篇标题含 AI
+- GET  /s?__biz=&mid=&idx=1&sn=               文章页面（头部 page_kb 大小的填充脚本 + js_content 正文，内容由链接参数确定）
+- POST /v1/chat/completions                   按提示词类型返回关键词、筛选条件或短新闻 JSON，支持 stream
+- GET  /__stats                               各类请求（api/page/llm）的请求数与注入的错误数
+- POST /__reset                               清空请求出现次数与计数，之后的请求与刚启动时得到相同的延迟和错误
+
+延迟和错误只由种子、请求内容和该请求第几次出现决定，与线程调度无关，相同参数的多次运行可以直接比较
+（同一个替身服务上先后运行时，每次运行前调用 /__reset）：
+每个请求的延迟在设定值的 0.5～1.5 倍之间，按 error_rate 的概率返回 HTTP 500；
+同一请求的重试重新判定，不会一直失败。
+
+用法：
+    python standin_server.py --port 8900 --api-latency-ms 50 --page-latency-ms 80 --llm-latency-ms 300 --error-rate 0.02
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+KINDS = ("api", "page", "llm")
+
+# 流式响应每个分块的字符数
+STREAM_CHUNK_CHARS = 8
+
+
+class StandinService:
+    """替身服务的数据生成、延迟/错误注入与计数（与 HTTP 处理分开，便于在进程内直接使用）"""
+
+    def __init__(self, latency_ms: Dict[str, float], error_rate: float = 0.0, seed: int = 0,
+                 account_articles: int = 40, page_kb: int = 64):
+        self.latency = {kind: latency_ms.get(kind, 0) / 1000 for kind in KINDS}
+        self.error_rate = error_rate
+        self.seed = seed
+        self.account_articles = account_articles
+        self.page_kb = page_kb
+        # 发布时间以整天对齐，同一天内多次运行生成相同的文章列表
+        self.anchor = int(time.time()) // 86400 * 86400
+        self.counters = {kind: {"requests": 0, "errors": 0} for kind in KINDS}
+        self._seen: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _draws(self, kind: str, key: str) -> Tuple[float, float]:
+        """请求的两个确定性随机数 [0, 1)：由种子、请求内容和该请求第几次出现决定"""
+        with self._lock:
+            self._seen[(kind, key)] += 1
+            occurrence = self._seen[(kind, key)]
+        digest = hashlib.sha1(f"{self.seed}|{kind}|{key}|{occurrence}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64, int.from_bytes(digest[8:16], "big") / 2 ** 64
+
+    def admit(self, kind: str, key: str) -> bool:
+        """等待注入的延迟，返回请求是否成功（False 表示注入错误）"""
+        jitter, error_draw = self._draws(kind, key)
+        time.sleep(self.latency[kind] * (0.5 + jitter))
+        failed = error_draw < self.error_rate
+        with self._lock:
+            self.counters[kind]["requests"] += 1
+            if failed:
+                self.counters[kind]["errors"] += 1
+        return not failed
+
+    def reset(self) -> None:
+        """清空请求出现次数与计数，回到刚启动时的状态"""
+        with self._lock:
+            self._seen.clear()
+            self.counters = {kind: {"requests": 0, "errors": 0} for kind in KINDS}
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {kind: dict(counters) for kind, counters in self.counters.items()}
+
+    # ---- wxdown API ----
+
+    @staticmethod
+    def fake_id(keyword: str) -> str:
+        return "BENCH" + hashlib.sha1(keyword.encode("utf-8")).hexdigest()[:10] + "=="
+
+    def account(self, keyword: str) -> dict:
+        return {"base_resp": {"ret": 0, "err_msg": "ok"}, "total": 1,
+                "list": [{"fakeid": self.fake_id(keyword), "nickname": keyword}]}
+
+    def articles(self, base_url: str, fake_id: str, begin: int, size: int) -> dict:
+        articles = []
+        for i in range(begin, min(begin + size, self.account_articles)):
+            topic = "AI" if i % 2 == 0 else "行业"
+            articles.append({
+                "title": f"{topic}观察 第{i}期 {fake_id[5:11]}",
+                "update_time": self.anchor - i * 86400,
+                "link": f"{base_url}/s?__biz={fake_id}&mid={100000 + i}&idx=1&sn={fake_id[5:11]}{i}",
+            })
+        return {"base_resp": {"ret": 0, "err_msg": "ok"}, "articles": articles}
+
+    # ---- 文章页面 ----
+
+    def page(self, biz: str, mid: str) -> str:
+        paragraphs = "".join(f"<p>{biz[5:11]}-{mid} 第{j}段：人工智能与AI大模型在行业中的应用进展，"
+                             f"相关机构发布了新的数据和案例。</p>" for j in range(30))
+        boilerplate = "<p>点击上方蓝字关注我们</p><p>免责声明：本文仅供参考</p>"
+        filler = "var __filler = '" + "x" * (self.page_kb * 1024) + "';"
+        return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><script>{filler}</script></head>"
+                f"<body><div id='js_content'>{boilerplate}{paragraphs}{boilerplate}</div>"
+                f"<script>var msg_link = \"\";</script></body></html>")
+
+    # ---- LLM ----
+
+    @staticmethod
+    def completion_text(prompt: str) -> str:
+        """按提示词类型生成 LLM 的回答"""
+        user_input = re.search(r'用户输入："(.*?)"', prompt)
+        user_input = user_input.group(1) if user_input else ""
+        if "公众号名称或关键词" in prompt:
+            match = re.search(r"查询(.+?)的文章", user_input)
+            return json.dumps({"account_keyword": match.group(1) if match else user_input,
+                               "confidence": "high", "reasoning": "替身服务"}, ensure_ascii=False)
+        if "文章筛选条件" in prompt:
+            count = re.search(r"(\d+)篇", user_input)
+            keyword = re.search(r"标题包含(\w+)", user_input)
+            return json.dumps({"title_keywords": [keyword.group(1)] if keyword else None,
+                               "required_keywords": None, "excluded_keywords": None, "match_body": False,
+                               "topic": None, "max_articles": int(count.group(1)) if count else None,
+                               "start_date": None, "end_date": None, "time_description": "最近的",
+                               "reasoning": "替身服务"}, ensure_ascii=False)
+        title = re.search(r"文章标题: (.*)", prompt)
+        title = title.group(1).strip() if title else "文章"
+        return json.dumps({"short_news": [
+            {"title": f"{title}（一）", "content": f"{title} 的第一条要点：相关机构发布了新的AI应用案例。"},
+            {"title": f"{title}（二）", "content": f"{title} 的第二条要点：行业数据显示应用规模持续增长。"},
+        ]}, ensure_ascii=False)
+
+
+def _completion_body(model: str, text: str, stream: bool) -> Tuple[bytes, str]:
+    """OpenAI chat.completions 响应体：非流式为 JSON，流式为完整的 SSE 事件序列"""
+    if not stream:
+        body = {"id": "chatcmpl-standin", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text), "total_tokens": len(text)}}
+        return json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json"
+
+    def event(delta: dict, finish_reason=None) -> str:
+        chunk = {"id": "chatcmpl-standin", "object": "chat.completion.chunk", "created": int(time.time()),
+                 "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return "data: " + json.dumps(chunk, ensure_ascii=False) + "\n\n"
+
+    events = [event({"role": "assistant", "content": ""})]
+    events += [event({"content": text[i:i + STREAM_CHUNK_CHARS]}) for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+    events += [event({}, "stop"), "data: [DONE]\n\n"]
+    return "".join(events).encode("utf-8"), "text/event-stream"
+
+
+def make_handler(service: StandinService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 保持连接，与真实服务一样复用连接池
+
+        def _send(self, status: int, body: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # 客户端已放弃请求（超时、对冲请求被取消等）
+
+        def _send_json(self, data, status: int = 200) -> None:
+            self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json")
+
+        def _injected_error(self) -> None:
+            self._send_json({"error": {"message": "injected error", "type": "server_error"}}, 500)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+            if parts.path == "/__stats":
+                self._send_json(service.stats())
+                return
+            if parts.path.endswith("/account"):
+                if not service.admit("api", self.path):
+                    self._injected_error()
+                    return
+                self._send_json(service.account(params.get("keyword", "")))
+                return
+            if parts.path.endswith("/article"):
+                if not service.admit("api", self.path):
+                    self._injected_error()
+                    return
+                base_url = f"http://{self.headers.get('Host', '127.0.0.1')}"
+                self._send_json(service.articles(base_url, params.get("fakeid", ""),
+                                                 int(params.get("begin", 0)), int(params.get("size", 5))))
+                return
+            if parts.path == "/s":
+                if not service.admit("page", self.path):
+                    self._injected_error()
+                    return
+                html = service.page(params.get("__biz", ""), params.get("mid", ""))
+                self._send(200, html.encode("utf-8"), "text/html; charset=utf-8")
+                return
+            self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/__reset":
+                service.reset()
+                self._send_json({"ok": True})
+                return
+            if not urlsplit(self.path).path.endswith("/chat/completions"):
+                self._send_json({"error": "not found"}, 404)
+                return
+            messages = request.get("messages") or [{}]
+            prompt = str(messages[-1].get("content", ""))
+            if not service.admit("llm", prompt):
+                self._injected_error()
+                return
+            body, content_type = _completion_body(request.get("model", "standin"),
+                                                  service.completion_text(prompt), bool(request.get("stream")))
+            self._send(200, body, content_type)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(service: StandinService, host: str = "127.0.0.1", port: int = 0) -> None:
+    """启动替身服务（阻塞）；port=0 时自动选择端口，实际地址打印在第一行"""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    print(f"[STANDIN] http://{host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="基准测试用的本地替身服务（wxdown API、文章页面、LLM）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 表示自动选择端口")
+    parser.add_argument("--api-latency-ms", type=float, default=50)
+    parser.add_argument("--page-latency-ms", type=float, default=100)
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="每个请求返回 HTTP 500 的概率")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--account-articles", type=int, default=40, help="每个公众号的文章数")
+    parser.add_argument("--page-kb", type=int, default=64, help="文章页面大小（KB）")
+    args = parser.parse_args(argv)
+
+    service = StandinService({"api": args.api_latency_ms, "page": args.page_latency_ms, "llm": args.llm_latency_ms},
+                             args.error_rate, args.seed, args.account_articles, args.page_kb)
+    serve(service, args.host, args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,437 @@
+"""公众号订阅的定时抓取调度器
+
+原先由 cron 按固定频率对每个订阅的公众号跑一次完整的 run_workflow，每次都重新获取全部文章，
+API调用次数 = 公众号数 × 轮询频率。这里改为一个常驻的调度器：
+- 用优先队列（heapq）按下次轮询时间管理全部订阅的 fakeid
+- 每个公众号的轮询间隔根据其历史发文时间（publish_time）的间隔自适应，没有新文章时逐步退避
+- 全局令牌桶限制 wxdown API 的调用速率
+- 增量获取：只翻到上次见过的最新文章为止，只对新文章执行筛选、LLM解析和导出
+这样 API 调用次数随新内容的多少增长，而不是随公众号数和轮询频率增长。
+
+订阅列表（JSON，默认 subscriptions.json）：
+    [
+        {"keyword": "银行科技研究社", "title_keywords": ["一周观察"]},
+        {"keyword": "科技日报", "fake_id": "MzA...==", "excluded_keywords": ["广告"]}
+    ]
+
+用法：
+    python subscription_scheduler.py              # 常驻运行
+    python subscription_scheduler.py --once       # 轮询一遍到期的公众号后退出（可配合cron）
+
+配置（.env）：
+    SUBSCRIPTIONS_FILE=subscriptions.json
+    SUBSCRIPTION_STATE_FILE=cache/subscriptions_state.json
+    WXDOWN_QUOTA_PER_MINUTE=30     # 全局API调用速率
+    WXDOWN_QUOTA_BURST=10          # 允许的突发调用次数
+    POLL_MIN_INTERVAL=900          # 轮询间隔下限（秒）
+    POLL_MAX_INTERVAL=172800       # 轮询间隔上限（秒）
+    POLL_MAX_FAILURES=5            # 新文章连续处理失败的次数上限，达到后记为已见并跳过
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional, Tuple, TypedDict
+
+from config import get_env_var
+from workflow_state import FilterConditions, WorkflowState
+from article_batch import ArticleBatch, NO_TIME, to_epoch
+from article_identity import article_id
+from api_request import get_account_info, get_articles
+
+
+# 每个公众号保留的发文时间历史条数，用于估计发文间隔
+HISTORY_SIZE = 30
+# 发文历史不足时假定的发文间隔
+DEFAULT_POST_INTERVAL = 24 * 3600
+# 轮询间隔取发文间隔的这个比例，尽量在新文章发布后不久就发现
+POLL_FRACTION = 0.5
+# 连续没有新文章或连续失败时，每次把轮询间隔乘以该系数
+IDLE_BACKOFF = 1.5
+
+
+class Subscription(TypedDict, total=False):
+    keyword: str
+    fake_id: Optional[str]
+    nickname: str
+    title_keywords: Optional[List[str]]
+    required_keywords: Optional[List[str]]
+    excluded_keywords: Optional[List[str]]
+    match_body: bool
+
+
+class AccountState(TypedDict):
+    nickname: str
+    last_seen_ts: int               # 已处理的最新文章发布时间
+    last_seen_ids: List[str]        # 发布时间等于 last_seen_ts 的文章标识（同一次推送的多篇文章时间相同）
+    history: List[int]              # 最近的发文时间，新的在前
+    last_poll: float
+    next_poll: float
+    idle_polls: int                 # 连续没有新文章的轮询次数
+    failed_polls: int               # 连续失败的轮询次数
+
+
+class ApiQuota:
+    """全局令牌桶：限制所有公众号合计的 wxdown API 调用速率"""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.calls = 0
+        self.waited_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ApiQuota":
+        return cls(
+            per_minute=float(get_env_var("WXDOWN_QUOTA_PER_MINUTE", "30")),
+            burst=int(get_env_var("WXDOWN_QUOTA_BURST", "10")),
+        )
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> None:
+        """取得一次API调用的配额，不足时等待"""
+        self._refill()
+        if self.tokens < 1:
+            wait = (1 - self.tokens) / self.rate
+            print(f"[QUOTA] API配额不足，等待 {wait:.1f}s")
+            time.sleep(wait)
+            self.waited_seconds += wait
+            self._refill()
+        self.tokens -= 1
+        self.calls += 1
+
+
+def posting_interval(history: List[int]) -> float:
+    """根据发文时间历史估计发文间隔（相邻两次发文间隔的中位数）"""
+    times = sorted(set(ts for ts in history if ts != NO_TIME), reverse=True)
+    gaps = [newer - older for newer, older in zip(times, times[1:]) if newer > older]
+    if not gaps:
+        return DEFAULT_POST_INTERVAL
+    return float(statistics.median(gaps))
+
+
+class SubscriptionScheduler:
+    """按各公众号的发文频率调度增量抓取"""
+
+    def __init__(self, subscriptions: List[Subscription], quota: Optional[ApiQuota] = None,
+                 state_path: Optional[str] = None, result_sink=None):
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.quota = quota or ApiQuota.from_env()
+        self.state_path = state_path or get_env_var("SUBSCRIPTION_STATE_FILE", "cache/subscriptions_state.json")
+        self.result_sink = result_sink
+        self.min_interval = float(get_env_var("POLL_MIN_INTERVAL", "900"))
+        self.max_interval = float(get_env_var("POLL_MAX_INTERVAL", str(2 * 24 * 3600)))
+        self.max_failures = int(get_env_var("POLL_MAX_FAILURES", "5"))
+        self.page_min_size = int(get_env_var("ARTICLE_PAGE_MIN_SIZE", "5"))
+        self.page_max_size = int(get_env_var("ARTICLE_PAGE_MAX_SIZE", "20"))
+        self.states: Dict[str, AccountState] = self._load_state()
+        self.stats = {"polls": 0, "new_articles": 0, "processed_articles": 0, "exports": 0,
+                      "abandoned_articles": 0}
+
+        self._queue: List[tuple] = []
+        for subscription in subscriptions:
+            fake_id = self._resolve_fake_id(subscription)
+            if not fake_id:
+                continue
+            self.subscriptions[fake_id] = subscription
+            state = self.states.get(fake_id)
+            next_poll = state["next_poll"] if state else time.time()
+            heapq.heappush(self._queue, (next_poll, fake_id))
+
+    # ---- 状态持久化 ----
+
+    def _load_state(self) -> Dict[str, AccountState]:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            states = json.load(f)
+        # 旧版本按链接记录已处理文章，换算为文章标识
+        for state in states.values():
+            if "last_seen_links" in state:
+                state["last_seen_ids"] = [article_id(link) for link in state.pop("last_seen_links")]
+            state.setdefault("failed_polls", 0)
+        return states
+
+    def save_state(self) -> None:
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.states, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _resolve_fake_id(self, subscription: Subscription) -> Optional[str]:
+        """订阅未提供 fakeid 时按关键词查询一次，结果写入状态文件供下次启动复用"""
+        if subscription.get("fake_id"):
+            return subscription["fake_id"]
+        keyword = subscription.get("keyword", "")
+        for fake_id, state in self.states.items():
+            if state.get("nickname") == keyword:
+                return fake_id
+
+        self.quota.acquire()
+        account_info = get_account_info(keyword)
+        if not account_info or account_info.get("base_resp", {}).get("ret") != 0 or not account_info.get("list"):
+            print(f"[SCHEDULER] 未找到公众号，忽略订阅: {keyword}")
+            return None
+        fake_id = account_info["list"][0].get("fakeid")
+        print(f"[SCHEDULER] 订阅 {keyword} -> fakeid {fake_id}")
+        self.states.setdefault(fake_id, self._new_state(keyword))
+        return fake_id
+
+    @staticmethod
+    def _new_state(nickname: str) -> AccountState:
+        return AccountState(nickname=nickname, last_seen_ts=NO_TIME, last_seen_ids=[],
+                            history=[], last_poll=0.0, next_poll=time.time(), idle_polls=0, failed_polls=0)
+
+    # ---- 调度 ----
+
+    def next_poll_delay(self, state: AccountState) -> float:
+        """下次轮询前的等待时间：发文间隔的一部分，连续无新文章时退避"""
+        interval = posting_interval(state["history"]) * POLL_FRACTION
+        interval *= IDLE_BACKOFF ** min(state["idle_polls"], 10)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def retry_delay(self, state: AccountState) -> float:
+        """失败后重试前的等待时间：从轮询间隔下限开始，连续失败时退避"""
+        interval = self.min_interval * IDLE_BACKOFF ** min(state["failed_polls"] - 1, 10)
+        return min(self.max_interval, interval)
+
+    def run(self, once: bool = False, max_polls: Optional[int] = None) -> Dict[str, int]:
+        """按优先队列依次轮询到期的公众号
+
+        once=True 时只轮询当前已到期的公众号，然后返回。
+        """
+        polls = 0
+        try:
+            while self._queue:
+                next_poll, fake_id = self._queue[0]
+                now = time.time()
+                if next_poll > now:
+                    if once:
+                        break
+                    time.sleep(next_poll - now)
+                heapq.heappop(self._queue)
+
+                state = self.poll_account(fake_id)
+                self.save_state()
+                heapq.heappush(self._queue, (state["next_poll"], fake_id))
+
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    break
+        except KeyboardInterrupt:
+            print("\n[SCHEDULER] 已停止")
+        finally:
+            self.save_state()
+
+        print(f"[SCHEDULER] 轮询 {self.stats['polls']} 次，API调用 {self.quota.calls} 次，"
+              f"新文章 {self.stats['new_articles']} 篇，解析 {self.stats['processed_articles']} 篇，"
+              f"导出 {self.stats['exports']} 次，跳过 {self.stats['abandoned_articles']} 篇")
+        return dict(self.stats, api_calls=self.quota.calls)
+
+    # ---- 增量获取与处理 ----
+
+    def _page_size(self, state: AccountState, now: float) -> int:
+        """按距离上次轮询的时间和发文间隔估计新文章数，据此选择第一页大小"""
+        if state["last_seen_ts"] == NO_TIME:
+            return self.page_max_size
+        elapsed = now - max(state["last_poll"], state["last_seen_ts"])
+        expected = elapsed / posting_interval(state["history"])
+        # 同一次推送可能包含多篇文章，估计值向上留余量
+        size = math.ceil(expected * 1.5) + 1
+        return min(self.page_max_size, max(self.page_min_size, size))
+
+    def fetch_new_articles(self, fake_id: str, state: AccountState) -> Tuple[ArticleBatch, bool]:
+        """从最新的文章开始翻页，遇到已处理过的文章即停止
+
+        返回 (新文章, 是否完整)。中途某一页获取失败时缺少的是更早的文章，不完整的结果不能推进进度。
+        """
+        new_articles = ArticleBatch()
+        seen_ids = set(state["last_seen_ids"])
+        fetched_ids = set()  # 翻页期间有新文章发布时，相邻两页会有重叠
+        begin = 0
+        size = self._page_size(state, time.time())
+
+        while True:
+            self.quota.acquire()
+            response = get_articles(fake_id, begin, size)
+            if not response or response.get("base_resp", {}).get("ret") != 0:
+                print(f"[SCHEDULER] 获取文章列表失败: {state['nickname']}")
+                return new_articles, False
+            articles_data = response.get("articles", [])
+
+            reached_seen = False
+            for article in articles_data:
+                publish_ts = to_epoch(article.get("update_time", article.get("create_time", "")))
+                link = article.get("link", "")
+                canonical_id = article_id(link, fake_id, str(article.get("aid", "")))
+                if state["last_seen_ts"] != NO_TIME and publish_ts != NO_TIME:
+                    if publish_ts < state["last_seen_ts"] or (
+                            publish_ts == state["last_seen_ts"] and canonical_id in seen_ids):
+                        reached_seen = True
+                        break
+                if canonical_id in fetched_ids:
+                    continue
+                fetched_ids.add(canonical_id)
+                new_articles.append(title=article.get("title", ""), link=link,
+                                    publish_ts=publish_ts, fake_id=fake_id, article_id=canonical_id)
+
+            # 首次轮询只取一页作为基线
+            if reached_seen or state["last_seen_ts"] == NO_TIME or len(articles_data) < size:
+                break
+            begin += len(articles_data)
+            size = self.page_max_size
+
+        return new_articles, True
+
+    def poll_account(self, fake_id: str) -> AccountState:
+        """轮询一个公众号：增量获取、更新发文历史，对新文章执行筛选、解析和导出"""
+        subscription = self.subscriptions[fake_id]
+        state = self.states.setdefault(fake_id, self._new_state(subscription.get("keyword", fake_id)))
+        first_poll = state["last_seen_ts"] == NO_TIME
+        now = time.time()
+        self.stats["polls"] += 1
+
+        new_articles, complete = self.fetch_new_articles(fake_id, state)
+        if not complete:
+            print(f"[SCHEDULER] {state['nickname']}: 文章列表不完整，保留上次的进度，稍后重试")
+            processed = False
+        elif first_poll:
+            print(f"[SCHEDULER] {state['nickname']}: 首次轮询，记录 {len(new_articles)} 篇文章作为基线")
+            processed = True
+        elif new_articles:
+            print(f"[SCHEDULER] {state['nickname']}: 发现 {len(new_articles)} 篇新文章")
+            try:
+                processed = self.process_new_articles(subscription, state, fake_id, new_articles)
+            except Exception as e:
+                print(f"[SCHEDULER] {state['nickname']}: 处理新文章时出错: {str(e)}")
+                processed = False
+            if processed:
+                self.stats["new_articles"] += len(new_articles)
+        else:
+            processed = True
+
+        if not processed:
+            state["failed_polls"] += 1
+            # 同一批新文章反复处理失败时不再无限重试：记为已见并记录被跳过的文章
+            if complete and state["failed_polls"] >= self.max_failures:
+                print(f"[SCHEDULER] {state['nickname']}: 连续失败 {state['failed_polls']} 次，"
+                      f"跳过 {len(new_articles)} 篇新文章: {'; '.join(new_articles.titles)}")
+                self.stats["abandoned_articles"] += len(new_articles)
+                processed = True
+
+        # 只有新文章全部处理成功（或已放弃）后才推进进度，否则退避后重新获取并处理这些文章
+        if processed:
+            self.mark_seen(fake_id, state, new_articles)
+            state["failed_polls"] = 0
+            state["idle_polls"] = 0 if new_articles else state["idle_polls"] + 1
+            state["next_poll"] = now + self.next_poll_delay(state)
+        else:
+            state["next_poll"] = now + self.retry_delay(state)
+        state["last_poll"] = now
+        print(f"[SCHEDULER] {state['nickname']}: 下次轮询 "
+              f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(state['next_poll']))}")
+        return state
+
+    def mark_seen(self, fake_id: str, state: AccountState, new_articles: ArticleBatch) -> None:
+        """把已处理的新文章记为已见：推进最新发布时间标记并更新发文历史"""
+        dated = [ts for ts in new_articles.publish_ts if ts != NO_TIME]
+        if dated:
+            newest = max(dated)
+            if newest > state["last_seen_ts"]:
+                state["last_seen_ids"] = []
+            state["last_seen_ts"] = newest
+            state["last_seen_ids"] += [canonical_id for canonical_id, ts
+                                       in zip(new_articles.article_ids, new_articles.publish_ts) if ts == newest]
+            state["history"] = sorted(dated + state["history"], reverse=True)[:HISTORY_SIZE]
+
+        if new_articles:
+            from workflow_nodes import history_enabled
+            if history_enabled():
+                from vector_filter import record_articles
+                record_articles(fake_id, new_articles)
+
+    def process_new_articles(self, subscription: Subscription, state: AccountState,
+                             fake_id: str, new_articles: ArticleBatch) -> bool:
+        """只对新文章执行筛选、LLM解析和导出，复用工作流节点；返回是否处理成功"""
+        from workflow_nodes import apply_filters
+        from llm_nodes import parse_articles_with_llm_node
+        from export_nodes import export_to_excel_node
+
+        conditions = FilterConditions(
+            title_keywords=subscription.get("title_keywords"),
+            max_articles=None,
+            start_date=None,
+            end_date=None,
+            required_keywords=subscription.get("required_keywords"),
+            excluded_keywords=subscription.get("excluded_keywords"),
+            match_body=subscription.get("match_body", False),
+            topic=None
+        )
+        filtered = apply_filters(new_articles, conditions)
+        if not filtered:
+            print(f"[SCHEDULER] {state['nickname']}: 新文章均不满足筛选条件")
+            return True
+
+        job_state = WorkflowState(
+            user_input=f"订阅: {state['nickname']}",
+            account_keyword=state["nickname"],
+            account_info=None,
+            fake_id=fake_id,
+            all_articles=new_articles,
+            filter_conditions=conditions,
+            filtered_articles=filtered,
+            short_news_list=[],
+            excel_file_path=None,
+            error_message=None,
+            run_stats={}
+        )
+        config = {"configurable": {"result_sink": self.result_sink}} if self.result_sink else None
+        job_state = parse_articles_with_llm_node(job_state, config)
+        self.stats["processed_articles"] += len(filtered)
+        if job_state.get("error_message"):
+            print(f"[SCHEDULER] {state['nickname']}: 解析失败: {job_state['error_message']}")
+            return False
+        job_state = export_to_excel_node(job_state)
+        if not job_state.get("excel_file_path"):
+            print(f"[SCHEDULER] {state['nickname']}: 导出失败: {job_state.get('error_message')}")
+            return False
+        self.stats["exports"] += 1
+        return True
+
+
+def load_subscriptions(path: str) -> List[Subscription]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="公众号订阅定时抓取调度器")
+    parser.add_argument("--subscriptions", default=get_env_var("SUBSCRIPTIONS_FILE", "subscriptions.json"),
+                        help="订阅列表JSON文件")
+    parser.add_argument("--once", action="store_true", help="轮询一遍已到期的公众号后退出")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.subscriptions):
+        print(f"❌ 订阅列表文件不存在: {args.subscriptions}")
+        return 1
+
+    scheduler = SubscriptionScheduler(load_subscriptions(args.subscriptions))
+    scheduler.run(once=args.once)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""发给LLM前的正文压缩
+
+公众号文章正文里有大量每篇都重复的固定内容：关注引导、二维码说明、免责声明、编辑署名、
+"阅读原文"等，原先和正文一起发给LLM，既占token又拖慢响应。这里在预筛和LLM调用之前：
+- 保留段落结构（extract_article_text 按块级元素分行）
+- 删除同一篇文章内重复出现的行
+- 删除该公众号的固定套话：按 fake_id 统计每一行在多少篇历史文章中出现过，
+  出现篇数和比例都超过阈值的行视为套话（统计随抓取持续更新，新公众号前几篇不做删除）
+每篇文章输出压缩前后的估算token数，汇总记入 run_stats["compaction"]。
+
+统计保存在 TEXT_COMPACTION_DIR（默认 cache/boilerplate）下，每个公众号一个 {fake_id}.json，
+其中记录每篇已统计文章包含的行：超出 MAX_TRACKED_ARTICLES 淘汰旧文章时同时扣减这些行的计数；
+多个进程同时保存时在文件锁内合并，不会互相覆盖。
+
+配置（.env）：
+    TEXT_COMPACTION_ENABLED=true
+    TEXT_COMPACTION_DIR=cache/boilerplate
+    BOILERPLATE_MIN_ARTICLES=3      # 某行至少在该公众号这么多篇历史文章中出现
+    BOILERPLATE_MIN_RATIO=0.3       # 且出现篇数占已统计文章数的比例不低于该值
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple, TypedDict
+
+from article_identity import account_file_name
+from config import get_env_var
+from file_lock import file_lock, writer_tmp_path
+from llm_budget import estimate_tokens
+
+
+# 每个公众号最多统计的行数和文章数，超出时保留出现次数最多的行、最近的文章
+MAX_TRACKED_LINES = 5000
+MAX_TRACKED_ARTICLES = 2000
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class CompactionStats(TypedDict):
+    tokens_before: int
+    tokens_after: int
+    boilerplate_lines: int
+    duplicate_lines: int
+
+
+def enabled() -> bool:
+    return (get_env_var("TEXT_COMPACTION_ENABLED", "true") or "").lower() == "true"
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """按行切分，合并行内连续空白，去掉空行"""
+    lines = (_WHITESPACE.sub(" ", line).strip() for line in text.split("\n"))
+    return [line for line in lines if line]
+
+
+def line_key(line: str) -> str:
+    """行的统计键：去掉全部空白后取哈希，排版差异不影响匹配"""
+    return hashlib.blake2b(_WHITESPACE.sub("", line).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class BoilerplateProfile:
+    """单个公众号各行出现在多少篇文章中"""
+
+    def __init__(self, fake_id: str, path: str):
+        self.fake_id = fake_id
+        self.path = path
+        self.line_counts: Dict[str, int] = {}
+        # 已统计的文章（按统计顺序）及其包含的行，淘汰旧文章时据此扣减 line_counts
+        self.articles: Dict[str, List[str]] = {}
+        self._pending: Dict[str, List[str]] = {}  # 上次保存后新统计的文章，保存时合并到磁盘上的最新统计
+
+    @classmethod
+    def load(cls, fake_id: str, directory: str) -> "BoilerplateProfile":
+        """加载统计，不存在或损坏时返回空统计"""
+        profile = cls(fake_id, os.path.join(directory, account_file_name(fake_id) + ".json"))
+        profile._read()
+        return profile
+
+    def _read(self) -> None:
+        """从文件读入统计（替换内存中已保存的部分），不存在或损坏时为空统计"""
+        self.line_counts, self.articles = {}, {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            line_counts = {key: int(count) for key, count in data["line_counts"].items()}
+            if "articles" in data:
+                articles = {key: list(lines) for key, lines in data["articles"].items()}
+            else:
+                # 旧版本没有记录每篇文章的行，这些文章淘汰时无法扣减，行计数保留
+                articles = {key: [] for key in data["article_keys"]}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[COMPACT] 套话统计文件损坏，重新统计: {e}")
+            return
+        self.line_counts, self.articles = line_counts, articles
+
+    def save(self) -> None:
+        """在文件锁内重新读取磁盘上的统计、并入本进程新统计的文章后写回，多个进程的统计不会互相覆盖"""
+        if not self._pending:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with file_lock(self.path):
+            self._read()
+            for article_key, keys in self._pending.items():
+                self._add(article_key, keys)
+            tmp_path = writer_tmp_path(self.path)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"line_counts": self.line_counts, "articles": self.articles}, f)
+            os.replace(tmp_path, self.path)
+        self._pending = {}
+
+    def knows(self, article_key: str) -> bool:
+        return article_key in self.articles
+
+    def is_boilerplate(self, key: str, min_articles: int, min_ratio: float, exclude_self: bool = False) -> bool:
+        """exclude_self：当前文章此前已计入统计（重新处理同一篇文章），不把它自己算作出现过的文章"""
+        offset = 1 if exclude_self else 0
+        count = self.line_counts.get(key, 0) - offset
+        return count >= min_articles and count >= min_ratio * (len(self.articles) - offset)
+
+    def learn(self, article_key: str, keys: Set[str]) -> None:
+        """记录一篇文章包含的行；同一篇文章只统计一次"""
+        if article_key in self.articles:
+            return
+        self._add(article_key, sorted(keys))
+        self._pending[article_key] = self.articles[article_key]
+
+    def _add(self, article_key: str, keys: List[str]) -> None:
+        if article_key in self.articles:
+            return
+        self.articles[article_key] = keys
+        for key in keys:
+            self.line_counts[key] = self.line_counts.get(key, 0) + 1
+        # 超出文章数上限时淘汰最早统计的文章，并扣减它们的行计数
+        while len(self.articles) > MAX_TRACKED_ARTICLES:
+            old_key = next(iter(self.articles))
+            for key in self.articles.pop(old_key):
+                count = self.line_counts.get(key)
+                if count is None:
+                    continue  # 已因行数上限被丢弃
+                if count > 1:
+                    self.line_counts[key] = count - 1
+                else:
+                    del self.line_counts[key]
+        if len(self.line_counts) > MAX_TRACKED_LINES:
+            kept = sorted(self.line_counts.items(), key=lambda item: item[1], reverse=True)[:MAX_TRACKED_LINES]
+            self.line_counts = dict(kept)
+
+
+class TextCompactor:
+    """按公众号学习套话并压缩正文"""
+
+    def __init__(self, directory: str, min_articles: int = 3, min_ratio: float = 0.3):
+        self.directory = directory
+        self.min_articles = min_articles
+        self.min_ratio = min_ratio
+        self._profiles: Dict[str, BoilerplateProfile] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TextCompactor":
+        return cls(
+            get_env_var("TEXT_COMPACTION_DIR", os.path.join("cache", "boilerplate")),
+            min_articles=int(get_env_var("BOILERPLATE_MIN_ARTICLES", "3")),
+            min_ratio=float(get_env_var("BOILERPLATE_MIN_RATIO", "0.3")),
+        )
+
+    def _profile(self, fake_id: str) -> BoilerplateProfile:
+        profile = self._profiles.get(fake_id)
+        if profile is None:
+            profile = BoilerplateProfile.load(fake_id, self.directory)
+            self._profiles[fake_id] = profile
+        return profile
+
+    def compact(self, fake_id: str, article_key: str, text: str) -> Tuple[str, CompactionStats]:
+        """返回 (压缩后的正文, 统计)；判断套话只用此前文章的统计，随后把本篇计入统计"""
+        lines = split_paragraphs(text)
+        with self._lock:
+            profile = self._profile(fake_id)
+            known = profile.knows(article_key)
+            seen: Set[str] = set()
+            unique_lines = []
+            kept = []
+            for line in lines:
+                key = line_key(line)
+                if key in seen:
+                    continue
+                seen.add(key)
+                unique_lines.append(line)
+                if not profile.is_boilerplate(key, self.min_articles, self.min_ratio, exclude_self=known):
+                    kept.append(line)
+            profile.learn(article_key, seen)
+
+        # 全篇都被判为套话时（如纯转发的固定模板）保留去重后的原文，交给预筛判断
+        if not kept:
+            kept = unique_lines
+        compacted = "\n".join(kept)
+        return compacted, CompactionStats(
+            tokens_before=estimate_tokens(text),
+            tokens_after=estimate_tokens(compacted),
+            boilerplate_lines=len(unique_lines) - len(kept),
+            duplicate_lines=len(lines) - len(unique_lines),
+        )
+
+    def flush(self) -> None:
+        """保存有变化的统计"""
+        with self._lock:
+            for profile in self._profiles.values():
+                profile.save()
+
+
+_compactor: Optional[TextCompactor] = None
+
+
+def get_text_compactor() -> Optional[TextCompactor]:
+    """进程内共享的 TextCompactor；TEXT_COMPACTION_ENABLED=false 时返回 None"""
+    global _compactor
+    if not enabled():
+        return None
+    if _compactor is None:
+        _compactor = TextCompactor.from_env()
+    return _compactor
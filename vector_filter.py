@@ -0,0 +1,261 @@
+"""向量化的日期与关键词筛选
+
+apply_filters 对每篇文章逐行比较发布时间、逐个标题运行关键词自动机，对单页几十篇文章足够快；
+在本地积累的公众号文章历史（数万篇）上查询时就成了瓶颈。这里改为按列批量计算：
+- ArticleHistory：按公众号持久化的文章历史，发布时间为升序的 int64 数组，
+  日期窗口用两次 np.searchsorted 二分得到行区间，耗时与历史长度基本无关；
+  发布时间缺失（NO_TIME）的行排在最前面，按原有语义始终保留
+- 标题列为预先转小写的 NumPy 字符串数组，OR/AND/NOT 关键词组用 np.char.find 批量生成布尔掩码，
+  只作用于日期窗口内的行
+- filter_batch：apply_filters 在批次行数超过 VECTOR_FILTER_MIN_ROWS 时改走这里，结果与逐行版本一致
+
+文章历史保存在 ARTICLE_HISTORY_DIR（默认 cache/history）下，每个公众号一个 {fake_id}.npz。
+ARTICLE_HISTORY_ENABLED=true 时，工作流和订阅调度器获取到的文章列表会合并进历史。
+
+用法：
+    python vector_filter.py stats MzIxMTExMTcxNQ==
+    python vector_filter.py query MzIxMTExMTcxNQ== --start 2024-01-01 --end 2024-06-30 --keywords AI,大模型 --limit 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from article_batch import ArticleBatch, NO_TIME
+from article_identity import account_file_name
+from config import get_env_var
+from keyword_matcher import KeywordMatcher, get_keyword_matcher
+from workflow_state import FilterConditions
+
+
+# NumPy 2 的 np.strings 是真正的 ufunc，比逐元素调用 Python 方法的 np.char 快；旧版本退回 np.char
+_strings = getattr(np, "strings", np.char)
+
+
+def _history_dir() -> str:
+    return get_env_var("ARTICLE_HISTORY_DIR", os.path.join("cache", "history"))
+
+
+def date_bounds(conditions: FilterConditions) -> Tuple[Optional[float], Optional[float]]:
+    start_date = conditions.get("start_date")
+    end_date = conditions.get("end_date")
+    return (start_date.timestamp() if start_date else None,
+            end_date.timestamp() if end_date else None)
+
+
+def keyword_mask(titles_lower: np.ndarray, matcher: KeywordMatcher) -> np.ndarray:
+    """标题的关键词掩码，语义与 KeywordMatcher.title_may_match 一致"""
+    def contains(keyword: str) -> np.ndarray:
+        return _strings.find(titles_lower, keyword) >= 0
+
+    mask = np.ones(len(titles_lower), dtype=bool)
+    for keyword in matcher.none_keywords:
+        mask &= ~contains(keyword)
+    # 需要匹配正文时，仅凭标题只能排除命中排除词的文章
+    if matcher.match_body:
+        return mask
+    for keyword in matcher.all_keywords:
+        mask &= contains(keyword)
+    if matcher.any_keywords:
+        any_mask = np.zeros(len(titles_lower), dtype=bool)
+        for keyword in matcher.any_keywords:
+            any_mask |= contains(keyword)
+        mask &= any_mask
+    return mask
+
+
+def lowered(titles: List[str]) -> np.ndarray:
+    """标题转小写后再建数组：小写后变长的字符（如 'İ'）会被 np.strings.lower 按原宽度截断"""
+    return np.asarray([title.lower() for title in titles], dtype=str)
+
+
+def filter_batch(articles: ArticleBatch, conditions: FilterConditions) -> ArticleBatch:
+    """apply_filters 的向量化版本：返回满足条件的文章，保持原有顺序"""
+    mask = np.ones(len(articles), dtype=bool)
+
+    matcher = get_keyword_matcher(conditions)
+    if matcher:
+        mask &= keyword_mask(lowered(articles.titles), matcher)
+        print(f"[DEBUG] 按关键词 {conditions.get('title_keywords')} 筛选后剩余 {int(mask.sum())} 篇文章")
+
+    start_ts, end_ts = date_bounds(conditions)
+    if start_ts is not None or end_ts is not None:
+        # array('q') 直接作为 int64 数组使用，不复制
+        publish_ts = np.frombuffer(articles.publish_ts, dtype=np.int64)
+        in_range = np.ones(len(articles), dtype=bool)
+        if start_ts is not None:
+            in_range &= publish_ts >= start_ts
+        if end_ts is not None:
+            in_range &= publish_ts <= end_ts
+        # 发布时间缺失的文章予以保留
+        mask &= in_range | (publish_ts == NO_TIME)
+        print(f"[DEBUG] 按时间筛选后剩余 {int(mask.sum())} 篇文章")
+
+    return articles.take(np.flatnonzero(mask).tolist())
+
+
+class ArticleHistory:
+    """单个公众号的本地文章历史，各列按发布时间升序排列"""
+
+    def __init__(self, fake_id: str):
+        self.fake_id = fake_id
+        self.publish_ts = np.zeros(0, dtype=np.int64)
+        self.titles = np.zeros(0, dtype=str)
+        self.links = np.zeros(0, dtype=str)
+        self.article_ids = np.zeros(0, dtype=str)
+        self._titles_lower: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.publish_ts)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(_history_dir(), account_file_name(self.fake_id) + ".npz")
+
+    @classmethod
+    def load(cls, fake_id: str) -> "ArticleHistory":
+        """加载公众号文章历史，不存在或损坏时返回空历史"""
+        history = cls(fake_id)
+        if not os.path.exists(history.path):
+            return history
+        try:
+            with np.load(history.path, allow_pickle=False) as arrays:
+                history.publish_ts = arrays["publish_ts"].astype(np.int64)
+                history.titles = arrays["titles"]
+                history.links = arrays["links"]
+                history.article_ids = arrays["article_ids"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[HISTORY] 文章历史文件损坏，重新记录: {e}")
+            return cls(fake_id)
+        return history
+
+    def save(self) -> None:
+        os.makedirs(_history_dir(), exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, publish_ts=self.publish_ts, titles=self.titles,
+                 links=self.links, article_ids=self.article_ids)
+        os.replace(tmp_path, self.path)
+
+    def merge(self, articles: ArticleBatch) -> int:
+        """把尚未记录的文章（按文章标识判断）并入历史，返回新增篇数"""
+        known = set(self.article_ids.tolist())
+        rows = []
+        for i, canonical_id in enumerate(articles.article_ids):
+            if canonical_id and canonical_id not in known:
+                known.add(canonical_id)
+                rows.append(i)
+        if not rows:
+            return 0
+
+        publish_ts = np.concatenate([self.publish_ts, np.frombuffer(articles.publish_ts, dtype=np.int64)[rows]])
+        titles = np.concatenate([self.titles, np.asarray([articles.titles[i] for i in rows], dtype=str)])
+        links = np.concatenate([self.links, np.asarray([articles.links[i] for i in rows], dtype=str)])
+        article_ids = np.concatenate([self.article_ids, np.asarray([articles.article_ids[i] for i in rows], dtype=str)])
+        order = np.argsort(publish_ts, kind="stable")
+        self.publish_ts = publish_ts[order]
+        self.titles = titles[order]
+        self.links = links[order]
+        self.article_ids = article_ids[order]
+        self._titles_lower = None
+        return len(rows)
+
+    def _window(self, start_ts: Optional[float], end_ts: Optional[float]) -> np.ndarray:
+        """日期窗口内的行号（升序），包括发布时间缺失的行"""
+        publish_ts = self.publish_ts
+        missing = int(np.searchsorted(publish_ts, NO_TIME, side="right"))
+        lo = missing if start_ts is None else max(missing, int(np.searchsorted(publish_ts, start_ts, side="left")))
+        hi = len(publish_ts) if end_ts is None else int(np.searchsorted(publish_ts, end_ts, side="right"))
+        if not missing:
+            return np.arange(lo, max(lo, hi))
+        return np.concatenate([np.arange(missing), np.arange(lo, max(lo, hi))])
+
+    def query(self, conditions: FilterConditions) -> ArticleBatch:
+        """按筛选条件查询，结果按发布时间从新到旧排列（与文章列表接口的顺序一致）"""
+        rows = self._window(*date_bounds(conditions))
+        matcher = get_keyword_matcher(conditions)
+        if matcher and len(rows):
+            if self._titles_lower is None:
+                self._titles_lower = lowered(self.titles.tolist())
+            rows = rows[keyword_mask(self._titles_lower[rows], matcher)]
+
+        rows = rows[::-1]
+        return ArticleBatch.from_columns(self.titles[rows].tolist(), self.links[rows].tolist(),
+                                         self.publish_ts[rows].tolist(), self.article_ids[rows].tolist(),
+                                         self.fake_id)
+
+
+def record_articles(fake_id: str, articles: ArticleBatch) -> None:
+    """把获取到的文章列表并入公众号历史（调用方按 ARTICLE_HISTORY_ENABLED 决定是否调用）"""
+    if not fake_id or not len(articles):
+        return
+    history = ArticleHistory.load(fake_id)
+    added = history.merge(articles)
+    if added:
+        try:
+            history.save()
+        except OSError as e:
+            print(f"[HISTORY] 保存文章历史失败: {e}")
+            return
+        print(f"[HISTORY] 文章历史新增 {added} 篇，共 {len(history)} 篇")
+
+
+def _parse_date(text: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(text, "%Y-%m-%d") if text else None
+
+
+def _split_keywords(text: Optional[str]):
+    return [keyword for keyword in (text or "").split(",") if keyword.strip()] or None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="本地文章历史查询")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subparsers.add_parser("stats", help="文章历史统计")
+    stats_parser.add_argument("fake_id")
+    query_parser = subparsers.add_parser("query", help="按日期和关键词查询文章历史")
+    query_parser.add_argument("fake_id")
+    query_parser.add_argument("--start", help="开始日期 YYYY-MM-DD")
+    query_parser.add_argument("--end", help="结束日期 YYYY-MM-DD（含当天）")
+    query_parser.add_argument("--keywords", help="标题关键词，逗号分隔，任一命中即可")
+    query_parser.add_argument("--required", help="必须全部命中的关键词，逗号分隔")
+    query_parser.add_argument("--exclude", help="排除的关键词，逗号分隔")
+    query_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    history = ArticleHistory.load(args.fake_id)
+    if args.command == "stats":
+        dated = history.publish_ts[history.publish_ts != NO_TIME]
+        print(f"articles           {len(history)}")
+        if len(dated):
+            print(f"oldest             {datetime.fromtimestamp(int(dated[0])):%Y-%m-%d}")
+            print(f"newest             {datetime.fromtimestamp(int(dated[-1])):%Y-%m-%d}")
+        return 0
+
+    end_date = _parse_date(args.end)
+    conditions = FilterConditions(
+        title_keywords=_split_keywords(args.keywords),
+        max_articles=args.limit,
+        start_date=_parse_date(args.start),
+        end_date=end_date.replace(hour=23, minute=59, second=59) if end_date else None,
+        required_keywords=_split_keywords(args.required),
+        excluded_keywords=_split_keywords(args.exclude),
+        match_body=False,
+        topic=None
+    )
+    start = time.perf_counter()
+    result = history.query(conditions)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for article in result[:args.limit]:
+        publish_ts = article.publish_ts
+        date = datetime.fromtimestamp(publish_ts).strftime("%Y-%m-%d") if publish_ts != NO_TIME else "----------"
+        print(f"{date}  {article['title']}  {article['link']}")
+    print(f"[HISTORY] 历史 {len(history)} 篇，命中 {len(result)} 篇，查询耗时 {elapsed_ms:.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
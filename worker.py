@@ -0,0 +1,163 @@
+"""批处理worker：从共享任务队列领取任务并执行工作流
+
+可以在多台机器上各启动若干个worker，指向同一个队列（共享存储上的 SQLite 文件或队列服务）：
+    python worker.py                                  # 使用 JOB_QUEUE_URL，默认 cache/jobs.db
+    python worker.py --queue /mnt/shared/jobs.db
+    python worker.py --queue http://queue-host:8765
+    python worker.py --once                           # 队列为空时退出，不再等待新任务
+    python worker.py --profile                        # 每个任务做CPU采样，输出火焰图数据和热点报告
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict
+
+from config import get_env_var
+from job_queue import Job, JobQueue, open_queue
+
+
+# 队列为空或暂时不可用时的轮询间隔（秒）
+IDLE_POLL_SECONDS = 5
+# 回报任务结果失败时的尝试次数；仍失败则放弃，租约到期后任务由其他worker重新执行
+REPORT_ATTEMPTS = 3
+
+
+def job_user_input(payload: Dict[str, Any]) -> str:
+    """任务内容转换为工作流的用户输入；按公众号提交的任务获取该公众号的最新文章"""
+    if payload.get("user_input"):
+        return payload["user_input"]
+    return f"请查询{payload['account']}的文章{payload.get('query', '')}"
+
+
+class Heartbeat:
+    """后台线程定期续约，直到任务结束；续约失败说明租约已被其他worker接管"""
+
+    def __init__(self, queue: JobQueue, job_id: str, worker_id: str, lease_seconds: float):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker_id, self.lease_seconds):
+                    print(f"[WORKER] 任务 {self.job_id} 的租约已丢失")
+                    self.lost = True
+                    return
+            except Exception as e:
+                # 队列暂时不可用时继续尝试，租约仍在有效期内
+                print(f"[WORKER] 心跳失败: {e}")
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def report_result(action, *args) -> bool:
+    """调用 queue.complete / queue.fail 回报结果，队列暂时不可用（网络错误、数据库被锁）时退避重试"""
+    for attempt in range(1, REPORT_ATTEMPTS + 1):
+        try:
+            action(*args)
+            return True
+        except Exception as e:
+            print(f"[WORKER] 回报任务结果失败（第 {attempt}/{REPORT_ATTEMPTS} 次）: {e}")
+            if attempt < REPORT_ATTEMPTS:
+                time.sleep(IDLE_POLL_SECONDS)
+    return False
+
+
+def run_job(queue: JobQueue, job: Job, worker_id: str, lease_seconds: float, profile: bool = False) -> bool:
+    """执行一个任务并回报结果，返回是否成功；profile 时对该任务做CPU采样"""
+    import contextlib
+    from workflow import run_workflow
+
+    user_input = job_user_input(job["payload"])
+    print(f"[WORKER] 开始任务 {job['id']}（第 {job['attempts']}/{job['max_attempts']} 次）: {user_input}")
+
+    with Heartbeat(queue, job["id"], worker_id, lease_seconds) as heartbeat:
+        try:
+            if profile:
+                from cpu_profile import profiling
+                sampling = profiling(f"job_{job['id']}")
+            else:
+                sampling = contextlib.nullcontext()
+            with sampling:
+                result = run_workflow(user_input)
+            error = result.get("error_message")
+        except Exception as e:
+            result, error = {}, str(e)
+
+    if heartbeat.lost:
+        print(f"[WORKER] 任务 {job['id']} 已由其他worker接管，放弃本次结果")
+        return False
+    if error:
+        report_result(queue.fail, job["id"], worker_id, error)
+        print(f"[WORKER] 任务 {job['id']} 失败: {error}")
+        return False
+
+    if not report_result(queue.complete, job["id"], worker_id, {
+        "excel_file_path": result.get("excel_file_path"),
+        "articles": len(result.get("filtered_articles") or []),
+        "short_news": len(result.get("short_news_list") or []),
+        "run_stats": result.get("run_stats", {}),
+    }):
+        print(f"[WORKER] 任务 {job['id']} 已执行但无法回报结果，租约到期后将重新执行")
+        return False
+    print(f"[WORKER] 任务 {job['id']} 完成: {result.get('excel_file_path')}")
+    return True
+
+
+def run_worker(queue: JobQueue, worker_id: str, lease_seconds: float, once: bool = False,
+               profile: bool = False) -> Dict[str, int]:
+    """循环领取并执行任务"""
+    stats = {"done": 0, "failed": 0}
+    print(f"[WORKER] {worker_id} 已启动")
+    try:
+        while True:
+            try:
+                job = queue.claim(worker_id, lease_seconds)
+            except Exception as e:
+                # 队列服务不可达或 SQLite 数据库被锁时等待后重试，不退出worker
+                print(f"[WORKER] 领取任务失败，{IDLE_POLL_SECONDS}s 后重试: {e}")
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+            if job is None:
+                if once:
+                    break
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+            stats["done" if run_job(queue, job, worker_id, lease_seconds, profile) else "failed"] += 1
+    except KeyboardInterrupt:
+        print("\n[WORKER] 已停止")
+    print(f"[WORKER] {worker_id} 完成 {stats['done']} 个任务，失败 {stats['failed']} 个")
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="微信公众号文章收集 批处理worker")
+    parser.add_argument("--queue", default=None, help="队列地址：SQLite 文件路径或 http://host:port")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--lease-seconds", type=float,
+                        default=float(get_env_var("JOB_LEASE_SECONDS", "300")))
+    parser.add_argument("--once", action="store_true", help="队列为空时退出")
+    parser.add_argument("--profile", action="store_true",
+                        help="对每个任务做CPU采样，写出火焰图用的折叠调用栈和按节点的热点报告")
+    args = parser.parse_args(argv)
+
+    stats = run_worker(open_queue(args.queue), args.worker_id, args.lease_seconds, args.once, args.profile)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,119 @@
-from langgraph.graph import StateGraph, END
+import functools
+import sys
+
 from workflow_state import WorkflowState
+from article_batch import ArticleBatch
 from llm_extraction_nodes import (  # 使用新的LLM提取节点
     llm_extract_account_keyword_node,
-    llm_parse_filter_conditions_node
+    llm_parse_filter_conditions_node,
+    allm_extract_account_keyword_node,
+    allm_parse_filter_conditions_node
 )
 from workflow_nodes import (
     get_account_info_node,
-    fetch_articles_with_smart_filtering_node
+    fetch_articles_with_smart_filtering_node,
+    aget_account_info_node,
+    afetch_articles_with_smart_filtering_node
 )
-from llm_nodes import parse_articles_with_llm_node
+from llm_nodes import parse_articles_with_llm_node, aparse_articles_with_llm_node
 from export_nodes import export_to_excel_node, should_continue, error_handler_node
 
 
-def create_workflow():
-    """创建LangGraph工作流"""
+# 并行分支中各节点负责写入的字段
+ACCOUNT_BRANCH_FIELDS = ("account_keyword", "account_info", "fake_id", "error_message")
+CONDITIONS_BRANCH_FIELDS = ("filter_conditions",)
+
+# 同步/异步工作流使用的节点；导出和错误处理是本地文件操作，异步工作流中由 LangGraph 放到线程池执行
+SYNC_NODES = {
+    "llm_extract_keyword": llm_extract_account_keyword_node,
+    "get_account_info": get_account_info_node,
+    "llm_parse_conditions": llm_parse_filter_conditions_node,
+    "smart_fetch_and_filter": fetch_articles_with_smart_filtering_node,
+    "parse_with_llm": parse_articles_with_llm_node,
+}
+ASYNC_NODES = {
+    "llm_extract_keyword": allm_extract_account_keyword_node,
+    "get_account_info": aget_account_info_node,
+    "llm_parse_conditions": allm_parse_filter_conditions_node,
+    "smart_fetch_and_filter": afetch_articles_with_smart_filtering_node,
+    "parse_with_llm": aparse_articles_with_llm_node,
+}
+
+
+def branch_node(fn, fields):
+    """并行分支中的节点只返回自己负责的字段
+
+    节点函数原样修改并返回整个状态，而两个分支在同一步中写入同一字段（如未改动的 error_message）
+    会被 LangGraph 视为冲突，这里只把该分支负责的字段作为更新返回。
+    """
+    import inspect
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            result = await fn(state, *args, **kwargs)
+            return {field: result[field] for field in fields if field in result}
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        result = fn(state, *args, **kwargs)
+        return {field: result[field] for field in fields if field in result}
+    return wrapper
+
+
+def join_inputs_node(state: WorkflowState) -> dict:
+    """汇合点：公众号查找和筛选条件解析都完成后再继续"""
+    return {}
+
+
+def create_workflow(use_async: bool = False):
+    """创建LangGraph工作流
+
+    关键词提取 → 公众号查找 与 筛选条件解析 互不依赖，作为两个并行分支执行，
+    在 join_inputs 汇合后进入文章获取；公众号查找失败时直接转到错误处理。
+    use_async=True 时使用异步节点，需通过 app.ainvoke 运行（见 arun_workflow）。
+    """
+    nodes = ASYNC_NODES if use_async else SYNC_NODES
+    # CPU 采样（--profile）时登记节点函数，据此把样本归入节点；未开启采样时不加载采样模块
+    if "cpu_profile" in sys.modules:
+        from cpu_profile import register_nodes
+        register_nodes({**nodes, "export_excel": export_to_excel_node, "error_handler": error_handler_node})
+    from langgraph.graph import StateGraph, START, END  # 延迟导入，CLI启动时不加载langgraph
+    from memory_report import profiled  # tracemalloc 只在开启 MEMORY_PROFILE 时加载
     
     # 创建状态图
     workflow = StateGraph(WorkflowState)
     
-    # 添加节点 - 使用新的LLM提取节点
-    workflow.add_node("llm_extract_keyword", llm_extract_account_keyword_node)  # LLM提取关键词
-    workflow.add_node("get_account_info", get_account_info_node)
-    workflow.add_node("llm_parse_conditions", llm_parse_filter_conditions_node)  # LLM解析条件
-    workflow.add_node("smart_fetch_and_filter", fetch_articles_with_smart_filtering_node)
-    workflow.add_node("parse_with_llm", parse_articles_with_llm_node)
-    workflow.add_node("export_excel", export_to_excel_node)
-    workflow.add_node("error_handler", error_handler_node)
-    
-    # 设置入口点
-    workflow.set_entry_point("llm_extract_keyword")
+    # 添加节点 - 使用新的LLM提取节点（开启 MEMORY_PROFILE 时每个节点统计内存占用）
+    workflow.add_node("llm_extract_keyword", profiled("llm_extract_keyword", branch_node(
+        nodes["llm_extract_keyword"], ACCOUNT_BRANCH_FIELDS)))  # LLM提取关键词
+    workflow.add_node("get_account_info", profiled("get_account_info", branch_node(
+        nodes["get_account_info"], ACCOUNT_BRANCH_FIELDS)))
+    workflow.add_node("llm_parse_conditions", profiled("llm_parse_conditions", branch_node(
+        nodes["llm_parse_conditions"], CONDITIONS_BRANCH_FIELDS)))  # LLM解析条件
+    workflow.add_node("join_inputs", join_inputs_node)
+    workflow.add_node("smart_fetch_and_filter", profiled("smart_fetch_and_filter", nodes["smart_fetch_and_filter"]))
+    workflow.add_node("parse_with_llm", profiled("parse_with_llm", nodes["parse_with_llm"]))
+    workflow.add_node("export_excel", profiled("export_excel", export_to_excel_node))
+    workflow.add_node("error_handler", profiled("error_handler", error_handler_node))
     
-    # 添加边 - 使用新的节点名称
+    # 入口同时启动两个分支：关键词提取 → 公众号查找，以及筛选条件解析
+    workflow.add_edge(START, "llm_extract_keyword")
+    workflow.add_edge(START, "llm_parse_conditions")
     workflow.add_edge("llm_extract_keyword", "get_account_info")
-    workflow.add_edge("get_account_info", "llm_parse_conditions")
-    workflow.add_edge("llm_parse_conditions", "smart_fetch_and_filter")
+    
+    # 两个分支都完成后汇合
+    workflow.add_edge(["get_account_info", "llm_parse_conditions"], "join_inputs")
+    workflow.add_conditional_edges(
+        "join_inputs",
+        should_continue,
+        {
+            "continue": "smart_fetch_and_filter",
+            "error": "error_handler"
+        }
+    )
+    
     workflow.add_edge("smart_fetch_and_filter", "parse_with_llm")
     workflow.add_edge("parse_with_llm", "export_excel")
     
@@ -57,44 +137,66 @@ def create_workflow():
     return app
 
 
-def run_workflow(user_input: str):
-    """运行工作流"""
-    print("=== 开始执行微信文章收集工作流 (使用LLM智能理解) ===")
-    print(f"用户输入: {user_input}")
-    
-    # 创建工作流
-    app = create_workflow()
-    
-    # 初始状态
-    initial_state = WorkflowState(
+def initial_state(user_input: str) -> WorkflowState:
+    return WorkflowState(
         user_input=user_input,
         account_keyword="",
         account_info=None,
         fake_id=None,
-        all_articles=[],
+        all_articles=ArticleBatch(),
         filter_conditions={},
-        filtered_articles=[],
+        filtered_articles=ArticleBatch(),
         short_news_list=[],
         excel_file_path=None,
-        error_message=None
+        error_message=None,
+        run_stats={}
     )
+
+
+def report_result(result) -> None:
+    """打印工作流结果摘要（开启内存统计时附带内存报告）"""
+    print("\n=== 工作流执行完成 ===")
+    if result.get("error_message"):
+        print(f"执行失败: {result['error_message']}")
+    else:
+        print(f"✅ 成功处理公众号: {result.get('account_keyword', 'Unknown')}")
+        print(f"📊 获取文章数量: {len(result.get('all_articles', []))}")
+        print(f"🔍 筛选后文章数量: {len(result.get('filtered_articles', []))}")
+        print(f"📰 提取短新闻数量: {len(result.get('short_news_list', []))}")
+        prefilter_stats = result.get("run_stats", {}).get("prefilter")
+        if prefilter_stats:
+            print(f"🧹 预筛节省LLM调用: {prefilter_stats['llm_calls_saved']} 次")
+        budget_stats = result.get("run_stats", {}).get("llm_budget")
+        if budget_stats and budget_stats.get("exhausted_by"):
+            print(f"💰 LLM预算用完({budget_stats['exhausted_by']}): "
+                  f"降级 {budget_stats['downgraded']} 篇，跳过 {budget_stats['skipped']} 篇")
+        if result.get("excel_file_path"):
+            print(f"📁 Excel文件路径: {result['excel_file_path']}")
+    
+    from memory_report import get_profiler
+    profiler = get_profiler()
+    if profiler:
+        print(profiler.end_job(result))
+
+
+async def arun_workflow(user_input: str, result_sink=None):
+    """异步运行工作流；同一事件循环中可以并发运行多个任务：
+
+        results = await asyncio.gather(*(arun_workflow(q) for q in queries))
+
+    result_sink: 可选的 ResultSink（见 result_stream.py），每条短新闻提取后立即输出
+    """
+    print("=== 开始执行微信文章收集工作流 (使用LLM智能理解) ===")
+    print(f"用户输入: {user_input}")
+    
+    # 创建工作流
+    app = create_workflow(use_async=True)
     
     try:
         # 执行工作流
-        result = app.invoke(initial_state)
-        
-        # 打印结果
-        print("\n=== 工作流执行完成 ===")
-        if result.get("error_message"):
-            print(f"执行失败: {result['error_message']}")
-        else:
-            print(f"✅ 成功处理公众号: {result.get('account_keyword', 'Unknown')}")
-            print(f"📊 获取文章数量: {len(result.get('all_articles', []))}")
-            print(f"🔍 筛选后文章数量: {len(result.get('filtered_articles', []))}")
-            print(f"📰 提取短新闻数量: {len(result.get('short_news_list', []))}")
-            if result.get("excel_file_path"):
-                print(f"📁 Excel文件路径: {result['excel_file_path']}")
-        
+        config = {"configurable": {"result_sink": result_sink}} if result_sink else None
+        result = await app.ainvoke(initial_state(user_input), config=config)
+        report_result(result)
         return result
         
     except Exception as e:
@@ -102,6 +204,23 @@ def run_workflow(user_input: str):
         return {"error_message": str(e)}
 
 
+def run_workflow(user_input: str, result_sink=None):
+    """运行工作流（同步接口）：在新的事件循环中执行 arun_workflow
+
+    不能在已有事件循环的线程中调用，异步代码中请直接 await arun_workflow。
+    """
+    import asyncio
+    from async_http import close_async_client
+
+    async def run():
+        try:
+            return await arun_workflow(user_input, result_sink)
+        finally:
+            await close_async_client()
+
+    return asyncio.run(run())
+
+
 if __name__ == "__main__":
     # 示例使用 - 测试各种复杂的自然语言输入
     test_inputs = [
@@ -1,12 +1,23 @@
 import re
-import requests
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from dateutil import parser as date_parser
-from bs4 import BeautifulSoup
+from typing import Optional, Tuple
 
-from workflow_state import WorkflowState, ArticleInfo, FilterConditions
-from api_request import get_account_info, get_articles
+from workflow_state import WorkflowState, FilterConditions
+from api_request import aget_account_info, aget_articles, get_account_info, get_articles
+from article_batch import ArticleBatch, NO_TIME, to_epoch
+from article_identity import article_id
+from keyword_matcher import get_keyword_matcher
+from adaptive_paging import AdaptivePager
+from config import get_env_var
+
+
+# 主题排序：未指定数量时返回的篇数，以及候选池相对top-k的倍数
+DEFAULT_TOPIC_TOP_K = 20
+TOPIC_CANDIDATE_MULTIPLIER = 10
+# 未指定数量时，筛选出这么多篇即停止获取
+DEFAULT_ENOUGH_ARTICLES = 50
+# 批次超过这么多行时改用 NumPy 向量化筛选
+VECTOR_FILTER_MIN_ROWS = int(get_env_var("VECTOR_FILTER_MIN_ROWS", "2000"))
 
 
 def extract_account_keyword_node(state: WorkflowState) -> WorkflowState:
@@ -52,261 +63,377 @@ def get_account_info_node(state: WorkflowState) -> WorkflowState:
         return state
     
     try:
-        account_info = get_account_info(keyword)
-        print(f"[DEBUG] API返回结果: {account_info}")
-        
-        # 根据实际API返回结构解析
-        if (account_info and 
-            account_info.get("base_resp", {}).get("ret") == 0 and  # 检查返回状态
-            account_info.get("list") and 
-            len(account_info["list"]) > 0):
-            
-            # 取第一个匹配的公众号
-            first_account = account_info["list"][0]
-            state["account_info"] = first_account
-            state["fake_id"] = first_account.get("fakeid")  # 注意是 fakeid 不是 fake_id
-            
-            nickname = first_account.get("nickname", "Unknown")
-            fakeid = first_account.get("fakeid", "")
-            signature = first_account.get("signature", "")
-            
-            print(f"[DEBUG] 找到公众号: {nickname}")
-            print(f"[DEBUG] fakeid: {fakeid}")
-            print(f"[DEBUG] 简介: {signature}")
-            
-        else:
-            error_msg = "未找到匹配的公众号"
-            if account_info:
-                # 检查是否有错误信息
-                base_resp = account_info.get("base_resp", {})
-                if base_resp.get("ret") != 0:
-                    error_msg = f"API错误: {base_resp.get('err_msg', '未知错误')}"
-                elif account_info.get("total", 0) == 0:
-                    error_msg = f"未找到关键词为 '{keyword}' 的公众号"
-            
-            state["error_message"] = error_msg
-            
+        apply_account_info(state, keyword, get_account_info(keyword))
     except Exception as e:
         state["error_message"] = f"获取公众号信息时出错: {str(e)}"
     
     return state
 
 
-def fetch_articles_with_smart_filtering_node(state: WorkflowState) -> WorkflowState:
-    """智能获取文章：根据筛选条件动态获取足够数量的文章，支持时间范围优化"""
-    fake_id = state["fake_id"]
-    conditions = state.get("filter_conditions", {})
-    print(f"[DEBUG] 开始智能获取文章，fake_id: {fake_id}")
-    print(f"[DEBUG] 筛选条件: {conditions}")
-    
-    if not fake_id:
-        state["error_message"] = "缺少公众号fake_id"
+async def aget_account_info_node(state: WorkflowState) -> WorkflowState:
+    """get_account_info_node 的异步版本"""
+    keyword = state["account_keyword"]
+    print(f"[DEBUG] 搜索关键词: {keyword}")
+    if not keyword:
+        state["error_message"] = "未能提取到公众号关键词"
         return state
     
-    # 检查是否有时间范围条件，启用优化策略
-    start_date = conditions.get("start_date")
-    end_date = conditions.get("end_date")
-    has_time_range = start_date or end_date
-    
-    if has_time_range:
-        print(f"[TIME-OPT] 检测到时间范围条件，启用时间优化策略")
-        print(f"[TIME-OPT] 时间范围: {start_date} 到 {end_date}")
+    try:
+        apply_account_info(state, keyword, await aget_account_info(keyword))
+    except Exception as e:
+        state["error_message"] = f"获取公众号信息时出错: {str(e)}"
     
-    all_articles = []
-    filtered_articles = []
-    begin = 0
-    size = 20
-    max_pages = 50
-    target_count = conditions.get("max_articles", 20)
+    return state
+
+
+def apply_account_info(state: WorkflowState, keyword: str, account_info) -> WorkflowState:
+    """根据搜索接口的返回写入公众号信息或错误信息"""
+    print(f"[DEBUG] API返回结果: {account_info}")
+    
+    # 根据实际API返回结构解析
+    if (account_info and 
+        account_info.get("base_resp", {}).get("ret") == 0 and  # 检查返回状态
+        account_info.get("list") and 
+        len(account_info["list"]) > 0):
+        
+        # 取第一个匹配的公众号
+        first_account = account_info["list"][0]
+        state["account_info"] = first_account
+        state["fake_id"] = first_account.get("fakeid")  # 注意是 fakeid 不是 fake_id
+        
+        nickname = first_account.get("nickname", "Unknown")
+        fakeid = first_account.get("fakeid", "")
+        signature = first_account.get("signature", "")
+        
+        print(f"[DEBUG] 找到公众号: {nickname}")
+        print(f"[DEBUG] fakeid: {fakeid}")
+        print(f"[DEBUG] 简介: {signature}")
+        
+    else:
+        error_msg = "未找到匹配的公众号"
+        if account_info:
+            # 检查是否有错误信息
+            base_resp = account_info.get("base_resp", {})
+            if base_resp.get("ret") != 0:
+                error_msg = f"API错误: {base_resp.get('err_msg', '未知错误')}"
+            elif account_info.get("total", 0) == 0:
+                error_msg = f"未找到关键词为 '{keyword}' 的公众号"
+        
+        state["error_message"] = error_msg
     
-    # 时间优化相关变量
-    found_in_range = False  # 是否找到过在时间范围内的文章
-    api_calls = 0
+    return state
+
+
+def fetch_articles_with_smart_filtering_node(state: WorkflowState) -> WorkflowState:
+    """智能获取文章：根据筛选条件动态获取足够数量的文章，支持时间范围优化"""
+    fetch = SmartFetch(state["fake_id"], state.get("filter_conditions", {}))
+    if not fetch.fake_id:
+        state["error_message"] = "缺少公众号fake_id"
+        return state
     
     try:
-        for page in range(max_pages):
-            api_calls += 1
-            # 获取当前页文章
-            articles_response = get_articles(fake_id, begin, size)
-            print(f"[DEBUG] 第{page + 1}页API返回")
-            
-            # 检查API返回状态和数据
-            if not articles_response:
-                print(f"[DEBUG] 第{page + 1}页API返回为空，停止获取")
-                break
-                
-            # 检查API状态
-            base_resp = articles_response.get("base_resp", {})
-            if base_resp.get("ret") != 0:
-                error_msg = f"API错误: {base_resp.get('err_msg', '未知错误')}"
-                print(f"[DEBUG] {error_msg}")
-                state["error_message"] = error_msg
-                return state
-            
-            # 获取文章列表
-            articles_data = articles_response.get("articles", [])
-            if not articles_data or len(articles_data) == 0:
-                print(f"[DEBUG] 第{page + 1}页文章列表为空，停止获取")
-                break
-            
-            # 转换为标准格式并添加到总列表
-            current_page_articles = []
-            page_in_range_count = 0
-            early_termination = False
-            
-            for article in articles_data:
-                article_info = ArticleInfo(
-                    title=article.get("title", ""),
-                    publish_time=str(article.get("update_time", article.get("create_time", ""))),
-                    link=article.get("link", ""),
-                    content_url=article.get("link", ""),
-                    fake_id=fake_id
-                )
-                all_articles.append(article_info)
-                current_page_articles.append(article_info)
-                
-                # 如果有时间范围条件，进行时间优化判断
-                if has_time_range:
-                    article_time = parse_article_time(article_info["publish_time"])
-                    if article_time:
-                        # 检查是否在时间范围内
-                        in_range = True
-                        if start_date and article_time < start_date:
-                            # 文章时间早于开始时间
-                            if found_in_range:
-                                # 如果之前已经找到过在范围内的文章，现在可以提前终止
-                                print(f"[TIME-OPT] 🚀 提前终止：文章时间 {article_time.strftime('%Y-%m-%d')} 早于开始时间 {start_date.strftime('%Y-%m-%d')}")
-                                early_termination = True
-                                break
-                            in_range = False
-                        elif end_date and article_time > end_date:
-                            # 文章时间晚于结束时间，跳过但继续获取
-                            print(f"[TIME-OPT] 跳过文章：{article_info['title'][:30]}... (时间晚于结束时间)")
-                            in_range = False
-                        
-                        if in_range:
-                            found_in_range = True
-                            page_in_range_count += 1
-            
-            # 如果需要提前终止，跳出循环
-            if early_termination:
-                print(f"[TIME-OPT] 提前终止获取，节省了 {max_pages - page - 1} 页的API调用")
-                break
-            
-            # 对当前累积的所有文章进行筛选
-            filtered_articles = apply_filters(all_articles, conditions)
-            
-            if has_time_range:
-                print(f"[DEBUG] 第{page + 1}页获取 {len(current_page_articles)} 篇，时间范围内 {page_in_range_count} 篇，累计筛选后 {len(filtered_articles)} 篇")
-            else:
-                print(f"[DEBUG] 第{page + 1}页获取 {len(current_page_articles)} 篇文章，累计 {len(all_articles)} 篇，筛选后 {len(filtered_articles)} 篇")
-            
-            # 检查是否满足条件
-            if is_filtering_complete(filtered_articles, conditions):
-                print(f"[DEBUG] 已满足筛选条件，停止获取")
-                break
-            
-            # 如果返回的文章数量少于size，说明已经是最后一页
-            if len(articles_data) < size:
-                print(f"[DEBUG] 已到最后一页，停止获取")
+        while True:
+            request = fetch.next_request()
+            if request is None:
                 break
-            
-            begin += size
-    
+            fetch.handle_page(get_articles(fetch.fake_id, *request))
     except Exception as e:
         state["error_message"] = f"获取文章列表时出错: {str(e)}"
         return state
     
-    # 最终筛选（确保数量限制）
-    if conditions.get("max_articles") and len(filtered_articles) > conditions["max_articles"]:
-        filtered_articles = filtered_articles[:conditions["max_articles"]]
-    
-    state["all_articles"] = all_articles
-    state["filtered_articles"] = filtered_articles
-    
-    if has_time_range:
-        print(f"[TIME-OPT] 时间优化效果：API调用 {api_calls} 次，最终结果：总文章 {len(all_articles)} 篇，筛选后 {len(filtered_articles)} 篇")
-    else:
-        print(f"[DEBUG] 最终结果：总文章 {len(all_articles)} 篇，筛选后 {len(filtered_articles)} 篇")
-    
-    return state
+    return fetch.finish(state)
 
 
-def parse_article_time(time_str: str) -> Optional[datetime]:
-    """解析文章时间戳"""
-    if not time_str or not time_str.strip():
-        return None
+async def afetch_articles_with_smart_filtering_node(state: WorkflowState) -> WorkflowState:
+    """fetch_articles_with_smart_filtering_node 的异步版本"""
+    fetch = SmartFetch(state["fake_id"], state.get("filter_conditions", {}))
+    if not fetch.fake_id:
+        state["error_message"] = "缺少公众号fake_id"
+        return state
     
     try:
-        if time_str.isdigit():
-            return datetime.fromtimestamp(int(time_str))
+        while True:
+            request = fetch.next_request()
+            if request is None:
+                break
+            fetch.handle_page(await aget_articles(fetch.fake_id, *request))
+    except Exception as e:
+        state["error_message"] = f"获取文章列表时出错: {str(e)}"
+        return state
+    
+    return fetch.finish(state)
+
+
+class SmartFetch:
+    """智能获取文章的分页过程：决定下一页请求、处理每页返回、汇总结果
+
+    不发起请求，同步和异步节点各自调用 get_articles / aget_articles 后交给 handle_page。
+    """
+
+    def __init__(self, fake_id: Optional[str], conditions: FilterConditions):
+        self.fake_id = fake_id
+        self.conditions = conditions
+        print(f"[DEBUG] 开始智能获取文章，fake_id: {fake_id}")
+        print(f"[DEBUG] 筛选条件: {conditions}")
+        
+        # 检查是否有时间范围条件，启用优化策略
+        self.start_date = conditions.get("start_date")
+        self.end_date = conditions.get("end_date")
+        self.has_time_range = bool(self.start_date or self.end_date)
+        
+        if fake_id and self.has_time_range:
+            print(f"[TIME-OPT] 检测到时间范围条件，启用时间优化策略")
+            print(f"[TIME-OPT] 时间范围: {self.start_date} 到 {self.end_date}")
+        
+        self.all_articles = ArticleBatch()
+        self.filtered_articles = ArticleBatch()
+        # 已获取文章的规范标识：翻页期间列表变化造成的页间重叠、同一篇文章的重复推送只保留一次
+        self.seen_ids = set()
+        self.duplicates = 0
+        self.begin = 0
+        self.size = 0
+        self.page = 0
+        self.done = False
+        self.error_message: Optional[str] = None
+        
+        # 时间优化相关变量
+        self.found_in_range = False  # 是否找到过在时间范围内的文章
+        self.start_ts = self.start_date.timestamp() if self.start_date else None
+        self.end_ts = self.end_date.timestamp() if self.end_date else None
+        
+        # 自适应分页：按还差多少篇、观察到的命中率和时间窗口决定每页大小，页数上限改为预算
+        self.pager = AdaptivePager(
+            target_count=filtering_target(conditions),
+            filtering=bool(get_keyword_matcher(conditions) or self.has_time_range),
+            start_ts=self.start_ts,
+            end_ts=self.end_ts
+        )
+
+    def next_request(self) -> Optional[Tuple[int, int]]:
+        """下一页的 (begin, size)；已经可以停止时返回 None"""
+        if self.done:
+            return None
+        if self.pager.exhausted():
+            print(f"[DEBUG] 已用完获取预算（API调用 {self.pager.api_calls} 次，记录 {self.pager.rows_seen} 条），停止获取")
+            return None
+        self.size = self.pager.next_size(len(self.filtered_articles))
+        return self.begin, self.size
+
+    def handle_page(self, articles_response) -> None:
+        """处理一页返回：转换、时间优化判断、筛选，并决定是否继续"""
+        page, size = self.page, self.size
+        print(f"[DEBUG] 第{page + 1}页API返回")
+        
+        # 检查API返回状态和数据
+        if not articles_response:
+            print(f"[DEBUG] 第{page + 1}页API返回为空，停止获取")
+            self.done = True
+            return
+            
+        # 检查API状态
+        base_resp = articles_response.get("base_resp", {})
+        if base_resp.get("ret") != 0:
+            error_msg = f"API错误: {base_resp.get('err_msg', '未知错误')}"
+            print(f"[DEBUG] {error_msg}")
+            self.error_message = error_msg
+            self.done = True
+            return
+        
+        # 获取文章列表
+        articles_data = articles_response.get("articles", [])
+        if not articles_data or len(articles_data) == 0:
+            print(f"[DEBUG] 第{page + 1}页文章列表为空，停止获取")
+            self.done = True
+            return
+        
+        # 转换为列式批次，发布时间在此一次性转换为epoch秒
+        current_page_articles = ArticleBatch()
+        page_in_range_count = 0
+        early_termination = False
+        
+        for article in articles_data:
+            title = article.get("title", "")
+            publish_ts = to_epoch(article.get("update_time", article.get("create_time", "")))
+            link = article.get("link", "")
+            canonical_id = article_id(link, self.fake_id, str(article.get("aid", "")))
+            if canonical_id:
+                if canonical_id in self.seen_ids:
+                    self.duplicates += 1
+                    print(f"[DEDUP] 跳过重复文章：{title[:30]}")
+                    continue
+                self.seen_ids.add(canonical_id)
+            current_page_articles.append(
+                title=title,
+                link=link,
+                publish_ts=publish_ts,
+                fake_id=self.fake_id,
+                article_id=canonical_id
+            )
+            
+            # 如果有时间范围条件，进行时间优化判断
+            if self.has_time_range and publish_ts != NO_TIME:
+                # 检查是否在时间范围内
+                in_range = True
+                if self.start_ts is not None and publish_ts < self.start_ts:
+                    # 文章时间早于开始时间
+                    if self.found_in_range:
+                        # 如果之前已经找到过在范围内的文章，现在可以提前终止
+                        article_time = datetime.fromtimestamp(publish_ts)
+                        print(f"[TIME-OPT] 🚀 提前终止：文章时间 {article_time.strftime('%Y-%m-%d')} 早于开始时间 {self.start_date.strftime('%Y-%m-%d')}")
+                        early_termination = True
+                        break
+                    in_range = False
+                elif self.end_ts is not None and publish_ts > self.end_ts:
+                    # 文章时间晚于结束时间，跳过但继续获取
+                    print(f"[TIME-OPT] 跳过文章：{title[:30]}... (时间晚于结束时间)")
+                    in_range = False
+                
+                if in_range:
+                    self.found_in_range = True
+                    page_in_range_count += 1
+        
+        # 只对新一页做筛选并累加，避免每页都重新筛选全部已获取文章
+        page_filtered = apply_filters(current_page_articles, self.conditions)
+        self.all_articles.extend(current_page_articles)
+        self.filtered_articles.extend(page_filtered)
+        self.pager.observe(len(current_page_articles), len(page_filtered), current_page_articles.publish_ts)
+        
+        # 如果需要提前终止，停止获取
+        if early_termination:
+            print(f"[TIME-OPT] 提前终止获取，剩余 {self.pager.remaining_calls} 次API调用预算未使用")
+            self.done = True
+            return
+        
+        if self.has_time_range:
+            print(f"[DEBUG] 第{page + 1}页(size={size})获取 {len(current_page_articles)} 篇，时间范围内 {page_in_range_count} 篇，累计筛选后 {len(self.filtered_articles)} 篇")
         else:
-            # 尝试其他日期格式
-            from dateutil import parser as date_parser
-            return date_parser.parse(time_str)
-    except:
+            print(f"[DEBUG] 第{page + 1}页(size={size})获取 {len(current_page_articles)} 篇文章，累计 {len(self.all_articles)} 篇，筛选后 {len(self.filtered_articles)} 篇")
+        
+        # 检查是否满足条件
+        if is_filtering_complete(self.filtered_articles, self.conditions):
+            print(f"[DEBUG] 已满足筛选条件，停止获取")
+            self.done = True
+            return
+        
+        # 如果返回的文章数量少于size，说明已经是最后一页
+        if len(articles_data) < size:
+            print(f"[DEBUG] 已到最后一页，停止获取")
+            self.done = True
+            return
+        
+        self.begin += len(articles_data)
+        self.page += 1
+
+    def finish(self, state: WorkflowState) -> WorkflowState:
+        """主题排序、数量截断，并把结果写入状态"""
+        if self.error_message:
+            state["error_message"] = self.error_message
+            return state
+        
+        conditions = self.conditions
+        all_articles = self.all_articles
+        filtered_articles = self.filtered_articles
+        
+        # 有主题时按TF-IDF相关度取top-k，而不是取前N篇命中
+        topic = conditions.get("topic")
+        if topic and filtered_articles:
+            from relevance_ranker import rank_articles  # numpy仅在需要排序时导入
+            filtered_articles = rank_articles(
+                self.fake_id, all_articles, filtered_articles, topic,
+                top_k=conditions.get("max_articles") or DEFAULT_TOPIC_TOP_K
+            )
+        
+        # 最终筛选（确保数量限制）
+        if conditions.get("max_articles") and len(filtered_articles) > conditions["max_articles"]:
+            filtered_articles = filtered_articles[:conditions["max_articles"]]
+        
+        # 文章列表并入本地历史，之后可以直接在历史上按日期/关键词查询（numpy仅在启用时导入）
+        if history_enabled():
+            from vector_filter import record_articles
+            record_articles(self.fake_id, all_articles)
+        
+        state["all_articles"] = all_articles
+        state["filtered_articles"] = filtered_articles
+        state.setdefault("run_stats", {})["fetch"] = dict(self.pager.stats(), duplicates=self.duplicates)
+        
+        if self.has_time_range:
+            print(f"[TIME-OPT] 时间优化效果：API调用 {self.pager.api_calls} 次，最终结果：总文章 {len(all_articles)} 篇，筛选后 {len(filtered_articles)} 篇")
+        else:
+            print(f"[DEBUG] 最终结果：总文章 {len(all_articles)} 篇，筛选后 {len(filtered_articles)} 篇")
+        
+        return state
+
+
+def history_enabled() -> bool:
+    return (get_env_var("ARTICLE_HISTORY_ENABLED", "false") or "").lower() == "true"
+
+
+def parse_article_time(time_str: str) -> Optional[datetime]:
+    """解析文章时间戳，无法解析时返回 None"""
+    ts = to_epoch(time_str)
+    if ts == NO_TIME:
         return None
+    return datetime.fromtimestamp(ts)
 
 
-def apply_filters(articles: List[ArticleInfo], conditions: FilterConditions) -> List[ArticleInfo]:
-    """应用筛选条件到文章列表"""
-    filtered = articles.copy()
+def apply_filters(articles: ArticleBatch, conditions: FilterConditions) -> ArticleBatch:
+    """应用筛选条件到文章列表（也接受 ArticleInfo 字典列表），返回筛选后的 ArticleBatch"""
+    articles = ArticleBatch.from_dicts(articles)
+    
+    # 大批次（如本地积累的文章历史）按列批量计算，逐行循环只用于单页等小批次
+    if len(articles) >= VECTOR_FILTER_MIN_ROWS:
+        from vector_filter import filter_batch
+        return filter_batch(articles, conditions)
     
-    # 按标题关键词筛选
-    if conditions.get("title_keywords"):
-        keywords = conditions["title_keywords"]
-        filtered = [
-            article for article in filtered
-            if any(keyword in article["title"] for keyword in keywords)
-        ]
-        print(f"[DEBUG] 按关键词 {keywords} 筛选后剩余 {len(filtered)} 篇文章")
+    indices = range(len(articles))
     
-    # 按时间筛选
-    if conditions.get("start_date") or conditions.get("end_date"):
+    # 按标题关键词筛选（预编译的多关键词自动机，每个标题只扫描一遍）
+    matcher = get_keyword_matcher(conditions)
+    if matcher:
+        titles = articles.titles
+        indices = [i for i in indices if matcher.title_may_match(titles[i])]
+        print(f"[DEBUG] 按关键词 {conditions.get('title_keywords')} 筛选后剩余 {len(indices)} 篇文章")
+    
+    # 按时间筛选：直接比较epoch秒，无需逐行解析日期字符串
+    start_date = conditions.get("start_date")
+    end_date = conditions.get("end_date")
+    if start_date or end_date:
+        start_ts = start_date.timestamp() if start_date else None
+        end_ts = end_date.timestamp() if end_date else None
+        publish_ts = articles.publish_ts
         date_filtered = []
-        for article in filtered:
-            try:
-                publish_time = article["publish_time"]
-                if isinstance(publish_time, str):
-                    # 尝试解析时间戳或日期字符串
-                    if publish_time.isdigit():
-                        article_date = datetime.fromtimestamp(int(publish_time))
-                    else:
-                        article_date = date_parser.parse(publish_time)
-                else:
+        for i in indices:
+            ts = publish_ts[i]
+            if ts != NO_TIME:
+                if start_ts is not None and ts < start_ts:
                     continue
-                
-                if conditions.get("start_date") and article_date < conditions["start_date"]:
-                    continue
-                if conditions.get("end_date") and article_date > conditions["end_date"]:
+                if end_ts is not None and ts > end_ts:
                     continue
-                
-                date_filtered.append(article)
-            except:
-                # 如果日期解析失败，保留文章
-                date_filtered.append(article)
+            # 发布时间缺失的文章予以保留
+            date_filtered.append(i)
         
-        filtered = date_filtered
-        print(f"[DEBUG] 按时间筛选后剩余 {len(filtered)} 篇文章")
+        indices = date_filtered
+        print(f"[DEBUG] 按时间筛选后剩余 {len(indices)} 篇文章")
     
-    return filtered
+    return articles.take(indices)
 
 
-def is_filtering_complete(filtered_articles: List[ArticleInfo], conditions: FilterConditions) -> bool:
-    """检查筛选是否已完成（满足用户需求）"""
+def filtering_target(conditions: FilterConditions) -> int:
+    """需要筛选出多少篇文章才算满足用户需求"""
     target_count = conditions.get("max_articles")
     
-    # 如果用户指定了数量要求，检查是否已达到
-    if target_count:
-        if len(filtered_articles) >= target_count:
-            return True
+    # 按主题排序时需要足够大的候选池，再从中选出最相关的top-k
+    if conditions.get("topic"):
+        return (target_count or DEFAULT_TOPIC_TOP_K) * TOPIC_CANDIDATE_MULTIPLIER
     
     # 如果没有指定数量但有其他条件，继续获取更多文章以确保充分筛选
-    # 这里可以设置一个默认的"足够"数量，比如50篇
-    if not target_count and len(filtered_articles) >= 50:
-        return True
-    
-    return False
+    # 这里设置一个默认的"足够"数量
+    return target_count or DEFAULT_ENOUGH_ARTICLES
+
+
+def is_filtering_complete(filtered_articles: ArticleBatch, conditions: FilterConditions) -> bool:
+    """检查筛选是否已完成（满足用户需求）"""
+    return len(filtered_articles) >= filtering_target(conditions)
 
 
 def parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
@@ -317,7 +444,11 @@ def parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
         title_keywords=None,
         max_articles=None,
         start_date=None,
-        end_date=None
+        end_date=None,
+        required_keywords=None,
+        excluded_keywords=None,
+        match_body=False,
+        topic=None
     )
     
     # 提取标题关键词
@@ -341,6 +472,7 @@ def parse_filter_conditions_node(state: WorkflowState) -> WorkflowState:
         conditions["max_articles"] = count
     
     # 提取时间范围
+    from dateutil import parser as date_parser
     date_patterns = [
         r"(\d{4}-\d{1,2}-\d{1,2})",
         r"(\d{4}年\d{1,2}月\d{1,2}日)",
@@ -377,44 +509,7 @@ def filter_articles_node(state: WorkflowState) -> WorkflowState:
     print(f"[DEBUG] 开始筛选，原始文章数: {len(all_articles)}")
     print(f"[DEBUG] 筛选条件: {conditions}")
     
-    filtered_articles = all_articles.copy()
-    
-    # 按标题关键词筛选
-    if conditions["title_keywords"]:
-        keywords = conditions["title_keywords"]
-        filtered_articles = [
-            article for article in filtered_articles
-            if any(keyword in article["title"] for keyword in keywords)
-        ]
-        print(f"[DEBUG] 按关键词筛选后剩余 {len(filtered_articles)} 篇文章")
-    
-    # 按时间筛选
-    if conditions["start_date"] or conditions["end_date"]:
-        date_filtered = []
-        for article in filtered_articles:
-            try:
-                publish_time = article["publish_time"]
-                if isinstance(publish_time, str):
-                    # 尝试解析时间戳或日期字符串
-                    if publish_time.isdigit():
-                        article_date = datetime.fromtimestamp(int(publish_time))
-                    else:
-                        article_date = date_parser.parse(publish_time)
-                else:
-                    continue
-                
-                if conditions["start_date"] and article_date < conditions["start_date"]:
-                    continue
-                if conditions["end_date"] and article_date > conditions["end_date"]:
-                    continue
-                
-                date_filtered.append(article)
-            except:
-                # 如果日期解析失败，保留文章
-                date_filtered.append(article)
-        
-        filtered_articles = date_filtered
-        print(f"[DEBUG] 按时间筛选后剩余 {len(filtered_articles)} 篇文章")
+    filtered_articles = apply_filters(all_articles, conditions)
     
     # 按数量限制
     if conditions["max_articles"] and len(filtered_articles) > conditions["max_articles"]:
@@ -423,4 +518,4 @@ def filter_articles_node(state: WorkflowState) -> WorkflowState:
     
     state["filtered_articles"] = filtered_articles
     print(f"[DEBUG] 最终筛选结果: {len(filtered_articles)} 篇文章")
-    return state
\ No newline at end of file
+    return state
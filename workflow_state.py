@@ -1,12 +1,15 @@
 from typing import TypedDict, List, Dict, Any, Optional
 from datetime import datetime
 
+from article_batch import ArticleBatch
 
+
+# 单篇文章的字典形式；WorkflowState 中以 ArticleBatch 列式存储，按行访问得到同字段的视图
 class ArticleInfo(TypedDict):
     title: str
     publish_time: str
     link: str
-    content_url: str
+    article_id: str  # 规范文章标识 biz:mid:idx，见 article_identity；去重和各类缓存键都用它
     fake_id: str
 
 
@@ -17,10 +20,14 @@ class ShortNews(TypedDict):
 
 
 class FilterConditions(TypedDict):
-    title_keywords: Optional[List[str]]
+    title_keywords: Optional[List[str]]  # 任一命中即可 (OR)
     max_articles: Optional[int]
     start_date: Optional[datetime]
     end_date: Optional[datetime]
+    required_keywords: Optional[List[str]]  # 必须全部命中 (AND)
+    excluded_keywords: Optional[List[str]]  # 不能命中 (NOT)
+    match_body: bool  # 是否同时在正文中匹配关键词
+    topic: Optional[str]  # 主题描述，设置后按TF-IDF相关度排序取top-k
 
 
 class WorkflowState(TypedDict):
@@ -28,9 +35,10 @@ class WorkflowState(TypedDict):
     account_keyword: str
     account_info: Optional[Dict[str, Any]]
     fake_id: Optional[str]
-    all_articles: List[ArticleInfo]
+    all_articles: ArticleBatch
     filter_conditions: FilterConditions
-    filtered_articles: List[ArticleInfo]
+    filtered_articles: ArticleBatch
     short_news_list: List[ShortNews]
     excel_file_path: Optional[str]
-    error_message: Optional[str]
\ No newline at end of file
+    error_message: Optional[str]
+    run_stats: Dict[str, Any]  # 各阶段的运行统计，如预筛节省的LLM调用次数
\ No newline at end of file